@@ -1,5 +1,15 @@
-from django.contrib import admin
-from .models import Departamento, JefeCuadrilla, Incidencia, Direccion, Multimedia, Territorial
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect, render
+from django.urls import path
+from incidencias.importacion import ImportadorIncidencias
+from .historial import registrar_transicion
+from .models import (
+    Departamento, JefeCuadrilla, Incidencia, Direccion, Multimedia, Territorial,
+    SlaIncidencia, AlertaSla, HistorialIncidencia,
+)
 
 # Register your models here.
 
@@ -41,8 +51,14 @@ class TerritorialInline(admin.TabularInline):
     verbose_name_plural = "Asignaciones territoriales"
 
 
+class ImportarIncidenciasForm(forms.Form):
+    archivo = forms.FileField(label="Archivo CSV", help_text="UTF-8 con encabezado (titulo, departamento, ...).")
+    validar = forms.BooleanField(label="Solo validar (no insertar)", required=False)
+
+
 @admin.register(Incidencia)
 class IncidenciaAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/core/incidencia/change_list.html'
     list_display = ['id', 'titulo', 'estado', 'prioridad', 'cuadrilla', 'departamento', 'creadoEl']
     list_filter = ['estado', 'prioridad', 'departamento', 'cuadrilla']
     search_fields = ['titulo', 'descripcion', 'nombre_vecino']
@@ -70,6 +86,46 @@ class IncidenciaAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        # El admin ya envuelve el guardado en una transacción
+        estado_anterior = form.initial.get('estado') if change else None
+        super().save_model(request, obj, form, change)
+        registrar_transicion(obj, estado_anterior, request.user)
+
+    def get_urls(self):
+        urls = [
+            path('importar/', self.admin_site.admin_view(self.importar_csv), name='core_incidencia_importar'),
+        ]
+        return urls + super().get_urls()
+
+    def importar_csv(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:core_incidencia_changelist')
+
+        form = ImportarIncidenciasForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = io.TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig', newline='')
+            importador = ImportadorIncidencias(usuario=request.user, validar_solo=form.cleaned_data['validar'])
+            resultado = importador.importar(archivo)
+            for linea, mensaje in resultado.errores[:20]:
+                messages.warning(request, f"Línea {linea}: {mensaje}")
+            if form.cleaned_data['validar']:
+                messages.info(request, f"{resultado.validas} de {resultado.leidas} filas son válidas.")
+                return redirect('admin:core_incidencia_importar')
+            messages.success(
+                request,
+                f"Se importaron {resultado.creadas} de {resultado.leidas} filas ({len(resultado.errores)} con error).",
+            )
+            return redirect('admin:core_incidencia_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar incidencias desde CSV',
+            'form': form,
+        }
+        return render(request, 'admin/core/incidencia/importar.html', context)
+
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
         # El campo respuesta (RespuestaEncuesta) es opcional en la incidencia
@@ -93,3 +149,29 @@ class TerritorialAdmin(admin.ModelAdmin):
     raw_id_fields = ['incidencia']
     autocomplete_fields = ['usuario']
 
+
+@admin.register(SlaIncidencia)
+class SlaIncidenciaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo_gravedad', 'estado', 'horas_limite']
+    list_filter = ['tipo_gravedad', 'estado']
+
+
+@admin.register(AlertaSla)
+class AlertaSlaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'incidencia', 'creadoEl', 'enviadaEl']
+    list_filter = ['enviadaEl']
+    raw_id_fields = ['incidencia', 'tramo']
+
+
+@admin.register(HistorialIncidencia)
+class HistorialIncidenciaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'incidencia', 'estado_anterior', 'estado_nuevo', 'usuario', 'fecha']
+    list_filter = ['estado_nuevo']
+    raw_id_fields = ['incidencia', 'usuario']
+
+    # Solo inserción: se consulta, no se edita ni se borra desde el admin
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
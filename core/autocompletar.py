@@ -0,0 +1,202 @@
+"""
+Búsqueda por prefijo para los campos con autocompletado (perfiles,
+departamentos, cuadrillas).
+
+Cada proceso arma, con una sola consulta por fuente, un trie con cada palabra
+de los nombres (sin tildes ni mayúsculas) y lo reutiliza mientras no cambie la
+versión de la fuente en la caché compartida; signals.py sube la versión al
+guardar o borrar. Si una fuente supera ``MAX_ENTRADAS_TRIE`` se busca en la
+base con ``istartswith`` (índices ``UPPER(col) varchar_pattern_ops``).
+"""
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from registration.models import Profile
+
+from . import permisos
+from .models import Departamento, JefeCuadrilla
+
+LIMITE = 10
+MAX_ENTRADAS_TRIE = 50000
+# Aunque no llegue una invalidación (p. ej. caché local por proceso) el trie se rehace cada tanto
+TTL_SEGUNDOS = 600
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _palabras(texto):
+    return [p for p in normalizar(texto).replace("·", " ").replace("@", " ").split() if p]
+
+
+class Trie:
+    """Trie de palabras; cada nodo guarda los ids de las entradas que tienen ese prefijo."""
+
+    def __init__(self):
+        self.raiz = {}
+
+    def agregar(self, palabra, id_):
+        nodo = self.raiz
+        for letra in palabra:
+            nodo = nodo.setdefault(letra, {})
+            nodo.setdefault("", set()).add(id_)
+
+    def buscar(self, prefijo):
+        nodo = self.raiz
+        for letra in prefijo:
+            nodo = nodo.get(letra)
+            if nodo is None:
+                return set()
+        return nodo.get("", set())
+
+
+@dataclass
+class Fuente:
+    queryset: Callable   # () -> QuerySet con lo que se puede elegir
+    campos: tuple        # campos de texto buscables (prefijo de cada palabra)
+    filtros: dict        # parámetro GET -> campo por el que se filtra
+    etiqueta: Callable   # fila de values() -> texto mostrado
+    mascara: int         # capacidades (core.permisos) de quienes usan los formularios con esta fuente
+
+
+def _etiqueta_perfil(fila):
+    nombre = f"{fila['user__first_name']} {fila['user__last_name']}".strip()
+    return f"{nombre or fila['user__username']} · {fila['user__username']}"
+
+
+FUENTES = {
+    "perfiles": Fuente(
+        lambda: Profile.objects.filter(user__is_active=True),
+        ("user__username", "user__first_name", "user__last_name"),
+        {"grupo": "user__groups__name"},
+        _etiqueta_perfil,
+        # Formularios de direcciones y departamentos
+        permisos.ADMIN_O_DIRECCION,
+    ),
+    "departamentos": Fuente(
+        lambda: Departamento.objects.filter(estado=True),
+        ("nombre_departamento",),
+        {"direccion": "direccion_id"},
+        lambda fila: fila["nombre_departamento"],
+        # Formulario de incidencias: lo edita cualquier rol municipal
+        permisos.MASCARA_ROLES,
+    ),
+    "cuadrillas": Fuente(
+        lambda: JefeCuadrilla.objects.all(),
+        ("nombre_cuadrilla",),
+        {"departamento": "departamento_id"},
+        lambda fila: fila["nombre_cuadrilla"],
+        # Reasignación de incidencias
+        permisos.ADMIN_O_TERRITORIAL,
+    ),
+}
+
+
+def _clave_version(nombre):
+    return f"autocompletar:version:{nombre}"
+
+
+def version(nombre):
+    return cache.get_or_set(_clave_version(nombre), 1, None)
+
+
+def invalidar(nombre):
+    try:
+        cache.incr(_clave_version(nombre))
+    except ValueError:
+        cache.set(_clave_version(nombre), 2, None)
+
+
+def _entradas(fuente, filas):
+    """Agrupa las filas por id (un filtro M2M como grupo repite la fila)."""
+    entradas = {}
+    for fila in filas:
+        entrada = entradas.get(fila["id"])
+        if entrada is None:
+            entrada = entradas[fila["id"]] = {
+                "id": fila["id"],
+                "texto": fuente.etiqueta(fila),
+                "filtros": {param: set() for param in fuente.filtros},
+            }
+        for param, campo in fuente.filtros.items():
+            if fila[campo] is not None:
+                entrada["filtros"][param].add(str(fila[campo]))
+    return entradas
+
+
+class _Indice:
+    def __init__(self, fuente):
+        campos = ("id",) + fuente.campos + tuple(fuente.filtros.values())
+        self.entradas = _entradas(fuente, fuente.queryset().using(DEFAULT_DB_ALIAS).values(*campos).order_by())
+        self.trie = Trie()
+        for entrada in self.entradas.values():
+            for palabra in _palabras(entrada["texto"]):
+                self.trie.agregar(palabra, entrada["id"])
+
+
+_indices = {}  # nombre -> (versión, creado, _Indice o None si la fuente es muy grande)
+_lock = threading.Lock()
+
+
+def _indice(nombre):
+    actual = version(nombre)
+    with _lock:
+        guardado = _indices.get(nombre)
+        if guardado and guardado[0] == actual and time.monotonic() - guardado[1] < TTL_SEGUNDOS:
+            return guardado[2]
+    fuente = FUENTES[nombre]
+    # De la primaria: el índice queda fijo bajo esta versión (la réplica puede venir atrasada)
+    indice = _Indice(fuente) if fuente.queryset().using(DEFAULT_DB_ALIAS).count() <= MAX_ENTRADAS_TRIE else None
+    with _lock:
+        _indices[nombre] = (actual, time.monotonic(), indice)
+    return indice
+
+
+def _coincide(entrada, filtros):
+    return all(entrada["filtros"][param] & valores for param, valores in filtros.items())
+
+
+def _buscar_bd(fuente, palabras, filtros, limite):
+    qs = fuente.queryset()
+    for palabra in palabras:
+        condicion = Q()
+        for campo in fuente.campos:
+            condicion |= Q(**{f"{campo}__istartswith": palabra})
+        qs = qs.filter(condicion)
+    for param, valores in filtros.items():
+        qs = qs.filter(**{f"{fuente.filtros[param]}__in": valores})
+    campos = ("id",) + fuente.campos + tuple(fuente.filtros.values())
+    entradas = _entradas(fuente, qs.values(*campos).order_by(*fuente.campos)[: limite * 5])
+    return list(entradas.values())
+
+
+def buscar(nombre, q, filtros=None, limite=LIMITE):
+    """
+    Hasta ``limite`` resultados ``{"id", "texto"}`` cuyas palabras empiezan con
+    las de ``q``. ``filtros`` es ``{parámetro: [valores]}`` (p. ej. grupo).
+    """
+    fuente = FUENTES[nombre]
+    palabras = _palabras(q)
+    if not palabras:
+        return []
+    filtros = {p: {str(v) for v in vs} for p, vs in (filtros or {}).items() if p in fuente.filtros and vs}
+
+    indice = _indice(nombre)
+    if indice is None:
+        candidatas = _buscar_bd(fuente, palabras, filtros, limite)
+    else:
+        ids = set.intersection(*(indice.trie.buscar(p) for p in palabras))
+        candidatas = [indice.entradas[i] for i in ids]
+    resultados = sorted(
+        (e for e in candidatas if _coincide(e, filtros)), key=lambda e: normalizar(e["texto"])
+    )
+    return [{"id": e["id"], "texto": e["texto"]} for e in resultados[:limite]]
@@ -0,0 +1,333 @@
+"""
+Escenarios de benchmark de las vistas y endpoints principales.
+
+Cada ``Escenario`` es una URL pedida con un usuario de cierto rol. ``medir``
+la ejecuta varias veces con el ``Client`` de pruebas de Django y devuelve
+consultas SQL y latencias (p50/p95); ``comparar`` contrasta contra una línea
+base guardada en JSON. Lo usan ``benchmark_vistas`` y los tests de número de
+consultas. ``medir_concurrencia`` (comando ``benchmark_conexiones``) pide una
+URL desde varios hilos a la vez para comparar los modos de ``DB_POOL_MODE``.
+"""
+import statistics
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from incidencias.analitica import percentil
+
+from . import semillas
+from .models import Encuesta, Incidencia
+
+# Diferencias de p95 menores a esto son ruido aunque superen la tolerancia relativa
+MARGEN_MS = 5
+
+
+def _ultima_incidencia():
+    pk = Incidencia.objects.order_by("-pk").values_list("pk", flat=True).first()
+    return {"pk": pk} if pk else None
+
+
+def _ultima_encuesta():
+    pk = Encuesta.objects.order_by("-pk").values_list("pk", flat=True).first()
+    return {"pk": pk} if pk else None
+
+
+@dataclass
+class Escenario:
+    nombre: str
+    url: str                                  # nombre de la URL para reverse()
+    rol: Optional[str] = None                 # grupo del usuario; None = anónimo
+    kwargs: Optional[Callable] = None         # devuelve los kwargs de reverse() o None si no hay datos
+    params: dict = field(default_factory=dict)
+    token: bool = False                       # endpoints DRF con TokenAuthentication
+
+
+ESCENARIOS = [
+    Escenario("dashboard_admin", "personas:dashboard_admin", "Administrador"),
+    Escenario("dashboard_direccion", "personas:dashboard_direccion", "Dirección"),
+    Escenario("dashboard_departamento", "personas:dashboard_departamento", "Departamento"),
+    Escenario("dashboard_jefe", "personas:dashboard_jefeCuadrilla", "Jefe de Cuadrilla"),
+    Escenario("dashboard_territorial", "personas:dashboard_territorial", "Territorial"),
+    Escenario("incidencias_lista_admin", "incidencias:incidencias_lista", "Administrador"),
+    Escenario("incidencias_lista_direccion", "incidencias:incidencias_lista", "Dirección"),
+    Escenario("incidencias_lista_departamento", "incidencias:incidencias_lista", "Departamento"),
+    Escenario("incidencias_lista_territorial", "incidencias:incidencias_lista", "Territorial"),
+    Escenario(
+        "incidencias_lista_busqueda", "incidencias:incidencias_lista", "Administrador",
+        params={"q": "Bache", "estado": "pendiente"},
+    ),
+    Escenario("incidencia_detalle", "incidencias:incidencia_detalle", "Administrador", _ultima_incidencia),
+    Escenario("encuestas_lista", "territorial_app:encuestas_lista", "Administrador"),
+    Escenario("encuesta_detalle", "territorial_app:encuesta_detalle", "Administrador", _ultima_encuesta),
+    Escenario("direcciones_lista", "organizacion:direcciones_lista", "Administrador"),
+    Escenario("departamentos_lista", "organizacion:departamentos_lista", "Administrador"),
+    Escenario("usuarios_lista", "personas:usuarios_lista", "Administrador"),
+    Escenario("api_incidencias_cuadrilla", "incidencias:api_incidencias-list", "Jefe de Cuadrilla", token=True),
+    Escenario("api_analitica", "incidencias:analitica_incidencias", "Administrador"),
+    Escenario("api_resultados_encuesta", "territorial_app:api_resultados_encuesta", "Administrador", _ultima_encuesta),
+    Escenario("api_definicion_encuesta", "territorial_app:api_definicion_encuesta", None, _ultima_encuesta),
+    Escenario("api_ready", "api_ready"),
+]
+
+
+class _Contador:
+    # execute_wrapper en vez de CaptureQueriesContext: no tiene tope de 9000 consultas
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.n += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def _contando(contador):
+    # Todas las conexiones: con réplica (encuestas.db_router) las lecturas no van a default
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(contador))
+        yield
+
+
+def usuario_para(rol):
+    """Primer usuario activo del rol (por grupo del perfil)."""
+    return (
+        User.objects.filter(is_active=True, profile__group__name=rol)
+        .order_by("pk")
+        .first()
+    )
+
+
+def cliente_para(rol, token=False):
+    """``(cliente, encabezados)`` autenticado como el primer usuario del rol; None si no hay."""
+    cliente, extra = Client(), {}
+    if rol:
+        usuario = usuario_para(rol)
+        if usuario is None:
+            return None
+        if token:
+            token, _ = Token.objects.get_or_create(user=usuario)
+            extra["HTTP_AUTHORIZATION"] = f"Token {token.key}"
+        else:
+            cliente.force_login(usuario)
+    return cliente, extra
+
+
+def preparar(escenario):
+    """Devuelve ``(cliente, url, extra)`` listo para pedir, o None si faltan datos/usuario."""
+    kwargs = {}
+    if escenario.kwargs is not None:
+        kwargs = escenario.kwargs()
+        if kwargs is None:
+            return None
+    autenticado = cliente_para(escenario.rol, escenario.token)
+    if autenticado is None:
+        return None
+    cliente, extra = autenticado
+    return cliente, reverse(escenario.url, kwargs=kwargs), extra
+
+
+def medir(escenario, iteraciones=10, calentamiento=1):
+    """Pide la URL ``iteraciones`` veces; None si el escenario no aplica a estos datos."""
+    preparado = preparar(escenario)
+    if preparado is None:
+        return None
+    cliente, url, extra = preparado
+    for _ in range(calentamiento):
+        cliente.get(url, escenario.params, **extra)
+
+    tiempos, consultas, codigo = [], [], None
+    for _ in range(iteraciones):
+        contador = _Contador()
+        with _contando(contador):
+            inicio = time.perf_counter()
+            response = cliente.get(url, escenario.params, **extra)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.n)
+        codigo = response.status_code
+    return {
+        "escenario": escenario.nombre,
+        "url": url,
+        "codigo": codigo,
+        "consultas": max(consultas),
+        "p50_ms": round(statistics.median(tiempos), 2),
+        "p95_ms": round(percentil(tiempos, 0.95), 2),
+        "max_ms": round(max(tiempos), 2),
+    }
+
+
+def conexiones_servidor(alias=DEFAULT_DB_ALIAS):
+    """Conexiones abiertas en PostgreSQL a esta base, incluida la propia (None en otros motores)."""
+    conexion = connections[alias]
+    if conexion.vendor != "postgresql":
+        return None
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+def medir_concurrencia(escenario, hilos=8, peticiones=20, intervalo=0.05):
+    """
+    ``hilos`` clientes piden la URL ``peticiones`` veces cada uno, todos a la vez,
+    como los workers de un servidor: tras cada petición se llama a
+    ``close_old_connections`` igual que al terminar un request real (el Client de
+    pruebas no lo hace). Otro hilo muestrea las conexiones en PostgreSQL durante
+    la carga. None si el escenario no aplica a estos datos.
+    """
+    preparado = preparar(escenario)
+    if preparado is None:
+        return None
+    base, url, extra = preparado
+    base.get(url, escenario.params, **extra)  # calentamiento (cachés de proceso)
+    close_old_connections()
+    antes = conexiones_servidor()
+
+    largada = threading.Barrier(hilos + 1)
+    fin = threading.Event()
+    muestras = []
+
+    def muestrear():
+        try:
+            while not fin.is_set():
+                muestras.append(conexiones_servidor())
+                fin.wait(intervalo)
+        finally:
+            connections.close_all()
+
+    def trabajar():
+        cliente = Client()
+        cliente.cookies.update(base.cookies)
+        tiempos, errores = [], 0
+        largada.wait()
+        try:
+            for _ in range(peticiones):
+                inicio = time.perf_counter()
+                response = cliente.get(url, escenario.params, **extra)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                errores += response.status_code >= 500
+                close_old_connections()
+        finally:
+            connections.close_all()
+        return tiempos, errores
+
+    resultados = [None] * hilos
+
+    def correr(i):
+        resultados[i] = trabajar()
+
+    muestreador = threading.Thread(target=muestrear, daemon=True)
+    trabajadores = [threading.Thread(target=correr, args=(i,)) for i in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    muestreador.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    fin.set()
+    muestreador.join()
+
+    tiempos = [ms for r in resultados if r for ms in r[0]]
+    medidas = [m for m in muestras if m is not None]
+    return {
+        "escenario": escenario.nombre,
+        "modo": getattr(settings, "DB_POOL_MODE", ""),
+        "hilos": hilos,
+        "peticiones": len(tiempos),
+        "errores": sum(r[1] for r in resultados if r) + sum(r is None for r in resultados),
+        "rps": round(len(tiempos) / duracion, 1) if duracion else None,
+        "p50_ms": round(statistics.median(tiempos), 2) if tiempos else None,
+        "p95_ms": round(percentil(tiempos, 0.95), 2) if tiempos else None,
+        "max_ms": round(max(tiempos), 2) if tiempos else None,
+        # Sin contar la del muestreador
+        "conexiones_antes": antes,
+        "conexiones_max": max(medidas) - 1 if medidas else None,
+    }
+
+def comparar(actual, base, tolerancia=0.2):
+    """
+    Lista de regresiones respecto de ``base`` (mismo formato que ``medir``).
+    Más consultas que la base siempre es regresión; la latencia p95 solo si
+    supera la base en más de ``tolerancia`` (0.2 = 20 %) y de ``MARGEN_MS``.
+    """
+    previos = {r["escenario"]: r for r in base}
+    regresiones = []
+    for r in actual:
+        b = previos.get(r["escenario"])
+        if b is None:
+            continue
+        if r["consultas"] > b["consultas"]:
+            regresiones.append(f"{r['escenario']}: {b['consultas']} → {r['consultas']} consultas")
+        if r["p95_ms"] > b["p95_ms"] * (1 + tolerancia) and r["p95_ms"] - b["p95_ms"] > MARGEN_MS:
+            regresiones.append(f"{r['escenario']}: p95 {b['p95_ms']} → {r['p95_ms']} ms")
+    return regresiones
+
+
+def contar_consultas(cliente, url, extra=None, params=None):
+    """``(código, consultas)`` de un GET, tras uno de calentamiento y con la caché vacía."""
+    extra = extra or {}
+    cache.clear()
+    cliente.get(url, params or {}, **extra)
+    contador = _Contador()
+    with _contando(contador):
+        response = cliente.get(url, params or {}, **extra)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    return response.status_code, contador.n
+
+
+class ConsultasConstantesMixin:
+    """
+    Mixin de ``TestCase``: pide cada ruta de ``RUTAS`` con cada rol sobre un
+    municipio chico, lo hace crecer y las vuelve a pedir. Si una vista hace
+    más consultas con más filas tiene un N+1 y el test falla.
+    """
+
+    RUTAS = []  # [(nombre de URL, kwargs o función que los devuelve)]
+    ROLES = [None] + semillas.ROLES  # None = anónimo
+    ESCALA = dict(direcciones=1, departamentos=2, cuadrillas=2, territoriales=2, incidencias=12, encuestas=2, envios=2)
+    AUMENTO = dict(incidencias=36, encuestas=4, direcciones=2, territoriales=4)
+
+    def _medir_rutas(self):
+        clientes = {}
+        for rol in self.ROLES:
+            cliente, extra = cliente_para(rol)
+            if rol:
+                # Los endpoints DRF con solo TokenAuthentication ignoran la sesión
+                token, _ = Token.objects.get_or_create(user=usuario_para(rol))
+                extra["HTTP_AUTHORIZATION"] = f"Token {token.key}"
+            clientes[rol] = cliente, extra
+        conteos = {}
+        for nombre, kwargs in self.RUTAS:
+            url = reverse(nombre, kwargs=kwargs() if callable(kwargs) else kwargs)
+            for rol, (cliente, extra) in clientes.items():
+                conteos[nombre, rol] = contar_consultas(cliente, url, extra)
+        return conteos
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        sembrador = semillas.Sembrador(semillas.Escala(**self.ESCALA), semilla=7, prefijo="prueba")
+        sembrador.sembrar()
+        chico = self._medir_rutas()
+        sembrador.agregar(**self.AUMENTO)
+        grande = self._medir_rutas()
+        for (nombre, rol), (codigo, consultas) in chico.items():
+            with self.subTest(ruta=nombre, rol=rol or "anónimo"):
+                self.assertLess(codigo, 500)
+                self.assertEqual(
+                    grande[nombre, rol][1], consultas,
+                    f"{nombre} ({rol or 'anónimo'}): {consultas} consultas con pocos datos, "
+                    f"{grande[nombre, rol][1]} con más datos",
+                )
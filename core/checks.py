@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Backends cuyo contenido no ven los demás procesos
+CACHES_POR_PROCESO = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+# Compartida, pero cada lectura de versión es una consulta a la base
+CACHES_EN_BASE = {"django.core.cache.backends.db.DatabaseCache"}
+
+
+@register(Tags.caches)
+def cache_compartida(app_configs, **kwargs):
+    """
+    Permisos, catálogos, autocompletado y paneles se invalidan cambiando una
+    versión en la caché: con una caché por proceso los demás workers nunca
+    se enteran (p. ej. un administrador degradado sigue siéndolo en ellos).
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend not in CACHES_POR_PROCESO:
+        return []
+    mensaje = f"La caché 'default' ({backend}) no es compartida entre procesos."
+    ayuda = "Configura CACHE_REDIS_URL (ver encuestas/settings.py)."
+    if settings.DEBUG:
+        return [Warning(mensaje, hint=ayuda + " Solo sirve con un único proceso.", id="core.W001")]
+    return [Error(mensaje, hint=ayuda, id="core.E001")]
+
+
+@register(Tags.caches, deploy=True)
+def cache_fuera_de_la_base(app_configs, **kwargs):
+    """Con la caché en la base cada lectura de versión es una consulta (``check --deploy``)."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend not in CACHES_EN_BASE:
+        return []
+    return [Warning(
+        f"La caché 'default' ({backend}) está en la base de datos.",
+        hint="Cada request autenticado hace al menos una consulta para leer versiones de permisos, "
+             "catálogos y fragmentos. Configura CACHE_REDIS_URL (o memcached) en producción.",
+        id="core.W002",
+    )]
@@ -0,0 +1,65 @@
+"""
+Contadores de dominio baratos de leer (``ContadorMetrica``).
+
+Se actualizan con ``F()`` en la misma transacción que la escritura que los
+cambia: signals de ``Incidencia`` y las rutas masivas (importación,
+conversión de encuestas, cola de alertas SLA). ``recalcular()`` los
+reconstruye desde las tablas si alguna vez se desalinean.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import AlertaSla, ContadorMetrica, Incidencia
+
+PREFIJO_ESTADO = "incidencias_estado:"
+ALERTAS_PENDIENTES = "alertas_sla_pendientes"
+
+
+def sumar(deltas):
+    """Aplica ``{nombre: delta}``; crea los contadores que falten."""
+    deltas = {n: d for n, d in deltas.items() if d}
+    if not deltas:
+        return
+    with transaction.atomic():
+        ContadorMetrica.objects.bulk_create(
+            [ContadorMetrica(nombre=n) for n in deltas], ignore_conflicts=True
+        )
+        for nombre in sorted(deltas):
+            ContadorMetrica.objects.filter(nombre=nombre).update(valor=F("valor") + deltas[nombre])
+
+
+def cambio_estado(anterior, nuevo):
+    deltas = Counter()
+    if anterior:
+        deltas[PREFIJO_ESTADO + anterior] -= 1
+    if nuevo:
+        deltas[PREFIJO_ESTADO + nuevo] += 1
+    sumar(deltas)
+
+
+def incidencias_creadas(incidencias):
+    """Versión masiva para incidencias insertadas con bulk_create."""
+    sumar(Counter(PREFIJO_ESTADO + inc.estado for inc in incidencias))
+
+
+def valores(prefijo=""):
+    return dict(
+        ContadorMetrica.objects.filter(nombre__startswith=prefijo).values_list("nombre", "valor")
+    )
+
+
+def recalcular():
+    """Reconstruye todos los contadores desde las tablas (COUNT completo, usar fuera de hora punta)."""
+    conteos = {
+        PREFIJO_ESTADO + estado: n
+        for estado, n in Incidencia.objects.order_by().values_list("estado").annotate(n=Count("id"))
+    }
+    conteos[ALERTAS_PENDIENTES] = AlertaSla.objects.filter(enviadaEl__isnull=True).count()
+    with transaction.atomic():
+        ContadorMetrica.objects.all().delete()
+        ContadorMetrica.objects.bulk_create(
+            [ContadorMetrica(nombre=n, valor=v) for n, v in conteos.items()]
+        )
+    return conteos
@@ -0,0 +1,74 @@
+"""
+Claves para la caché de fragmentos de plantilla (``{% cache %}``).
+
+- Barra de navegación: su contenido solo depende del conjunto de roles del
+  usuario (bits de ``core.permisos``) y de la sección activa, así que se
+  guarda una vez por combinación y nunca queda vieja; es correcta mientras
+  los bits lo sean, y estos se invalidan en la caché compartida.
+- Paneles de cifras de los dashboards: la clave lleva una versión por alcance
+  (``global`` o ``departamento:<id>``) que signals.py cambia al confirmarse
+  cada cambio de incidencias y usuarios; ``invalidar_paneles()`` sin alcances
+  (cargas masivas) cambia la generación y con ella todas las claves.
+
+Las versiones viven en la caché ``default``, compartida por todos los workers
+(core/checks.py rechaza una caché por proceso). Un panel puede quedar viejo
+hasta ``TIMEOUT_PANELES`` solo si el cambio no pasó por signals
+(``QuerySet.update``) o si se armó leyendo una réplica atrasada
+(encuestas.db_router).
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import permisos
+
+TIMEOUT_PANELES = 60 * 2
+
+# Prefijos de request.path que marcan un enlace activo en base.html (un path calza con uno solo)
+SECCIONES_NAV = (
+    "/personas/dashboard/admin",
+    "/personas/dashboard/direccion",
+    "/personas/dashboard/departamento",
+    "/personas/dashboard/territorial",
+    "/personas/dashboard/jefe",
+    "/personas/check_profile",
+    "/personas/usuarios",
+    "/core/usuarios",
+    "/organizacion/departamento",
+    "/organizacion/direccion",
+    "/accounts/login",
+    "/login",
+)
+
+
+def seccion_nav(path):
+    for prefijo in SECCIONES_NAV:
+        if (path or "").startswith(prefijo):
+            return prefijo
+    return ""
+
+
+def clave_nav(user, path):
+    return f"{permisos.de(user) & permisos.MASCARA_ROLES}|{seccion_nav(path)}"
+
+
+def _clave_version(alcance):
+    return f"fragmentos:paneles:{alcance}"
+
+
+def clave_panel(alcance):
+    """Parte variable de la clave ``{% cache %}`` de un panel del alcance dado."""
+    claves = [_clave_version("generacion"), _clave_version(alcance)]
+    valores = cache.get_many(claves)
+    faltan = {c: uuid.uuid4().hex for c in claves if c not in valores}
+    if faltan:
+        cache.set_many(faltan, None)
+        valores.update(faltan)
+    return f"{alcance}:{valores[claves[0]]}:{valores[claves[1]]}"
+
+
+def invalidar_paneles(*alcances):
+    # Tras el commit: antes, otro proceso podría armar el panel con las cifras viejas bajo la versión nueva
+    claves = [_clave_version(a) for a in alcances or ("generacion",)]
+    transaction.on_commit(lambda: cache.set_many({c: uuid.uuid4().hex for c in claves}, None))
@@ -0,0 +1,49 @@
+"""
+Escritura del historial de transiciones de incidencias.
+
+Todas las rutas que cambian ``Incidencia.estado`` (vistas web, API, admin,
+comandos) deben llamar a ``registrar_transicion`` dentro de la misma
+transacción en que guardan la incidencia. Las cargas masivas usan
+``registrar_transiciones`` (un solo ``bulk_create``).
+"""
+from django.db import transaction
+
+from .models import HistorialIncidencia
+
+
+def _usuario_id(usuario):
+    if usuario is None or not getattr(usuario, "is_authenticated", False):
+        return None
+    return usuario.pk
+
+
+def nueva_transicion(incidencia, estado_anterior, usuario=None, comentario="", fecha=None):
+    """Construye (sin guardar) una fila de historial."""
+    entrada = HistorialIncidencia(
+        incidencia_id=incidencia.pk,
+        estado_anterior=estado_anterior,
+        estado_nuevo=incidencia.estado,
+        usuario_id=_usuario_id(usuario),
+        comentario=comentario or "",
+    )
+    if fecha is not None:
+        entrada.fecha = fecha
+    return entrada
+
+
+def registrar_transicion(incidencia, estado_anterior, usuario=None, comentario="", fecha=None):
+    """
+    Registra el paso de ``estado_anterior`` al estado actual de la incidencia.
+    No escribe nada si el estado no cambió y no hay comentario.
+    """
+    if estado_anterior == incidencia.estado and not comentario:
+        return None
+    entrada = nueva_transicion(incidencia, estado_anterior, usuario, comentario, fecha)
+    entrada.save()
+    return entrada
+
+
+def registrar_transiciones(entradas, batch_size=1000):
+    """Inserta muchas filas de historial en bloque (importaciones, conversiones)."""
+    with transaction.atomic():
+        return HistorialIncidencia.objects.bulk_create(entradas, batch_size=batch_size)
@@ -0,0 +1,181 @@
+"""
+Instrumentación de consultas SQL por request (sin DEBUG=True).
+
+``InstrumentacionConsultasMiddleware`` envuelve cada request con
+``connection.execute_wrapper`` para contar consultas y medir su tiempo, agrega
+un encabezado ``Server-Timing`` y acumula por nombre de vista (p. ej.
+``incidencias:incidencias_lista``): cada proceso suma en memoria y cada
+``INTERVALO_VOLCADO`` segundos lo vuelca a la tabla ``ConsultasVista`` con
+``UPDATE ... SET n = n + x`` (sin bloqueos), así suman todos los workers sin
+agregar una escritura por request. Un fallo al volcar queda en el log y nunca
+llega a la respuesta. Se activa con ``INSTRUMENTAR_CONSULTAS = True``; el resumen se ve
+en /core/metricas/consultas/.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import ConsultasVista
+
+LENTAS_POR_VISTA = 5
+LARGO_SQL = 500
+INTERVALO_VOLCADO = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+class _Medidor:
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.lentas = []  # [(ms, sql)] las más lentas del request
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.tiempo += ms
+            if len(self.lentas) < LENTAS_POR_VISTA or ms > self.lentas[-1][0]:
+                self.lentas.append((round(ms, 2), sql[:LARGO_SQL]))
+                self.lentas.sort(key=lambda x: x[0], reverse=True)
+                del self.lentas[LENTAS_POR_VISTA:]
+
+
+class _Pendientes:
+    """Cifras del proceso que aún no se vuelcan a ``ConsultasVista``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.datos = {}
+        self.ultimo_volcado = time.monotonic()
+
+    def sumar(self, vista, medidor, total_ms):
+        with self.lock:
+            d = self.datos.setdefault(vista, {
+                "requests": 0, "consultas": 0, "consultas_max": 0, "sql_ms": 0.0, "total_ms": 0.0, "lentas": {},
+            })
+            d["requests"] += 1
+            d["consultas"] += medidor.consultas
+            d["consultas_max"] = max(d["consultas_max"], medidor.consultas)
+            d["sql_ms"] += medidor.tiempo
+            d["total_ms"] += total_ms
+            for ms, sql in medidor.lentas:
+                d["lentas"][sql] = max(ms, d["lentas"].get(sql, 0))
+
+    def tomar(self, forzar=False):
+        with self.lock:
+            ahora = time.monotonic()
+            if not forzar and ahora - self.ultimo_volcado < INTERVALO_VOLCADO:
+                return {}
+            self.ultimo_volcado = ahora
+            datos, self.datos = self.datos, {}
+        return datos
+
+
+pendientes = _Pendientes()
+
+
+def _escribir(datos):
+    # Sumas con F() sin bloquear la fila; la lista de lentas es aproximada (gana el último que escribe)
+    ConsultasVista.objects.bulk_create([ConsultasVista(vista=v) for v in datos], ignore_conflicts=True)
+    guardadas = dict(ConsultasVista.objects.filter(vista__in=list(datos)).values_list("vista", "lentas"))
+    for vista, d in datos.items():
+        lentas = {sql: ms for ms, sql in guardadas.get(vista) or []}
+        for sql, ms in d["lentas"].items():
+            lentas[sql] = max(ms, lentas.get(sql, 0))
+        ConsultasVista.objects.filter(vista=vista).update(
+            requests=F("requests") + d["requests"],
+            consultas=F("consultas") + d["consultas"],
+            consultas_max=Greatest("consultas_max", Value(d["consultas_max"])),
+            sql_ms=F("sql_ms") + d["sql_ms"],
+            total_ms=F("total_ms") + d["total_ms"],
+            lentas=sorted(([ms, sql] for sql, ms in lentas.items()), reverse=True)[:LENTAS_POR_VISTA],
+        )
+
+
+def volcar(forzar=False):
+    """Escribe lo acumulado si pasó ``INTERVALO_VOLCADO``; un fallo se registra en el log y se descarta."""
+    datos = pendientes.tomar(forzar)
+    if not datos:
+        return
+    try:
+        _escribir(datos)
+    except Exception:
+        logger.exception("No se pudieron guardar las métricas de consultas")
+
+
+def registrar(vista, medidor, total_ms):
+    """Suma las cifras del request en memoria del proceso y cada tanto las vuelca a la tabla."""
+    pendientes.sumar(vista, medidor, total_ms)
+    volcar()
+
+
+def resumen():
+    """Lista de vistas ordenada por tiempo SQL total, con promedios."""
+    volcar(forzar=True)
+    filas = list(ConsultasVista.objects.order_by("-sql_ms").values())
+    for d in filas:
+        d["consultas_prom"] = round(d["consultas"] / d["requests"], 1)
+        d["sql_ms_prom"] = round(d["sql_ms"] / d["requests"], 2)
+        d["total_ms_prom"] = round(d["total_ms"] / d["requests"], 2)
+    return filas
+
+
+def reiniciar():
+    pendientes.tomar(forzar=True)
+    ConsultasVista.objects.all().delete()
+
+
+class InstrumentacionConsultasMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTAR_CONSULTAS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medidor = _Medidor()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(medidor))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        response["Server-Timing"] = (
+            f'db;dur={medidor.tiempo:.1f};desc="{medidor.consultas} consultas", app;dur={total_ms:.1f}'
+        )
+        match = getattr(request, "resolver_match", None)
+        vista = match.view_name if match is not None else None
+        if response.streaming and not response.is_async:
+            # Las consultas de una descarga (core.exportar) corren al iterar el cuerpo, después de este
+            # __call__: se miden ahí y la vista se registra al terminar (Server-Timing no las incluye)
+            response.streaming_content = self._medir_cuerpo(response.streaming_content, medidor, inicio, vista)
+        elif vista:
+            registrar(vista, medidor, total_ms)
+        return response
+
+    @staticmethod
+    def _medir_cuerpo(contenido, medidor, inicio, vista):
+        partes = iter(contenido)
+        try:
+            while True:
+                with ExitStack() as stack:
+                    for conexion in connections.all():
+                        stack.enter_context(conexion.execute_wrapper(medidor))
+                    parte = next(partes, None)
+                if parte is None:
+                    return
+                yield parte
+        finally:
+            if vista:
+                registrar(vista, medidor, (time.perf_counter() - inicio) * 1000)
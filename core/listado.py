@@ -0,0 +1,122 @@
+"""
+Modelo de lectura del listado de incidencias (``IncidenciaListado``).
+
+Con ``settings.LISTADO_DESNORMALIZADO`` activo, incidencias_lista lee y filtra
+una sola tabla en vez de unir departamento y cuadrilla y buscar evidencias.
+Las filas se escriben en la misma transacción que el cambio: signals de
+``Incidencia``, ``Multimedia``, ``Departamento`` y ``JefeCuadrilla`` y las rutas
+masivas (importación, conversión de encuestas, semillas). Los nombres se
+leen de la base en esa transacción (no del catálogo de core.referencias, que
+puede venir atrasado en otro proceso). Al activarlo sobre datos existentes, o si
+alguna vez se desalinea, ``reconstruir()`` (comando ``reconstruir_listado``)
+la rehace desde las tablas.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Departamento, Incidencia, IncidenciaListado, JefeCuadrilla
+
+BATCH_SIZE = 1000
+
+
+def activo():
+    return getattr(settings, "LISTADO_DESNORMALIZADO", False)
+
+
+def _nombres(incidencias):
+    """``({departamento_id: nombre}, {cuadrilla_id: nombre})`` de las incidencias dadas (hasta dos consultas)."""
+    departamentos = {i.departamento_id for i in incidencias if i.departamento_id}
+    cuadrillas = {i.cuadrilla_id for i in incidencias if i.cuadrilla_id}
+    return (
+        dict(Departamento.objects.filter(pk__in=departamentos).values_list("pk", "nombre_departamento"))
+        if departamentos else {},
+        dict(JefeCuadrilla.objects.filter(pk__in=cuadrillas).values_list("pk", "nombre_cuadrilla"))
+        if cuadrillas else {},
+    )
+
+
+def _campos(incidencia, nombres):
+    departamentos, cuadrillas = nombres
+    return {
+        "titulo": incidencia.titulo,
+        "estado": incidencia.estado,
+        "prioridad": incidencia.prioridad,
+        "creadoEl": incidencia.creadoEl,
+        "fecha_cierre": incidencia.fecha_cierre,
+        "departamento_id": incidencia.departamento_id,
+        "cuadrilla_id": incidencia.cuadrilla_id,
+        "correo_vecino": incidencia.correo_vecino or "",
+        "departamento_nombre": departamentos.get(incidencia.departamento_id, ""),
+        "cuadrilla_nombre": cuadrillas.get(incidencia.cuadrilla_id, ""),
+    }
+
+
+def actualizar(incidencia):
+    """Inserta o reescribe la fila de una incidencia (conserva la cantidad de evidencias)."""
+    if not activo():
+        return
+    IncidenciaListado.objects.update_or_create(
+        incidencia_id=incidencia.pk, defaults=_campos(incidencia, _nombres([incidencia]))
+    )
+
+
+def incidencias_creadas(incidencias, evidencias=None, batch_size=BATCH_SIZE):
+    """Versión masiva para incidencias insertadas con bulk_create; ``evidencias`` es ``{incidencia_id: n}``."""
+    if not activo():
+        return
+    evidencias = evidencias or {}
+    nombres = _nombres(incidencias)
+    IncidenciaListado.objects.bulk_create(
+        [
+            IncidenciaListado(
+                incidencia_id=inc.pk, cantidad_evidencias=evidencias.get(inc.pk, 0), **_campos(inc, nombres)
+            )
+            for inc in incidencias
+        ],
+        batch_size=batch_size,
+    )
+
+
+def sumar_evidencias(incidencia_id, delta):
+    if activo():
+        IncidenciaListado.objects.filter(incidencia_id=incidencia_id).update(
+            cantidad_evidencias=F("cantidad_evidencias") + delta
+        )
+
+
+def renombrar(campo, pk, nombre):
+    """Propaga el nuevo nombre de un departamento o cuadrilla (``campo`` es 'departamento' o 'cuadrilla')."""
+    if activo():
+        IncidenciaListado.objects.filter(**{f"{campo}_id": pk}).update(**{f"{campo}_nombre": nombre})
+
+
+def desvincular(campo, pk):
+    # Incidencia.<campo> es SET_NULL, que se aplica con un UPDATE sin signals
+    if activo():
+        IncidenciaListado.objects.filter(**{f"{campo}_id": pk}).update(**{f"{campo}_id": None, f"{campo}_nombre": ""})
+
+
+def reconstruir(batch_size=BATCH_SIZE):
+    """Rehace la tabla completa desde core_incidencia (usar fuera de hora punta). Devuelve las filas escritas."""
+    total = 0
+    qs = Incidencia.objects.order_by("pk").annotate(evidencias=Count("multimedias"))
+    with transaction.atomic():
+        IncidenciaListado.objects.all().delete()
+        lote = []
+        for inc in qs.iterator(chunk_size=batch_size):
+            lote.append(inc)
+            if len(lote) >= batch_size:
+                total += _escribir_lote(lote)
+                lote = []
+        total += _escribir_lote(lote)
+    return total
+
+
+def _escribir_lote(incidencias):
+    nombres = _nombres(incidencias)
+    IncidenciaListado.objects.bulk_create([
+        IncidenciaListado(incidencia_id=inc.pk, cantidad_evidencias=inc.evidencias, **_campos(inc, nombres))
+        for inc in incidencias
+    ])
+    return len(incidencias)
@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from core.benchmark import ESCENARIOS, medir_concurrencia
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y conexiones a PostgreSQL con varios clientes concurrentes (compara DB_POOL_MODE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, action='append', help='Clientes concurrentes (se puede repetir; por defecto 8)')
+        parser.add_argument('--peticiones', type=int, default=20, help='Peticiones por cliente')
+        parser.add_argument('--solo', action='append', help='Nombre de escenario (se puede repetir; por defecto incidencias_lista_admin)')
+        parser.add_argument('--json', help='Guarda los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        nombres = options['solo'] or ['incidencias_lista_admin']
+        escenarios = [e for e in ESCENARIOS if e.nombre in nombres]
+        if not escenarios:
+            raise CommandError("Ningún escenario coincide con --solo")
+
+        # Permite usar el Client de pruebas (host 'testserver') contra la base real
+        setup_test_environment()
+        self.stdout.write(f"DB_POOL_MODE={settings.DB_POOL_MODE}")
+        self.stdout.write(
+            f"{'escenario':34} {'hilos':>5} {'errores':>7} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'conexiones':>10}"
+        )
+        resultados = []
+        for escenario in escenarios:
+            for hilos in options['hilos'] or [8]:
+                r = medir_concurrencia(escenario, hilos, options['peticiones'])
+                if r is None:
+                    self.stdout.write(self.style.WARNING(f"{escenario.nombre:34} omitido (sin usuario o datos)"))
+                    break
+                resultados.append(r)
+                conexiones = "-" if r['conexiones_max'] is None else f"{r['conexiones_antes']}→{r['conexiones_max']}"
+                linea = (
+                    f"{r['escenario']:34} {r['hilos']:>5} {r['errores']:>7} {r['rps']:>7} "
+                    f"{r['p50_ms']:>9} {r['p95_ms']:>9} {conexiones:>10}"
+                )
+                self.stdout.write(self.style.ERROR(linea) if r['errores'] else linea)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
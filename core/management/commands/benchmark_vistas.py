@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from core.benchmark import ESCENARIOS, comparar, medir
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas SQL y latencia (p50/p95) de las vistas y endpoints principales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=10)
+        parser.add_argument('--calentamiento', type=int, default=1, help='Requests previos no medidos')
+        parser.add_argument('--solo', action='append', help='Nombre de escenario (se puede repetir)')
+        parser.add_argument('--json', help='Guarda los resultados en este archivo')
+        parser.add_argument('--base', help='JSON de una corrida anterior para comparar')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Aumento de p95 aceptado (0.2 = 20 %%)')
+
+    def handle(self, *args, **options):
+        escenarios = ESCENARIOS
+        if options['solo']:
+            escenarios = [e for e in ESCENARIOS if e.nombre in options['solo']]
+            if not escenarios:
+                raise CommandError("Ningún escenario coincide con --solo")
+
+        # Permite usar el Client de pruebas (host 'testserver') contra la base real
+        setup_test_environment()
+        resultados = []
+        self.stdout.write(f"{'escenario':34} {'código':>6} {'consultas':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for escenario in escenarios:
+            r = medir(escenario, options['iteraciones'], options['calentamiento'])
+            if r is None:
+                self.stdout.write(self.style.WARNING(f"{escenario.nombre:34} omitido (sin usuario o datos)"))
+                continue
+            resultados.append(r)
+            linea = f"{r['escenario']:34} {r['codigo']:>6} {r['consultas']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9}"
+            self.stdout.write(linea if r['codigo'] < 400 else self.style.ERROR(linea))
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+        if options['base']:
+            try:
+                with open(options['base'], encoding='utf-8') as f:
+                    base = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base: {e}")
+            regresiones = comparar(resultados, base, options['tolerancia'])
+            if regresiones:
+                for r in regresiones:
+                    self.stdout.write(self.style.ERROR(f"  ✗ {r}"))
+                raise CommandError(f"{len(regresiones)} regresiones respecto de {options['base']}")
+            self.stdout.write(self.style.SUCCESS("✅ Sin regresiones respecto de la línea base"))
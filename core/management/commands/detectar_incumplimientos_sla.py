@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core import sla
+
+
+class Command(BaseCommand):
+    help = (
+        "Detecta incidencias que superaron el SLA de su estado y encola alertas. "
+        "Pensado para ejecutarse periódicamente (cron cada pocos minutos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Tramos procesados por transacción.")
+        parser.add_argument("--enviar", action="store_true", help="Envía por correo las alertas pendientes.")
+        parser.add_argument(
+            "--inicializar",
+            action="store_true",
+            help="Abre el tramo actual de las incidencias que aún no tienen uno (primera ejecución).",
+        )
+
+    def handle(self, *args, **options):
+        if options["inicializar"]:
+            abiertos = sla.inicializar_tramos()
+            self.stdout.write(f"Tramos inicializados: {abiertos}")
+
+        encoladas = sla.encolar_alertas(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"Alertas SLA encoladas: {encoladas}"))
+
+        if options["enviar"]:
+            enviadas = sla.enviar_alertas_pendientes()
+            self.stdout.write(self.style.SUCCESS(f"Alertas SLA enviadas: {enviadas}"))
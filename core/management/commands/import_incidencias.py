@@ -0,0 +1,51 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from incidencias.importacion import ImportadorIncidencias
+
+
+class Command(BaseCommand):
+    help = 'Importa incidencias desde un CSV de un sistema legado (inserción masiva por lotes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con encabezado)')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por lote/transacción')
+        parser.add_argument('--usuario', help='Username que queda registrado en el historial')
+        parser.add_argument('--validar', action='store_true', help='Solo valida, no inserta nada')
+        parser.add_argument('--errores', help='Escribe las filas con error en este CSV')
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario '{options['usuario']}'")
+
+        importador = ImportadorIncidencias(
+            usuario=usuario, batch_size=options['lote'], validar_solo=options['validar']
+        )
+        try:
+            with open(options['archivo'], newline='', encoding='utf-8-sig') as archivo:
+                resultado = importador.importar(archivo)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['errores'] and resultado.errores:
+            with open(options['errores'], 'w', newline='', encoding='utf-8') as salida:
+                writer = csv.writer(salida)
+                writer.writerow(['linea', 'error'])
+                writer.writerows(resultado.errores)
+        else:
+            for linea, mensaje in resultado.errores[:50]:
+                self.stdout.write(self.style.WARNING(f"  Línea {linea}: {mensaje}"))
+            if len(resultado.errores) > 50:
+                self.stdout.write(f"  ... y {len(resultado.errores) - 50} errores más (usa --errores)")
+
+        accion = 'válidas' if options['validar'] else 'creadas'
+        total = resultado.validas if options['validar'] else resultado.creadas
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado.leidas} filas leídas, {total} incidencias {accion}, "
+            f"{len(resultado.errores)} con error"
+        ))
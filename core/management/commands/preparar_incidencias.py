@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from core.models import Incidencia, JefeCuadrilla
+from core.historial import registrar_transicion
 
 class Command(BaseCommand):
     help = 'Asigna cuadrilla a incidencias y las pone en proceso'
@@ -34,7 +36,9 @@ class Command(BaseCommand):
         count2 = 0
         for inc in pendientes:
             inc.estado = 'en_proceso'
-            inc.save()
+            with transaction.atomic():
+                inc.save()
+                registrar_transicion(inc, 'pendiente', comentario="preparar_incidencias")
             count2 += 1
             self.stdout.write(f"  ✅ #{inc.id} → en_proceso")
         
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de /api/metrics/ (incidencias por estado, cola de alertas) desde las tablas'
+
+    def handle(self, *args, **options):
+        conteos = contadores.recalcular()
+        for nombre, valor in sorted(conteos.items()):
+            self.stdout.write(f"  {nombre} = {valor}")
+        self.stdout.write(self.style.SUCCESS("✅ Contadores recalculados"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from territorial_app import agregados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resultados precalculados (AgregadoRespuesta) desde las respuestas guardadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--encuesta', type=int, help='Solo esta encuesta (id)')
+
+    def handle(self, *args, **options):
+        filas = agregados.reconstruir(options['encuesta'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {filas} filas de resultados recalculadas"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import listado
+
+
+class Command(BaseCommand):
+    help = 'Rehace core.IncidenciaListado (listado desnormalizado de incidencias) desde las tablas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=listado.BATCH_SIZE, help='Filas por bulk_create')
+
+    def handle(self, *args, **options):
+        total = listado.reconstruir(batch_size=options['lote'])
+        if not listado.activo():
+            self.stdout.write(self.style.WARNING(
+                "LISTADO_DESNORMALIZADO está desactivado: la tabla no se mantendrá hasta activarlo"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} filas en el listado"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.semillas import PASSWORD, Escala, sembrar_municipio
+
+
+class Command(BaseCommand):
+    help = 'Genera un municipio sintético (usuarios, estructura, incidencias, encuestas) para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incidencias', type=int, default=1000, help='Total de incidencias (p. ej. 1000000)')
+        parser.add_argument('--encuestas', type=int, default=20)
+        parser.add_argument('--respuestas-por-encuesta', type=int, default=10, help='Formularios respondidos por encuesta')
+        parser.add_argument('--direcciones', type=int, default=3)
+        parser.add_argument('--departamentos', type=int, default=3, help='Departamentos por dirección')
+        parser.add_argument('--cuadrillas', type=int, default=2, help='Cuadrillas por departamento')
+        parser.add_argument('--territoriales', type=int, default=10, help='Usuarios territoriales')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador (datos reproducibles)')
+        parser.add_argument('--lote', type=int, default=5000, help='Incidencias por lote/transacción')
+        parser.add_argument('--prefijo', default='seed', help='Prefijo de usernames y nombres generados')
+
+    def handle(self, *args, **options):
+        escala = Escala(
+            direcciones=options['direcciones'],
+            departamentos=options['departamentos'],
+            cuadrillas=options['cuadrillas'],
+            territoriales=options['territoriales'],
+            incidencias=options['incidencias'],
+            encuestas=options['encuestas'],
+            envios=options['respuestas_por_encuesta'],
+            lote=options['lote'],
+        )
+        try:
+            totales = sembrar_municipio(
+                escala, semilla=options['semilla'], prefijo=options['prefijo'], log=self.stdout.write
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for nombre, valor in totales.items():
+            self.stdout.write(f"  {nombre}: {valor}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Municipio '{options['prefijo']}' creado (contraseña de todos los usuarios: {PASSWORD})"
+        ))
@@ -0,0 +1,301 @@
+"""
+Métricas en formato de texto de Prometheus para /api/metrics/.
+
+Cada proceso (worker de gunicorn) acumula sus contadores e histogramas en
+memoria y los vuelca, como mucho una vez por segundo, a un archivo propio
+``<host>-<pid>-<token>.json`` en ``METRICAS_DIR`` (escritura atómica con
+``os.replace``); el token al azar evita que un PID reutilizado o un contenedor
+que comparte el directorio pise el archivo de otro proceso. El endpoint suma
+los archivos de todos los procesos, así cualquier worker responde con el
+total. Los archivos de procesos muertos del mismo host se pliegan en
+``total.json`` (bajo ``flock``) y se borran, así los contadores nunca bajan.
+Los contadores de dominio salen de ``ContadorMetrica``.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import contadores
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin plegado, los archivos quedan
+    fcntl = None
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+INTERVALO_VOLCADO = 1.0
+TOTAL = "total.json"
+HOST = socket.gethostname().replace("-", "_")
+
+AYUDA = {
+    "http_requests_total": ("counter", "Requests atendidos por ruta, método y código."),
+    "http_request_duration_seconds": ("histogram", "Latencia de requests por ruta."),
+    "db_consultas_por_request": ("histogram", "Consultas SQL por request, por ruta."),
+    "upload_bytes_total": ("counter", "Bytes recibidos en requests multipart (subidas de archivos)."),
+}
+
+
+def directorio():
+    ruta = getattr(settings, "METRICAS_DIR", None) or os.path.join(tempfile.gettempdir(), "muni_metricas")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def _escribir(ruta, contenido):
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+
+@contextmanager
+def _candado(base, modo):
+    """``flock`` sobre el directorio: exclusivo para plegar, compartido para leer."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(base, "total.lock"), "a") as f:
+        fcntl.flock(f, modo)
+        yield
+
+
+def _clave(nombre, etiquetas):
+    return nombre + "|" + json.dumps(sorted(etiquetas.items()))
+
+
+class _Almacen:
+    """Métricas del proceso actual."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.datos = {}
+        self.ultimo_volcado = 0.0
+        self._nuevo_archivo()
+
+    def _nuevo_archivo(self):
+        self.pid = os.getpid()
+        self.archivo = f"{HOST}-{self.pid}-{uuid.uuid4().hex[:12]}.json"
+
+    def _reiniciar_si_fork(self):
+        # Tras un fork (preload de gunicorn) el hijo empieza de cero con su propio archivo
+        if os.getpid() != self.pid:
+            self._nuevo_archivo()
+            self.datos = {}
+
+    def incrementar(self, nombre, etiquetas, valor=1):
+        with self.lock:
+            self._reiniciar_si_fork()
+            clave = _clave(nombre, etiquetas)
+            self.datos[clave] = self.datos.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor, buckets):
+        with self.lock:
+            self._reiniciar_si_fork()
+            clave = _clave(nombre, etiquetas)
+            h = self.datos.get(clave)
+            if h is None:
+                h = self.datos[clave] = {"buckets": [0] * len(buckets), "suma": 0.0, "conteo": 0}
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    h["buckets"][i] += 1
+            h["suma"] += valor
+            h["conteo"] += 1
+
+    def volcar(self, forzar=False):
+        ahora = time.monotonic()
+        with self.lock:
+            if not forzar and ahora - self.ultimo_volcado < INTERVALO_VOLCADO:
+                return
+            self._reiniciar_si_fork()
+            self.ultimo_volcado = ahora
+            contenido = json.dumps(self.datos)
+            archivo = self.archivo
+        _escribir(os.path.join(directorio(), archivo), contenido)
+
+
+almacen = _Almacen()
+
+
+def _leer(ruta):
+    try:
+        with open(ruta) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _sumar(total, datos):
+    for clave, valor in datos.items():
+        if isinstance(valor, dict):
+            actual = total.setdefault(clave, {"buckets": [0] * len(valor["buckets"]), "suma": 0.0, "conteo": 0})
+            actual["buckets"] = [a + b for a, b in zip(actual["buckets"], valor["buckets"])]
+            actual["suma"] += valor["suma"]
+            actual["conteo"] += valor["conteo"]
+        else:
+            total[clave] = total.get(clave, 0) + valor
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _muertos(base):
+    """Archivos de procesos de este host que ya no existen (de otros hosts no se puede saber)."""
+    muertos = []
+    for nombre in os.listdir(base):
+        if not nombre.endswith(".json"):
+            continue
+        partes = nombre[:-len(".json")].split("-")
+        if len(partes) != 3 or partes[0] != HOST or not partes[1].isdigit():
+            continue
+        if int(partes[1]) != os.getpid() and not _vivo(int(partes[1])):
+            muertos.append(nombre)
+    return muertos
+
+
+def _plegar_muertos(base):
+    """
+    Suma los archivos de procesos muertos a ``total.json`` y los borra. ``plegados``
+    recuerda lo ya sumado por si el proceso cae entre escribir el total y borrar.
+    """
+    if fcntl is None or not _muertos(base):
+        return
+    with _candado(base, fcntl.LOCK_EX):
+        ruta = os.path.join(base, TOTAL)
+        total = _leer(ruta) or {"datos": {}, "plegados": []}
+        for nombre in _muertos(base):
+            if nombre not in total["plegados"]:
+                datos = _leer(os.path.join(base, nombre))
+                if datos is not None:
+                    _sumar(total["datos"], datos)
+                total["plegados"].append(nombre)
+        _escribir(ruta, json.dumps(total))
+        for nombre in total["plegados"]:
+            try:
+                os.remove(os.path.join(base, nombre))
+            except FileNotFoundError:
+                pass
+        total["plegados"] = []
+        _escribir(ruta, json.dumps(total))
+
+
+def _combinar():
+    """Suma el total plegado y los archivos de todos los procesos vivos."""
+    base = directorio()
+    _plegar_muertos(base)
+    total = {}
+    with _candado(base, fcntl.LOCK_SH if fcntl else None):
+        guardado = _leer(os.path.join(base, TOTAL)) or {"datos": {}, "plegados": []}
+        _sumar(total, guardado["datos"])
+        for nombre in os.listdir(base):
+            if nombre != TOTAL and nombre.endswith(".json") and nombre not in guardado["plegados"]:
+                datos = _leer(os.path.join(base, nombre))
+                if datos is not None:
+                    _sumar(total, datos)
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares, extra=None):
+    pares = list(pares) + (extra or [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _formatear(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def exposicion():
+    """Texto completo en formato de exposición de Prometheus (versión 0.0.4)."""
+    almacen.volcar(forzar=True)
+    por_nombre = {}
+    for clave, valor in _combinar().items():
+        nombre, etiquetas = clave.split("|", 1)
+        por_nombre.setdefault(nombre, []).append((json.loads(etiquetas), valor))
+
+    lineas = []
+    for nombre in sorted(por_nombre):
+        tipo, ayuda = AYUDA.get(nombre, ("untyped", ""))
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        buckets = BUCKETS_CONSULTAS if nombre == "db_consultas_por_request" else BUCKETS_LATENCIA
+        for etiquetas, valor in sorted(por_nombre[nombre], key=lambda x: x[0]):
+            if isinstance(valor, dict):
+                for limite, n in zip(buckets, valor["buckets"]):
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, [('le', limite)])} {n}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, [('le', '+Inf')])} {valor['conteo']}")
+                lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_formatear(valor['suma'])}")
+                lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {valor['conteo']}")
+            else:
+                lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_formatear(valor)}")
+
+    # Contadores de dominio (tabla ContadorMetrica, sin COUNT sobre tablas grandes)
+    valores = contadores.valores()
+    lineas.append("# HELP incidencias_por_estado Incidencias existentes por estado.")
+    lineas.append("# TYPE incidencias_por_estado gauge")
+    for nombre, valor in sorted(valores.items()):
+        if nombre.startswith(contadores.PREFIJO_ESTADO):
+            estado = nombre[len(contadores.PREFIJO_ESTADO):]
+            lineas.append(f"incidencias_por_estado{_etiquetas([('estado', estado)])} {valor}")
+    lineas.append("# HELP correo_cola_alertas_sla Alertas SLA encoladas pendientes de envío por correo.")
+    lineas.append("# TYPE correo_cola_alertas_sla gauge")
+    lineas.append(f"correo_cola_alertas_sla {valores.get(contadores.ALERTAS_PENDIENTES, 0)}")
+    return "\n".join(lineas) + "\n"
+
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.n += 1
+        return execute(sql, params, many, context)
+
+
+class MetricasMiddleware:
+    """Registra latencia, consultas y bytes subidos de cada request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(consultas))
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        match = getattr(request, "resolver_match", None)
+        # Solo rutas resueltas: los 404 de URLs arbitrarias no crean series nuevas
+        ruta = match.view_name if match is not None and match.view_name else "sin_ruta"
+        almacen.incrementar(
+            "http_requests_total", {"ruta": ruta, "metodo": request.method, "codigo": response.status_code}
+        )
+        almacen.observar("http_request_duration_seconds", {"ruta": ruta}, duracion, BUCKETS_LATENCIA)
+        almacen.observar("db_consultas_por_request", {"ruta": ruta}, consultas.n, BUCKETS_CONSULTAS)
+        if request.content_type == "multipart/form-data":
+            almacen.incrementar("upload_bytes_total", {"ruta": ruta}, int(request.META.get("CONTENT_LENGTH") or 0))
+        almacen.volcar()
+        return response
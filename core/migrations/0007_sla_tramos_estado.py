@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_encuesta_audio_url_encuesta_celular_vecino_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlaIncidencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_gravedad', models.CharField(choices=[('A', 'Alta'), ('M', 'Media'), ('B', 'Baja')], max_length=1)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('finalizada', 'Finalizada'), ('validada', 'Validada'), ('rechazada', 'Rechazada')], max_length=50)),
+                ('horas_limite', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tipo_gravedad', 'estado'), name='sla_gravedad_estado_uq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TramoEstadoIncidencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(max_length=50)),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('vence', models.DateTimeField(blank=True, null=True)),
+                ('alerta_encolada', models.BooleanField(default=False)),
+                ('incidencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tramos_estado', to='core.incidencia')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertaSla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creadoEl', models.DateTimeField(auto_now_add=True)),
+                ('enviadaEl', models.DateTimeField(blank=True, null=True)),
+                ('incidencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_sla', to='core.incidencia')),
+                ('tramo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerta', to='core.tramoestadoincidencia')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tramoestadoincidencia',
+            index=models.Index(fields=['incidencia', 'inicio'], name='tramo_incidencia_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tramoestadoincidencia',
+            index=models.Index(condition=models.Q(('alerta_encolada', False), ('fin__isnull', True), ('vence__isnull', False)), fields=['vence'], name='tramo_sla_abierto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertasla',
+            index=models.Index(condition=models.Q(('enviadaEl__isnull', True)), fields=['creadoEl'], name='alerta_sla_pendiente_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sla_tramos_estado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialIncidencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, max_length=20, null=True)),
+                ('estado_nuevo', models.CharField(max_length=20)),
+                ('comentario', models.TextField(blank=True, default='')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('incidencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial', to='core.incidencia')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['fecha', 'id'],
+                'indexes': [models.Index(fields=['incidencia', 'fecha'], name='historial_incidencia_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_historial_incidencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioEncuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_cliente', models.UUIDField(blank=True, null=True, unique=True)),
+                ('respondidoEl', models.DateTimeField(default=django.utils.timezone.now)),
+                ('recibidoEl', models.DateTimeField(auto_now_add=True)),
+                ('encuesta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios', to='core.encuesta')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='envio',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='respuestas', to='core.envioencuesta'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_envio_encuesta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregadoRespuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.CharField(blank=True, default='', max_length=200)),
+                ('conteo', models.PositiveIntegerField(default=0)),
+                ('suma', models.FloatField(default=0)),
+                ('suma_cuadrados', models.FloatField(default=0)),
+                ('minimo', models.FloatField(blank=True, null=True)),
+                ('maximo', models.FloatField(blank=True, null=True)),
+                ('pregunta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregados', to='core.preguntaencuesta')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pregunta', 'valor'), name='agregado_pregunta_valor_uq')],
+            },
+        ),
+    ]
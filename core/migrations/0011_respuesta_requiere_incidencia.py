@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_agregado_respuesta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='requiere_incidencia',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+def solo_postgresql(sql):
+    # DB_ENGINE puede apuntar a otro motor (SQLite en desarrollo): ahí no hay pg_trgm
+    def ejecutar(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+    return ejecutar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_respuesta_requiere_incidencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='encuesta',
+            index=models.Index(fields=['estado', '-creadoEl'], name='encuesta_estado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='encuesta',
+            index=models.Index(fields=['-creadoEl'], name='encuesta_creado_idx'),
+        ),
+        # Búsqueda del listado: icontains genera UPPER(col::text) LIKE UPPER('%...%'),
+        # que PostgreSQL resuelve con un índice GIN de trigramas sobre esa expresión.
+        migrations.RunPython(
+            solo_postgresql("CREATE EXTENSION IF NOT EXISTS pg_trgm;"),
+            migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            solo_postgresql(
+                "CREATE INDEX IF NOT EXISTS encuesta_titulo_trgm_idx ON core_encuesta "
+                "USING gin (UPPER(titulo::text) gin_trgm_ops);"
+            ),
+            solo_postgresql("DROP INDEX IF EXISTS encuesta_titulo_trgm_idx;"),
+        ),
+        migrations.RunPython(
+            solo_postgresql(
+                "CREATE INDEX IF NOT EXISTS encuesta_descripcion_trgm_idx ON core_encuesta "
+                "USING gin (UPPER(descripcion::text) gin_trgm_ops);"
+            ),
+            solo_postgresql("DROP INDEX IF EXISTS encuesta_descripcion_trgm_idx;"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_encuesta_indices_listado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encuesta',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
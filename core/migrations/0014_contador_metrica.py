@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_encuesta_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorMetrica',
+            fields=[
+                ('nombre', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:42
+
+from django.db import migrations
+
+
+def solo_postgresql(sql):
+    # text_pattern_ops solo existe en PostgreSQL (DB_ENGINE puede apuntar a otro motor)
+    def ejecutar(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+    return ejecutar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_contador_metrica'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    # Autocompletado sobre fuentes grandes: istartswith genera UPPER(col::text) LIKE 'ABC%',
+    # que PostgreSQL resuelve con un índice btree text_pattern_ops sobre esa expresión.
+    operations = [
+        migrations.RunPython(
+            solo_postgresql("CREATE INDEX IF NOT EXISTS departamento_nombre_prefijo_idx ON core_departamento (UPPER(nombre_departamento::text) text_pattern_ops);"),
+            solo_postgresql("DROP INDEX IF EXISTS departamento_nombre_prefijo_idx;"),
+        ),
+        migrations.RunPython(
+            solo_postgresql("CREATE INDEX IF NOT EXISTS cuadrilla_nombre_prefijo_idx ON core_jefecuadrilla (UPPER(nombre_cuadrilla::text) text_pattern_ops);"),
+            solo_postgresql("DROP INDEX IF EXISTS cuadrilla_nombre_prefijo_idx;"),
+        ),
+        migrations.RunPython(
+            solo_postgresql("CREATE INDEX IF NOT EXISTS auth_user_username_prefijo_idx ON auth_user (UPPER(username::text) text_pattern_ops);"),
+            solo_postgresql("DROP INDEX IF EXISTS auth_user_username_prefijo_idx;"),
+        ),
+        migrations.RunPython(
+            solo_postgresql("CREATE INDEX IF NOT EXISTS auth_user_first_name_prefijo_idx ON auth_user (UPPER(first_name::text) text_pattern_ops);"),
+            solo_postgresql("DROP INDEX IF EXISTS auth_user_first_name_prefijo_idx;"),
+        ),
+        migrations.RunPython(
+            solo_postgresql("CREATE INDEX IF NOT EXISTS auth_user_last_name_prefijo_idx ON auth_user (UPPER(last_name::text) text_pattern_ops);"),
+            solo_postgresql("DROP INDEX IF EXISTS auth_user_last_name_prefijo_idx;"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_indices_autocompletar'),
+        ('registration', '0003_profile_cargo_profile_telefono'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='territorial',
+            index=models.Index(fields=['usuario', 'incidencia'], name='territorial_usuario_inc_idx'),
+        ),
+    ]
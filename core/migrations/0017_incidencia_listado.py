@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_indice_territorial_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidenciaListado',
+            fields=[
+                ('incidencia', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listado', serialize=False, to='core.incidencia')),
+                ('titulo', models.CharField(max_length=200)),
+                ('estado', models.CharField(max_length=50)),
+                ('prioridad', models.CharField(max_length=50)),
+                ('creadoEl', models.DateTimeField()),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True)),
+                ('correo_vecino', models.EmailField(blank=True, max_length=254)),
+                ('departamento_nombre', models.CharField(blank=True, max_length=100)),
+                ('cuadrilla_nombre', models.CharField(blank=True, max_length=100)),
+                ('cantidad_evidencias', models.PositiveIntegerField(default=0)),
+                ('cuadrilla', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.jefecuadrilla')),
+                ('departamento', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.departamento')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-creadoEl'], name='listado_creado_idx'), models.Index(fields=['estado', '-creadoEl'], name='listado_estado_creado_idx'), models.Index(fields=['departamento', '-creadoEl'], name='listado_depto_creado_idx'), models.Index(fields=['cuadrilla', '-creadoEl'], name='listado_cuadrilla_creado_idx')],
+            },
+        ),
+    ]
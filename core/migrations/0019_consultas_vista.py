@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultasVista',
+            fields=[
+                ('vista', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('requests', models.BigIntegerField(default=0)),
+                ('consultas', models.BigIntegerField(default=0)),
+                ('consultas_max', models.IntegerField(default=0)),
+                ('sql_ms', models.FloatField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('lentas', models.JSONField(default=list)),
+            ],
+        ),
+    ]
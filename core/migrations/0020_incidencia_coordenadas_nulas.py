@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_consultas_vista'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='incidencia',
+            name='latitud',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='incidencia',
+            name='longitud',
+            field=models.FloatField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:30
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_incidencia_coordenadas_nulas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(django.db.models.functions.text.Lower('titulo'), name='incidencia_titulo_lower_idx'),
+        ),
+    ]
@@ -1,6 +1,19 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from registration.models import Profile
 
+GRAVEDAD_CHOICES = [('A', 'Alta'), ('M', 'Media'), ('B', 'Baja')]
+
+ESTADO_INCIDENCIA_CHOICES = [
+    ('pendiente', 'Pendiente'),
+    ('en_proceso', 'En proceso'),
+    ('finalizada', 'Finalizada'),
+    ('validada', 'Validada'),
+    ('rechazada', 'Rechazada'),
+]
+
 class Perfil(models.Model):
     rol = models.CharField(max_length=50)
 
@@ -53,6 +66,15 @@ class Encuesta(models.Model):
     email_vecino = models.EmailField(null=True, blank=True)
     # Clasificación
     tipo_incidencia = models.ForeignKey("TipoIncidencia", on_delete=models.SET_NULL, null=True, blank=True)
+    # Versión de la definición (encuesta + preguntas) que descargan las apps de terreno
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Listado: filtro por estado + orden por fecha de creación
+            models.Index(fields=['estado', '-creadoEl'], name='encuesta_estado_creado_idx'),
+            models.Index(fields=['-creadoEl'], name='encuesta_creado_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -68,15 +90,58 @@ class PreguntaEncuesta(models.Model):
         return self.texto_pregunta
 
 
+class EnvioEncuesta(models.Model):
+    """Un formulario completo respondido; agrupa sus RespuestaEncuesta."""
+    encuesta = models.ForeignKey(Encuesta, on_delete=models.CASCADE, related_name='envios')
+    # UUID generado por la app de terreno: un reintento del mismo envío no se duplica
+    id_cliente = models.UUIDField(unique=True, null=True, blank=True)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    respondidoEl = models.DateTimeField(default=timezone.now)
+    recibidoEl = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Envío #{self.pk} de {self.encuesta_id}"
+
+
 class RespuestaEncuesta(models.Model):
     texto_respuesta = models.TextField()
     tipo = models.CharField(max_length=50)
     pregunta = models.ForeignKey(PreguntaEncuesta, on_delete=models.CASCADE)
+    envio = models.ForeignKey(
+        EnvioEncuesta, on_delete=models.CASCADE, null=True, blank=True, related_name='respuestas'
+    )
+    # Marcada en terreno como problema a convertir en incidencia
+    requiere_incidencia = models.BooleanField(default=False)
 
     def __str__(self):
         return self.texto_respuesta[:50]
 
 
+class AgregadoRespuesta(models.Model):
+    """
+    Resultado precalculado por pregunta. En preguntas cerradas hay una fila por
+    opción (``valor``); en numéricas y abiertas una sola fila con ``valor`` vacío.
+    Se actualiza en la ingesta (territorial_app/agregados.py).
+    """
+    pregunta = models.ForeignKey(PreguntaEncuesta, on_delete=models.CASCADE, related_name='agregados')
+    valor = models.CharField(max_length=200, blank=True, default='')
+    conteo = models.PositiveIntegerField(default=0)
+    suma = models.FloatField(default=0)
+    suma_cuadrados = models.FloatField(default=0)
+    minimo = models.FloatField(null=True, blank=True)
+    maximo = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pregunta', 'valor'], name='agregado_pregunta_valor_uq'),
+        ]
+
+    def __str__(self):
+        return f"{self.pregunta_id} · {self.valor or '—'}: {self.conteo}"
+
+
 class Multimedia(models.Model):
     nombre = models.CharField(max_length=100)
     url = models.URLField()
@@ -94,7 +159,7 @@ class TipoIncidencia(models.Model):
     descripcion = models.TextField()
     tipo_gravedad = models.CharField(
         max_length=1,
-        choices=[('A', 'Alta'), ('M', 'Media'), ('B', 'Baja')]
+        choices=GRAVEDAD_CHOICES
     )
 
     def __str__(self):
@@ -115,6 +180,68 @@ class JefeCuadrilla(models.Model):
         return self.nombre_cuadrilla
 
 
+def ids_visibilidad(user):
+    """
+    ``(id del Profile, ids de sus cuadrillas)`` del usuario en una consulta;
+    queda en el objeto usuario para el resto de la petición.
+    """
+    ids = getattr(user, "_ids_visibilidad", None)
+    if ids is None:
+        filas = Profile.objects.filter(user_id=user.pk).values_list(
+            "pk", "cuadrillas__pk", "cuadrillas_encargadas__pk"
+        )
+        perfil, cuadrillas = None, set()
+        for perfil, propia, encargada in filas:
+            cuadrillas.update(c for c in (propia, encargada) if c is not None)
+        ids = user._ids_visibilidad = (perfil, sorted(cuadrillas))
+    return ids
+
+
+class IncidenciaQuerySet(models.QuerySet):
+    """
+    Visibilidad por fila. Los roles salen de los bits de core.permisos y los ids
+    del usuario se resuelven una vez, así el filtro queda como ``IN (...)`` o un
+    ``EXISTS`` sobre core_territorial (sin JOIN que duplique filas).
+    También lo usa ``IncidenciaListado``: misma pk y mismas columnas de visibilidad.
+    """
+
+    def de_cuadrillas_de(self, user):
+        # Incidencias de las cuadrillas donde el usuario es usuario o encargado
+        from core import permisos
+        if not permisos.tiene(user, permisos.EN_CUADRILLA):
+            return self.none()
+        cuadrillas = ids_visibilidad(user)[1]
+        return self.filter(cuadrilla_id__in=cuadrillas) if cuadrillas else self.none()
+
+    def de_territorial(self, user):
+        # Incidencias vinculadas al territorial (todas las etapas)
+        perfil = ids_visibilidad(user)[0] if user.is_authenticated else None
+        if perfil is None:
+            return self.none()
+        return self.filter(
+            models.Exists(Territorial.objects.filter(usuario_id=perfil, incidencia_id=models.OuterRef("pk")))
+        )
+
+    def visible_to(self, user):
+        """
+        Reglas:
+          - Superusuario, 'Administrador', 'Dirección' y 'Departamento' ven todo.
+          - 'Jefe de Cuadrilla' -> incidencias de sus cuadrillas.
+          - 'Territorial' -> incidencias vinculadas a él.
+          - Sin rol -> las reportadas con su correo.
+        """
+        from core import permisos
+        if permisos.tiene(user, permisos.SUPERUSUARIO | permisos.grupos("Administrador", "Dirección", "Departamento")):
+            return self
+        if permisos.tiene(user, permisos.GRUPO["Jefe de Cuadrilla"]):
+            return self.de_cuadrillas_de(user)
+        if permisos.tiene(user, permisos.GRUPO["Territorial"]):
+            return self.de_territorial(user)
+        if not user.is_authenticated or not user.email:
+            return self.none()
+        return self.filter(correo_vecino=user.email)
+
+
 class Incidencia(models.Model):
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField()
@@ -123,8 +250,9 @@ class Incidencia(models.Model):
     creadoEl = models.DateTimeField(auto_now_add=True)
     actualizadoEl = models.DateTimeField(auto_now=True)
     fecha_cierre = models.DateTimeField(null=True, blank=True)
-    latitud = models.FloatField()
-    longitud = models.FloatField()
+    # Nulas solo si vienen de una encuesta (solo trae la ubicación en texto); los formularios las exigen
+    latitud = models.FloatField(null=True)
+    longitud = models.FloatField(null=True)
     nombre_vecino = models.CharField(max_length=100)
     correo_vecino = models.EmailField()
     telefono_vecino = models.CharField(max_length=20)
@@ -137,6 +265,23 @@ class Incidencia(models.Model):
     encuesta = models.ForeignKey(Encuesta, on_delete=models.SET_NULL, null=True)
     tipo_incidencia = models.ForeignKey(TipoIncidencia, on_delete=models.SET_NULL, null=True)
 
+    objects = IncidenciaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Títulos repetidos sin distinguir mayúsculas (formulario e importación CSV)
+            models.Index(Lower("titulo"), name="incidencia_titulo_lower_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado con el que se cargó; permite detectar transiciones al guardar
+        instance._estado_original = instance.__dict__.get("estado")
+        # Departamento con el que se cargó; si cambia, también se invalida el panel del anterior
+        instance._departamento_original = instance.__dict__.get("departamento_id")
+        return instance
+
     def __str__(self):
         return self.titulo
 
@@ -147,10 +292,63 @@ class Territorial(models.Model):
     )
     usuario = models.ForeignKey(Profile, on_delete=models.CASCADE)
 
+    class Meta:
+        # IncidenciaQuerySet.de_territorial: EXISTS por (usuario_id, incidencia_id)
+        indexes = [models.Index(fields=["usuario", "incidencia"], name="territorial_usuario_inc_idx")]
+
     def __str__(self):
         return f"Territorial de {self.usuario}"
 
 
+class IncidenciaListado(models.Model):
+    """
+    Fila desnormalizada de la tabla de incidencias_lista (ver core.listado):
+    nombres de departamento y cuadrilla y cantidad de evidencias ya resueltos,
+    para listar y filtrar sobre una sola tabla. Solo se mantiene con
+    ``LISTADO_DESNORMALIZADO`` activo.
+    """
+    incidencia = models.OneToOneField(
+        Incidencia, on_delete=models.CASCADE, primary_key=True, related_name='listado'
+    )
+    titulo = models.CharField(max_length=200)
+    estado = models.CharField(max_length=50)
+    prioridad = models.CharField(max_length=50)
+    creadoEl = models.DateTimeField()
+    fecha_cierre = models.DateTimeField(null=True, blank=True)
+    # Claves de visibilidad y filtro; sin restricción de FK, core.listado las limpia al borrar
+    departamento = models.ForeignKey(
+        Departamento, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    cuadrilla = models.ForeignKey(
+        JefeCuadrilla, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    correo_vecino = models.EmailField(blank=True)
+    departamento_nombre = models.CharField(max_length=100, blank=True)
+    cuadrilla_nombre = models.CharField(max_length=100, blank=True)
+    cantidad_evidencias = models.PositiveIntegerField(default=0)
+
+    objects = IncidenciaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-creadoEl"], name="listado_creado_idx"),
+            models.Index(fields=["estado", "-creadoEl"], name="listado_estado_creado_idx"),
+            models.Index(fields=["departamento", "-creadoEl"], name="listado_depto_creado_idx"),
+            models.Index(fields=["cuadrilla", "-creadoEl"], name="listado_cuadrilla_creado_idx"),
+        ]
+
+    @property
+    def id(self):
+        return self.incidencia_id
+
+    @property
+    def tiene_multimedia(self):
+        return self.cantidad_evidencias > 0
+
+    def __str__(self):
+        return self.titulo
+
+
 class Derivacion(models.Model):
     fecha_derivacion = models.DateTimeField()
     fecha_finalizacion = models.DateTimeField(null=True, blank=True)
@@ -159,3 +357,122 @@ class Derivacion(models.Model):
 
     def __str__(self):
         return f"Derivación de {self.incidencia}"
+
+
+class HistorialIncidencia(models.Model):
+    """
+    Registro de solo-inserción de las transiciones de estado de una incidencia.
+    Se escribe en la misma transacción que el cambio (ver core.historial).
+    """
+    incidencia = models.ForeignKey(Incidencia, on_delete=models.CASCADE, related_name='historial')
+    estado_anterior = models.CharField(max_length=20, null=True, blank=True)
+    estado_nuevo = models.CharField(max_length=20)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    comentario = models.TextField(blank=True, default='')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['fecha', 'id']
+        indexes = [
+            models.Index(fields=['incidencia', 'fecha'], name='historial_incidencia_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("El historial de incidencias es de solo inserción.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("El historial de incidencias es de solo inserción.")
+
+    def __str__(self):
+        return f"{self.incidencia_id}: {self.estado_anterior or '-'} → {self.estado_nuevo}"
+
+
+# ----------------- SLA (tiempos por estado) -----------------
+
+class SlaIncidencia(models.Model):
+    """Horas máximas que una incidencia puede permanecer en un estado según la gravedad de su tipo."""
+    tipo_gravedad = models.CharField(max_length=1, choices=GRAVEDAD_CHOICES)
+    estado = models.CharField(max_length=50, choices=ESTADO_INCIDENCIA_CHOICES)
+    horas_limite = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tipo_gravedad', 'estado'], name='sla_gravedad_estado_uq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_gravedad_display()} / {self.estado}: {self.horas_limite} h"
+
+
+class TramoEstadoIncidencia(models.Model):
+    """Intervalo de tiempo que una incidencia pasó (o está pasando) en un estado."""
+    incidencia = models.ForeignKey(Incidencia, on_delete=models.CASCADE, related_name='tramos_estado')
+    estado = models.CharField(max_length=50)
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField(null=True, blank=True)
+    vence = models.DateTimeField(null=True, blank=True)
+    alerta_encolada = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['incidencia', 'inicio'], name='tramo_incidencia_inicio_idx'),
+            # Solo los tramos abiertos con plazo y sin alerta: el detector de incumplimientos
+            # recorre este índice parcial en vez de toda la tabla.
+            models.Index(
+                fields=['vence'],
+                name='tramo_sla_abierto_idx',
+                condition=models.Q(fin__isnull=True, alerta_encolada=False, vence__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.incidencia_id} en {self.estado} desde {self.inicio:%d-%m-%Y %H:%M}"
+
+
+class AlertaSla(models.Model):
+    tramo = models.OneToOneField(TramoEstadoIncidencia, on_delete=models.CASCADE, related_name='alerta')
+    incidencia = models.ForeignKey(Incidencia, on_delete=models.CASCADE, related_name='alertas_sla')
+    creadoEl = models.DateTimeField(auto_now_add=True)
+    enviadaEl = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['creadoEl'],
+                name='alerta_sla_pendiente_idx',
+                condition=models.Q(enviadaEl__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Alerta SLA de {self.incidencia}"
+
+
+class ContadorMetrica(models.Model):
+    """
+    Contadores de dominio mantenidos en cada escritura (signals y rutas masivas)
+    para que /api/metrics/ no haga COUNT(*) sobre tablas grandes.
+    """
+    nombre = models.CharField(max_length=100, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre} = {self.valor}"
+
+
+class ConsultasVista(models.Model):
+    """Consultas SQL y tiempos acumulados por vista (core.instrumentacion)."""
+    vista = models.CharField(max_length=200, primary_key=True)
+    requests = models.BigIntegerField(default=0)
+    consultas = models.BigIntegerField(default=0)
+    consultas_max = models.IntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    total_ms = models.FloatField(default=0)
+    lentas = models.JSONField(default=list)  # [[ms, sql]] las más lentas vistas
+
+    def __str__(self):
+        return self.vista
@@ -0,0 +1,187 @@
+"""
+Capacidades efectivas de un usuario como un entero de bits.
+
+Se calculan una vez (grupos, ``Profile.group``, si es encargado de alguna
+dirección o departamento y si integra alguna cuadrilla) y quedan en la sesión
+y en la caché; después cada chequeo es una operación de bits sobre el mismo
+entero. El valor guardado lleva la versión del usuario y una generación
+global: signals.py cambia la del usuario cuando cambian sus grupos, su perfil
+o ``is_superuser``, y la global cuando cambian direcciones, departamentos,
+cuadrillas o grupos.
+"""
+import uuid
+
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.functional import SimpleLazyObject
+from rest_framework import permissions
+
+from .models import Departamento, Direccion, JefeCuadrilla
+
+ROLES = ("Administrador", "Dirección", "Departamento", "Territorial", "Jefe de Cuadrilla", "Cuadrilla")
+
+SUPERUSUARIO = 1 << 0
+GRUPO = {rol: 1 << (1 + i) for i, rol in enumerate(ROLES)}     # el usuario está en el grupo
+PERFIL = {rol: 1 << (8 + i) for i, rol in enumerate(ROLES)}    # Profile.group es ese grupo
+ENCARGADO_DIRECCION = 1 << 16
+ENCARGADO_DEPARTAMENTO = 1 << 17
+EN_CUADRILLA = 1 << 18  # usuario o encargado de alguna cuadrilla
+
+
+def grupos(*nombres, perfil=False):
+    """Máscara de los grupos dados (con ``perfil=True`` también vale ``Profile.group``)."""
+    mascara = 0
+    for nombre in nombres:
+        mascara |= GRUPO[nombre] | (PERFIL[nombre] if perfil else 0)
+    return mascara
+
+
+# Máscaras de los predicados de core.utils y de los permisos DRF de abajo
+ADMIN = SUPERUSUARIO | GRUPO["Administrador"]
+ADMIN_O_TERRITORIAL = SUPERUSUARIO | grupos("Administrador", "Territorial")
+ADMIN_O_DIRECCION = SUPERUSUARIO | grupos("Administrador", "Dirección", perfil=True)
+ADMIN_O_DEPARTAMENTO = SUPERUSUARIO | grupos("Administrador", "Departamento", perfil=True)
+# Bits que deciden qué ve cada rol en la navegación
+MASCARA_ROLES = SUPERUSUARIO | sum(GRUPO.values()) | sum(PERFIL.values())
+
+CLAVE_SESION = "_capacidades"
+TIMEOUT = 60 * 60 * 24
+
+
+def _cargar(user):
+    """Dos consultas: datos del usuario con subconsultas EXISTS y nombres de sus grupos."""
+    fila = (
+        User.objects.filter(pk=user.pk)
+        .annotate(
+            encargado_direccion=Exists(Direccion.objects.filter(encargado__user=OuterRef("pk"))),
+            encargado_departamento=Exists(Departamento.objects.filter(encargado__user=OuterRef("pk"))),
+            en_cuadrilla=Exists(
+                JefeCuadrilla.objects.filter(Q(usuario__user=OuterRef("pk")) | Q(encargado__user=OuterRef("pk")))
+            ),
+        )
+        .values("is_superuser", "profile__group__name", "encargado_direccion", "encargado_departamento", "en_cuadrilla")
+        .first()
+    )
+    if fila is None:
+        return 0
+    bits = SUPERUSUARIO if fila["is_superuser"] else 0
+    for nombre in user.groups.values_list("name", flat=True):
+        bits |= GRUPO.get(nombre, 0)
+    bits |= PERFIL.get(fila["profile__group__name"], 0)
+    if fila["encargado_direccion"]:
+        bits |= ENCARGADO_DIRECCION
+    if fila["encargado_departamento"]:
+        bits |= ENCARGADO_DEPARTAMENTO
+    if fila["en_cuadrilla"]:
+        bits |= EN_CUADRILLA
+    return bits
+
+
+def _clave_version(user_id=None):
+    return f"permisos:version:{user_id}" if user_id else "permisos:generacion"
+
+
+def _version(user_id):
+    claves = [_clave_version(), _clave_version(user_id)]
+    valores = cache.get_many(claves)
+    faltan = {c: uuid.uuid4().hex for c in claves if c not in valores}
+    if faltan:
+        cache.set_many(faltan, None)
+        valores.update(faltan)
+    return f"{valores[claves[0]]}:{valores[claves[1]]}"
+
+
+def invalidar(*user_ids):
+    """
+    Sin ids invalida a todos (cambió algo de la estructura municipal). Se aplica
+    al confirmarse la transacción: antes, otro proceso podría recalcular con los
+    grupos viejos y guardarlos bajo la versión nueva.
+    """
+    claves = [_clave_version(pk) for pk in user_ids] or [_clave_version()]
+    transaction.on_commit(lambda: cache.set_many({c: uuid.uuid4().hex for c in claves}, None))
+
+
+def de(user):
+    """Capacidades del usuario (0 si es anónimo). Sesión -> caché -> base de datos."""
+    if user is None or not user.is_authenticated:
+        return 0
+    bits = getattr(user, "_capacidades", None)
+    if bits is not None:
+        return bits
+    version = _version(user.pk)
+    sesion = getattr(user, "_sesion", None)
+    guardado = sesion.get(CLAVE_SESION) if sesion is not None else None
+    if guardado and guardado[:2] == [user.pk, version]:
+        bits = guardado[2]
+    else:
+        clave = f"permisos:bits:{user.pk}"
+        guardado = cache.get(clave)
+        if guardado and guardado[0] == version:
+            bits = guardado[1]
+        else:
+            bits = _cargar(user)
+            cache.set(clave, (version, bits), TIMEOUT)
+        if sesion is not None:
+            sesion[CLAVE_SESION] = [user.pk, version, bits]
+    user._capacidades = bits
+    return bits
+
+
+def tiene(user, mascara):
+    return bool(de(user) & mascara)
+
+
+def roles(user):
+    """Nombres de los grupos del usuario (sin consultas)."""
+    bits = de(user)
+    return {rol for rol, bit in GRUPO.items() if bits & bit}
+
+
+class PermisosMiddleware:
+    """
+    Deja la sesión al alcance de ``de()``: los predicados de ``user_passes_test``
+    y los templatetags solo reciben el usuario. Va después de AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if hasattr(request, "user") and hasattr(request, "session"):
+            request.user = SimpleLazyObject(lambda: self._usuario(request))
+        return self.get_response(request)
+
+    @staticmethod
+    def _usuario(request):
+        user = get_user(request)
+        if user.is_authenticated:
+            user._sesion = request.session
+        return user
+
+
+class TieneCapacidad(permissions.BasePermission):
+    """Permiso DRF: el usuario autenticado tiene algún bit de ``mascara``."""
+
+    mascara = 0
+
+    def has_permission(self, request, view):
+        return tiene(request.user, self.mascara)
+
+
+class EsAdmin(TieneCapacidad):
+    mascara = ADMIN
+
+
+class EsAdminODireccion(TieneCapacidad):
+    mascara = ADMIN_O_DIRECCION
+
+
+class EsAdminODepartamento(TieneCapacidad):
+    mascara = ADMIN_O_DEPARTAMENTO
+
+
+class EsAdminOTerritorial(TieneCapacidad):
+    mascara = ADMIN_O_TERRITORIAL
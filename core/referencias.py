@@ -0,0 +1,199 @@
+"""
+Datos de referencia casi estáticos (direcciones, departamentos, tipos de
+incidencia y cuadrillas) para formularios, filtros y endpoints AJAX.
+
+Cada proceso carga cada catálogo con una consulta y lo reutiliza mientras no
+cambie su versión en la caché compartida (``CACHES``, ver core/checks.py);
+signals.py la cambia al confirmarse la transacción que guarda o borra, así
+ningún proceso recarga antes de que el cambio sea visible. La versión es un
+token al azar (no un contador) para que vaciar la caché también fuerce la
+recarga. Las instancias se comparten entre peticiones: no se modifican
+(``ReferenciaChoiceField`` entrega copias).
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from django import forms
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.forms.models import ModelChoiceIterator
+
+from .models import Departamento, Direccion, JefeCuadrilla, TipoIncidencia
+
+# Respaldo si la invalidación no llega a este proceso (p. ej. caché local por proceso)
+TTL_SEGUNDOS = 600
+
+# Siempre de la primaria: lo cargado queda fijo bajo la versión vigente, y una
+# réplica atrasada (encuestas.db_router) lo dejaría viejo hasta el TTL
+CATALOGOS = {
+    "direcciones": lambda: Direccion.objects.using(DEFAULT_DB_ALIAS).order_by("nombre_direccion", "pk"),
+    "departamentos": lambda: Departamento.objects.using(DEFAULT_DB_ALIAS).order_by("nombre_departamento", "pk"),
+    "tipos": lambda: TipoIncidencia.objects.using(DEFAULT_DB_ALIAS).order_by("nombre_problema", "pk"),
+    "cuadrillas": lambda: JefeCuadrilla.objects.using(DEFAULT_DB_ALIAS).order_by("nombre_cuadrilla", "pk"),
+}
+
+POR_MODELO = {
+    Direccion: "direcciones",
+    Departamento: "departamentos",
+    TipoIncidencia: "tipos",
+    JefeCuadrilla: "cuadrillas",
+}
+
+
+def _clave_version(nombre):
+    return f"referencias:version:{nombre}"
+
+
+def version(nombre):
+    return cache.get_or_set(_clave_version(nombre), lambda: uuid.uuid4().hex, None)
+
+
+def invalidar(nombre):
+    cache.set(_clave_version(nombre), uuid.uuid4().hex, None)
+
+
+def invalidar_todo():
+    """Para las cargas masivas (bulk_create no dispara signals)."""
+    for nombre in CATALOGOS:
+        invalidar(nombre)
+
+
+_catalogos = {}  # nombre -> (versión, creado, lista, {pk: instancia})
+_lock = threading.Lock()
+
+
+def _catalogo(nombre):
+    actual = version(nombre)
+    with _lock:
+        guardado = _catalogos.get(nombre)
+        if guardado and guardado[0] == actual and time.monotonic() - guardado[1] < TTL_SEGUNDOS:
+            return guardado[2], guardado[3]
+    lista = list(CATALOGOS[nombre]())
+    por_pk = {obj.pk: obj for obj in lista}
+    with _lock:
+        _catalogos[nombre] = (actual, time.monotonic(), lista, por_pk)
+    return lista, por_pk
+
+
+def _pk(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def obtener(nombre, pk):
+    """Instancia del catálogo con ese pk (acepta el texto de un POST) o None."""
+    return _catalogo(nombre)[1].get(_pk(pk))
+
+
+def direcciones(activas=False):
+    lista = _catalogo("direcciones")[0]
+    return [d for d in lista if d.estado] if activas else list(lista)
+
+
+def departamentos(activos=False, direccion=None):
+    lista = _catalogo("departamentos")[0]
+    direccion = _pk(direccion) if direccion is not None else None
+    return [
+        d for d in lista
+        if (not activos or d.estado) and (direccion is None or d.direccion_id == direccion)
+    ]
+
+
+def tipos():
+    return list(_catalogo("tipos")[0])
+
+
+def cuadrillas(departamento=None):
+    lista = _catalogo("cuadrillas")[0]
+    if departamento is None:
+        return list(lista)
+    departamento = _pk(departamento)
+    return [c for c in lista if c.departamento_id == departamento]
+
+
+_mapa = (None, None)  # (lista de cuadrillas con que se armó, resultado)
+
+
+def mapa_cuadrillas():
+    """
+    ``{"mapa": {departamento_id: [{"id", "nombre_cuadrilla"}]}, "etag": ...}`` con
+    todas las cuadrillas; se arma una vez por versión del catálogo. El ETag es un
+    hash del contenido, igual en todos los procesos.
+    """
+    global _mapa
+    lista = _catalogo("cuadrillas")[0]
+    construido_con, resultado = _mapa
+    if construido_con is not lista:
+        mapa = {}
+        for c in lista:
+            if c.departamento_id is None:
+                continue
+            mapa.setdefault(str(c.departamento_id), []).append({"id": c.id, "nombre_cuadrilla": str(c)})
+        contenido = json.dumps(mapa, sort_keys=True).encode()
+        resultado = {"mapa": mapa, "etag": f'"cuadrillas-{hashlib.md5(contenido).hexdigest()[:16]}"'}
+        _mapa = (lista, resultado)
+    return resultado
+
+
+class _IteradorReferencias(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.opciones_vigentes():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.opciones_vigentes()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.opciones_vigentes())
+
+    def seleccionados(self, pks):
+        """Las opciones con esos pks (lo usa ``AutocompletarSelect``)."""
+        pks = {_pk(pk) for pk in pks}
+        return [obj for obj in self.field.opciones_vigentes() if obj.pk in pks]
+
+
+class ReferenciaChoiceField(forms.ModelChoiceField):
+    """
+    ``ModelChoiceField`` cuyas opciones salen del catálogo en memoria: listar y
+    validar no consultan la base. El formulario restringe con ``opciones``
+    (lista sacada de las funciones de este módulo); si no, va el catálogo entero
+    y un pk que no esté se busca en la base (creado recién en otro proceso).
+    La validación del modelo al guardar sigue comprobando que la FK exista.
+    Sirve en ``Meta.field_classes`` porque deduce el catálogo del modelo.
+    """
+
+    iterator = _IteradorReferencias
+
+    def __init__(self, queryset, *, catalogo=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.catalogo = catalogo or POR_MODELO[queryset.model]
+        self.opciones = None
+
+    def opciones_vigentes(self):
+        return self.opciones if self.opciones is not None else _catalogo(self.catalogo)[0]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        pk = _pk(value)
+        obj = next((o for o in self.opciones_vigentes() if o.pk == pk), None) if pk is not None else None
+        if obj is not None:
+            return copy.copy(obj)
+        if pk is not None and self.opciones is None:
+            obj = self.queryset.filter(pk=pk).first()
+        if obj is None:
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+        return obj
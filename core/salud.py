@@ -0,0 +1,115 @@
+"""
+Chequeos de disponibilidad para /api/ready/.
+
+Cada dependencia (base de datos, almacenamiento de archivos, caché y correo)
+se prueba con una operación mínima y se mide en milisegundos. El resultado se
+guarda en memoria del proceso unos segundos (``READY_CACHE_SEGUNDOS``) para
+que los balanceadores puedan consultar seguido sin generar carga.
+
+La ruta es pública: una dependencia caída se informa solo con ``ok: false`` y
+el detalle del error va al log (puede llevar hosts o credenciales).
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.mail import get_connection
+from django.db import connections
+
+TIMEOUT_CORREO = 3
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_ultimo = {"cuando": 0.0, "resultado": None}
+
+
+def _base_datos():
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    return {}
+
+
+def _storage():
+    # Sin MEDIA_ROOT el storage por defecto escribe en el directorio de trabajo
+    if not settings.MEDIA_ROOT and isinstance(storages["default"], FileSystemStorage):
+        return FileSystemStorage(location=tempfile.gettempdir())
+    return storages["default"]
+
+
+def _almacenamiento():
+    storage = _storage()
+    contenido = uuid.uuid4().hex.encode()
+    nombre = storage.save(f"readiness/{os.getpid()}-{uuid.uuid4().hex}.txt", ContentFile(contenido))
+    try:
+        with storage.open(nombre) as f:
+            if f.read() != contenido:
+                raise IOError("El archivo leído no coincide con el escrito")
+    finally:
+        storage.delete(nombre)
+    return {}
+
+
+def _cache():
+    clave = f"readiness:{uuid.uuid4().hex}"
+    cache.set(clave, "ok", 10)
+    try:
+        if cache.get(clave) != "ok":
+            raise IOError("La caché no devolvió el valor escrito")
+    finally:
+        cache.delete(clave)
+    return {}
+
+
+def _correo():
+    # Con el backend de consola/locmem (desarrollo) esto solo verifica la configuración
+    conexion = get_connection(fail_silently=False, timeout=TIMEOUT_CORREO)
+    conexion.open()
+    conexion.close()
+    return {"backend": settings.EMAIL_BACKEND.rsplit(".", 2)[-2]}
+
+
+CHEQUEOS = {
+    "base_datos": _base_datos,
+    "almacenamiento": _almacenamiento,
+    "cache": _cache,
+    "correo": _correo,
+}
+
+
+def ejecutar():
+    checks = {}
+    for nombre, chequeo in CHEQUEOS.items():
+        inicio = time.perf_counter()
+        try:
+            detalle = chequeo()
+            checks[nombre] = {"ok": True, **detalle}
+        except Exception:  # cualquier fallo de la dependencia la marca como caída
+            logger.exception("Readiness: falló el chequeo %s", nombre)
+            checks[nombre] = {"ok": False}
+        checks[nombre]["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    return {
+        "status": "ok" if all(c["ok"] for c in checks.values()) else "error",
+        "checks": checks,
+    }
+
+
+def estado():
+    """Resultado de los chequeos, reutilizado si tiene menos de READY_CACHE_SEGUNDOS."""
+    ttl = getattr(settings, "READY_CACHE_SEGUNDOS", 5)
+    with _lock:
+        edad = time.monotonic() - _ultimo["cuando"]
+        if _ultimo["resultado"] is not None and edad < ttl:
+            return {**_ultimo["resultado"], "cacheado": True, "edad_s": round(edad, 2)}
+        resultado = ejecutar()
+        _ultimo.update(cuando=time.monotonic(), resultado=resultado)
+    return {**resultado, "cacheado": False, "edad_s": 0}
@@ -0,0 +1,311 @@
+"""
+Datos sintéticos de un municipio para pruebas de carga y benchmarks.
+
+Todo se inserta con ``bulk_create`` por lotes (usuarios, perfiles, grupos,
+estructura municipal, incidencias con multimedias/historial/tramos SLA y
+encuestas con respuestas vía la ingesta real), con un ``random.Random``
+sembrado para que dos corridas con la misma semilla generen lo mismo.
+"""
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.utils import timezone
+
+from registration.models import Profile
+
+from . import contadores, fragmentos, listado, referencias, sla
+from .historial import nueva_transicion, registrar_transiciones
+from .models import (
+    GRAVEDAD_CHOICES, Departamento, Direccion, Encuesta, Incidencia, JefeCuadrilla,
+    Multimedia, PreguntaEncuesta, Territorial, TipoIncidencia,
+)
+
+ROLES = ["Administrador", "Dirección", "Departamento", "Jefe de Cuadrilla", "Territorial"]
+PASSWORD = "semilla123"
+
+PROBLEMAS = [
+    "Bache en calzada", "Luminaria apagada", "Microbasural", "Árbol caído", "Semáforo en falla",
+    "Vereda rota", "Grafiti", "Fuga de agua", "Perro abandonado", "Ruidos molestos",
+]
+CALLES = ["Los Aromos", "Av. Principal", "O'Higgins", "Las Rosas", "Pedro de Valdivia", "Maipú", "Colón"]
+NOMBRES = ["Ana", "Luis", "María", "José", "Camila", "Pedro", "Valentina", "Diego", "Javiera", "Felipe"]
+APELLIDOS = ["González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez"]
+# Distribución aproximada de estados en un municipio con backlog
+ESTADOS = ["pendiente"] * 3 + ["en_proceso"] * 2 + ["finalizada"] * 2 + ["validada"] * 4 + ["rechazada"]
+PREGUNTAS = [
+    ("¿Cómo evalúa la iluminación de su calle?", "opcion", ["Buena", "Regular", "Mala"]),
+    ("¿Cuántas personas viven en el hogar?", "numero", None),
+    ("¿Hay microbasurales cerca?", "si_no", ["Sí", "No"]),
+    ("Nota a la atención municipal (1 a 7)", "escala", None),
+    ("Comentarios", "texto", None),
+]
+
+
+@dataclass
+class Escala:
+    direcciones: int = 3
+    departamentos: int = 3      # por dirección
+    cuadrillas: int = 2         # por departamento
+    territoriales: int = 10
+    incidencias: int = 1000
+    encuestas: int = 20
+    envios: int = 10            # formularios respondidos por encuesta
+    lote: int = 5000
+
+
+@contextmanager
+def _sin_auto_now(modelo, *campos):
+    """Permite fijar fechas históricas en bulk_create (auto_now/auto_now_add las pisarían)."""
+    originales = []
+    for nombre in campos:
+        campo = modelo._meta.get_field(nombre)
+        originales.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class Sembrador:
+    def __init__(self, escala, semilla=42, prefijo="seed", log=None):
+        self.escala = escala
+        self.rnd = random.Random(semilla)
+        self.prefijo = prefijo
+        self.log = log or (lambda mensaje: None)
+        self.ahora = timezone.now()
+        self.totales = {}
+        self.por_rol = {}
+
+    def _contar(self, nombre, n):
+        self.totales[nombre] = self.totales.get(nombre, 0) + n
+
+    # ----------------- usuarios -----------------
+    def _usuarios(self, rol, cantidad):
+        grupo, _ = Group.objects.get_or_create(name=rol)
+        if not hasattr(self, "_clave"):
+            self._clave = make_password(PASSWORD)  # un solo hash para todos: el hasheo es lo caro
+        etiqueta = rol.lower().replace(" ", "_").replace("ó", "o")
+        inicio = self.por_rol.get(rol, 0)
+        usuarios = User.objects.bulk_create([
+            User(
+                username=f"{self.prefijo}_{etiqueta}_{i}",
+                email=f"{self.prefijo}.{etiqueta}.{i}@municipalidad.local",
+                first_name=self.rnd.choice(NOMBRES),
+                last_name=self.rnd.choice(APELLIDOS),
+                password=self._clave,
+            )
+            for i in range(inicio, inicio + cantidad)
+        ])
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=u.pk, group_id=grupo.pk) for u in usuarios]
+        )
+        perfiles = Profile.objects.bulk_create([Profile(user=u, group=grupo) for u in usuarios])
+        self.perfiles.setdefault(rol, []).extend(perfiles)
+        self.por_rol[rol] = inicio + len(usuarios)
+        self._contar("usuarios", len(usuarios))
+        return perfiles
+
+    # ----------------- estructura municipal -----------------
+    def _direcciones(self, cantidad):
+        """Direcciones con sus departamentos, cuadrillas y los usuarios a cargo."""
+        e = self.escala
+        direcciones = Direccion.objects.bulk_create([
+            Direccion(nombre_direccion=f"Dirección {p.user_id} ({self.prefijo})", encargado=p)
+            for p in self._usuarios("Dirección", cantidad)
+        ])
+        encargados = iter(self._usuarios("Departamento", cantidad * e.departamentos))
+        departamentos = Departamento.objects.bulk_create([
+            Departamento(nombre_departamento=f"Depto {d.pk}-{j + 1} ({self.prefijo})", direccion=d, encargado=next(encargados))
+            for d in direcciones
+            for j in range(e.departamentos)
+        ])
+        jefes = iter(self._usuarios("Jefe de Cuadrilla", len(departamentos) * e.cuadrillas))
+        cuadrillas = JefeCuadrilla.objects.bulk_create([
+            JefeCuadrilla(
+                nombre_cuadrilla=f"Cuadrilla {d.pk}-{k + 1} ({self.prefijo})",
+                departamento=d,
+                usuario=(jefe := next(jefes)),
+                encargado=jefe,
+            )
+            for d in departamentos
+            for k in range(e.cuadrillas)
+        ])
+        self.departamentos.extend(departamentos)
+        self.cuadrillas.extend(cuadrillas)
+        for c in cuadrillas:
+            self.cuadrillas_por_depto.setdefault(c.departamento_id, []).append(c)
+        self._contar("direcciones", len(direcciones))
+        self._contar("departamentos", len(departamentos))
+        self._contar("cuadrillas", len(cuadrillas))
+
+    def _estructura(self):
+        self.perfiles, self.departamentos, self.cuadrillas, self.cuadrillas_por_depto = {}, [], [], {}
+        self._usuarios("Administrador", 1)
+        self._usuarios("Territorial", self.escala.territoriales)
+        self.tipos = TipoIncidencia.objects.bulk_create([
+            TipoIncidencia(
+                nombre_problema=f"{nombre} ({self.prefijo})",
+                descripcion=nombre,
+                tipo_gravedad=self.rnd.choice(GRAVEDAD_CHOICES)[0],
+            )
+            for nombre in PROBLEMAS
+        ])
+        self._direcciones(self.escala.direcciones)
+
+    # ----------------- incidencias -----------------
+    def _incidencia(self, n):
+        depto = self.rnd.choice(self.departamentos)
+        estado = self.rnd.choice(ESTADOS)
+        creado = self.ahora - timedelta(minutes=self.rnd.randint(0, 60 * 24 * 365))
+        cuadrilla = None
+        if estado != "pendiente":
+            cuadrilla = self.rnd.choice(self.cuadrillas_por_depto[depto.pk])
+        cierre = None
+        if estado in ("finalizada", "validada", "rechazada"):
+            cierre = min(creado + timedelta(hours=self.rnd.expovariate(1 / 72)), self.ahora)
+        tipo = self.rnd.choice(self.tipos)
+        return Incidencia(
+            titulo=f"{tipo.descripcion} #{n} ({self.prefijo})",
+            descripcion=f"{tipo.descripcion} en calle {self.rnd.choice(CALLES)} {self.rnd.randint(1, 3000)}",
+            estado=estado,
+            prioridad=self.rnd.choice(["alta", "media", "media", "baja"]),
+            creadoEl=creado,
+            actualizadoEl=cierre or creado,
+            fecha_cierre=cierre,
+            latitud=-33.45 + self.rnd.uniform(-0.1, 0.1),
+            longitud=-70.66 + self.rnd.uniform(-0.1, 0.1),
+            nombre_vecino=f"{self.rnd.choice(NOMBRES)} {self.rnd.choice(APELLIDOS)}",
+            correo_vecino=f"vecino{n}@correo.local",
+            telefono_vecino=f"+569{self.rnd.randint(10000000, 99999999)}",
+            motivo_rechazo="Duplicada" if estado == "rechazada" else None,
+            departamento_id=depto.pk,
+            direccion_id=depto.direccion_id,
+            cuadrilla=cuadrilla,
+            tipo_incidencia=tipo,
+        )
+
+    def _incidencias(self, total):
+        territoriales = self.perfiles["Territorial"]
+        previas = self.totales.get("incidencias", 0)
+        hechas = 0
+        while hechas < total:
+            cantidad = min(self.escala.lote, total - hechas)
+            with transaction.atomic(), _sin_auto_now(Incidencia, "creadoEl", "actualizadoEl"):
+                creadas = Incidencia.objects.bulk_create(
+                    [self._incidencia(previas + hechas + i + 1) for i in range(cantidad)], batch_size=self.escala.lote
+                )
+                evidencias = {inc.pk: self.rnd.choice([0, 1, 1, 2]) for inc in creadas}
+                Multimedia.objects.bulk_create([
+                    Multimedia(
+                        nombre=f"evidencia_{inc.pk}_{k}.jpg",
+                        url=f"https://example.org/evidencias/{inc.pk}/{k}.jpg",
+                        tipo="imagen",
+                        formato="jpg",
+                        incidencia_id=inc.pk,
+                    )
+                    for inc in creadas
+                    for k in range(evidencias[inc.pk])
+                ], batch_size=self.escala.lote)
+                if territoriales:
+                    Territorial.objects.bulk_create([
+                        Territorial(incidencia_id=inc.pk, usuario=self.rnd.choice(territoriales))
+                        for inc in creadas
+                    ], batch_size=self.escala.lote)
+                registrar_transiciones(
+                    [nueva_transicion(inc, None, comentario="Semilla", fecha=inc.creadoEl) for inc in creadas],
+                    batch_size=self.escala.lote,
+                )
+                sla.abrir_tramos(creadas, batch_size=self.escala.lote)
+                contadores.incidencias_creadas(creadas)
+                listado.incidencias_creadas(creadas, evidencias, batch_size=self.escala.lote)
+            hechas += cantidad
+            self.log(f"  {hechas}/{total} incidencias")
+        self._contar("incidencias", hechas)
+
+    # ----------------- encuestas -----------------
+    def _encuestas(self, cantidad):
+        from territorial_app.ingesta import registrar_envios
+
+        previas = self.totales.get("encuestas", 0)
+        encuestas = Encuesta.objects.bulk_create([
+            Encuesta(
+                titulo=f"Encuesta barrial {previas + i + 1} ({self.prefijo})",
+                descripcion="Encuesta puerta a puerta",
+                ubicacion=f"Sector {self.rnd.choice(CALLES)}",
+                prioridad=self.rnd.choice(["Alta", "Normal", "Baja"]),
+                departamento=self.rnd.choice(self.departamentos),
+                tipo_incidencia=self.rnd.choice(self.tipos),
+                nombre_vecino=f"{self.rnd.choice(NOMBRES)} {self.rnd.choice(APELLIDOS)}",
+            )
+            for i in range(cantidad)
+        ])
+        preguntas = PreguntaEncuesta.objects.bulk_create([
+            PreguntaEncuesta(texto_pregunta=texto, descripcion="", tipo=tipo, encuesta=e)
+            for e in encuestas
+            for texto, tipo, _ in PREGUNTAS
+        ])
+        opciones = {p.pk: PREGUNTAS[i % len(PREGUNTAS)] for i, p in enumerate(preguntas)}
+        por_encuesta = {}
+        for p in preguntas:
+            por_encuesta.setdefault(p.encuesta_id, []).append(p)
+
+        envios = []
+        for e in encuestas:
+            for _ in range(self.escala.envios):
+                respuestas = []
+                for p in por_encuesta[e.pk]:
+                    _, tipo, valores = opciones[p.pk]
+                    if valores:
+                        texto = self.rnd.choice(valores)
+                    elif tipo in ("numero", "escala"):
+                        texto = str(self.rnd.randint(1, 7))
+                    else:
+                        texto = self.rnd.choice(["", "Todo bien", "Falta iluminación", "Mucha basura"])
+                    respuestas.append({
+                        "pregunta": p.pk,
+                        "respuesta": texto,
+                        "requiere_incidencia": self.rnd.random() < 0.02,
+                    })
+                envios.append({"encuesta": e.pk, "respuestas": respuestas})
+        territorial = self.perfiles["Territorial"][0].user if self.perfiles["Territorial"] else None
+        for i in range(0, len(envios), 500):
+            registrar_envios(envios[i:i + 500], territorial)
+        self._contar("encuestas", len(encuestas))
+        self._contar("envios", len(envios))
+
+    def sembrar(self):
+        if User.objects.filter(username__startswith=f"{self.prefijo}_").exists():
+            raise ValueError(f"Ya existen datos con el prefijo '{self.prefijo}'")
+        with transaction.atomic():
+            self._estructura()
+        referencias.invalidar_todo()
+        self.log("Estructura municipal creada")
+        self._incidencias(self.escala.incidencias)
+        self._encuestas(self.escala.encuestas)
+        fragmentos.invalidar_paneles()
+        return self.totales
+
+    def agregar(self, incidencias=0, encuestas=0, direcciones=0, territoriales=0):
+        """Hace crecer un municipio ya sembrado por esta instancia (p. ej. para comparar dos tamaños)."""
+        with transaction.atomic():
+            if territoriales:
+                self._usuarios("Territorial", territoriales)
+            if direcciones:
+                self._direcciones(direcciones)
+        referencias.invalidar_todo()
+        self._incidencias(incidencias)
+        self._encuestas(encuestas)
+        fragmentos.invalidar_paneles()
+        return self.totales
+
+
+def sembrar_municipio(escala=None, semilla=42, prefijo="seed", log=None):
+    """Crea un municipio sintético; devuelve los totales creados por entidad."""
+    return Sembrador(escala or Escala(), semilla, prefijo, log).sembrar()
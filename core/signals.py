@@ -0,0 +1,166 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from registration.models import Profile
+
+from .models import Departamento, Direccion, Incidencia, JefeCuadrilla, Multimedia, TipoIncidencia
+from . import autocompletar, contadores, fragmentos, listado, permisos, referencias, sla
+
+
+@receiver(post_save, sender=Incidencia)
+def registrar_tramo_estado(sender, instance, created, raw=False, **kwargs):
+    """
+    Abre un nuevo tramo de SLA cuando la incidencia se crea o cambia de estado.
+    Si la instancia no trae el estado original (p.ej. cargada con .only()),
+    abrir_tramo compara contra el tramo abierto.
+    """
+    if raw:
+        return
+    original = getattr(instance, "_estado_original", None)
+    if created or original is None or original != instance.estado:
+        sla.abrir_tramo(instance)
+    # Contadores por estado de /api/metrics/ (sin estado original conocido no se toca)
+    if created:
+        contadores.cambio_estado(None, instance.estado)
+    elif original is not None and original != instance.estado:
+        contadores.cambio_estado(original, instance.estado)
+    instance._estado_original = instance.estado
+
+
+@receiver(post_delete, sender=Incidencia)
+def descontar_incidencia(sender, instance, **kwargs):
+    contadores.cambio_estado(instance.estado, None)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_autocompletar_perfiles(sender, update_fields=None, **kwargs):
+    # Cada login guarda last_login: eso no cambia nombres ni grupos
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    autocompletar.invalidar("perfiles")
+
+
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Departamento)
+def invalidar_autocompletar_departamentos(sender, **kwargs):
+    autocompletar.invalidar("departamentos")
+
+
+@receiver(post_save, sender=JefeCuadrilla)
+@receiver(post_delete, sender=JefeCuadrilla)
+def invalidar_autocompletar_cuadrillas(sender, **kwargs):
+    autocompletar.invalidar("cuadrillas")
+
+
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Departamento)
+@receiver(post_save, sender=TipoIncidencia)
+@receiver(post_delete, sender=TipoIncidencia)
+@receiver(post_save, sender=JefeCuadrilla)
+@receiver(post_delete, sender=JefeCuadrilla)
+def invalidar_referencias(sender, **kwargs):
+    # Tras el commit: si no, otro proceso podría recargar antes y guardar datos viejos con la versión nueva
+    nombre = referencias.POR_MODELO[sender]
+    transaction.on_commit(lambda: referencias.invalidar(nombre))
+
+
+@receiver(post_save, sender=Incidencia)
+@receiver(post_delete, sender=Incidencia)
+def invalidar_paneles_incidencia(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    alcances = {"global", f"departamento:{instance.departamento_id}"}
+    original = getattr(instance, "_departamento_original", None)
+    if original is not None:
+        alcances.add(f"departamento:{original}")
+    instance._departamento_original = instance.departamento_id
+    fragmentos.invalidar_paneles(*alcances)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_fragmentos_usuario(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    # El panel del administrador cuenta usuarios
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    if created or signal is post_delete:
+        fragmentos.invalidar_paneles("global")
+
+
+@receiver(post_save, sender=User)
+def invalidar_permisos_usuario(sender, instance, update_fields=None, **kwargs):
+    # is_superuser es una capacidad
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    permisos.invalidar(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidar_permisos_perfil(sender, instance, **kwargs):
+    permisos.invalidar(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_permisos_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            permisos.invalidar(instance.pk)
+    elif action == "pre_clear":
+        # group.user_set.clear() no informa a quiénes afecta: se leen antes de borrar
+        permisos.invalidar(*instance.user_set.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove") and pk_set:
+        permisos.invalidar(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Departamento)
+@receiver(post_save, sender=JefeCuadrilla)
+@receiver(post_delete, sender=JefeCuadrilla)
+def invalidar_permisos_estructura(sender, **kwargs):
+    # Ser encargado o integrar una cuadrilla son capacidades; cambios raros, se recalcula a todos
+    permisos.invalidar()
+
+
+@receiver(post_save, sender=Incidencia)
+def actualizar_listado(sender, instance, raw=False, **kwargs):
+    # La fila de IncidenciaListado se borra sola con la incidencia (CASCADE)
+    if not raw:
+        listado.actualizar(instance)
+
+
+@receiver(post_save, sender=Multimedia)
+@receiver(post_delete, sender=Multimedia)
+def contar_evidencias_listado(sender, instance, signal, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        listado.sumar_evidencias(instance.incidencia_id, 1)
+    elif signal is post_delete:
+        listado.sumar_evidencias(instance.incidencia_id, -1)
+
+
+@receiver(post_save, sender=Departamento)
+@receiver(post_delete, sender=Departamento)
+@receiver(post_save, sender=JefeCuadrilla)
+@receiver(post_delete, sender=JefeCuadrilla)
+def renombrar_listado(sender, instance, signal, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    campo = "departamento" if sender is Departamento else "cuadrilla"
+    if signal is post_delete:
+        listado.desvincular(campo, instance.pk)
+    else:
+        listado.renombrar(campo, instance.pk, str(instance))
@@ -0,0 +1,191 @@
+"""
+Seguimiento de SLA de incidencias.
+
+Cada cambio de estado abre un ``TramoEstadoIncidencia``; si existe un
+``SlaIncidencia`` para la gravedad del tipo y el estado, el tramo queda con
+su fecha de vencimiento. El comando ``detectar_incumplimientos_sla`` recorre
+solo los tramos abiertos y vencidos (índice parcial) y encola ``AlertaSla``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from . import contadores
+from .models import AlertaSla, Incidencia, SlaIncidencia, TipoIncidencia, TramoEstadoIncidencia
+
+logger = logging.getLogger(__name__)
+
+
+def objetivos_sla():
+    """Mapa {(tipo_gravedad, estado): horas_limite} con todos los SLA configurados."""
+    return {
+        (g, e): h
+        for g, e, h in SlaIncidencia.objects.values_list("tipo_gravedad", "estado", "horas_limite")
+    }
+
+
+def calcular_vencimiento(horas_limite, inicio):
+    if horas_limite is None:
+        return None
+    return inicio + timedelta(hours=horas_limite)
+
+
+def abrir_tramo(incidencia, inicio=None):
+    """
+    Cierra el tramo abierto de la incidencia (si su estado cambió) y abre uno
+    nuevo para el estado actual. Si el estado no cambió no hace nada.
+    """
+    inicio = inicio or timezone.now()
+    with transaction.atomic():
+        abierto = (
+            TramoEstadoIncidencia.objects
+            .filter(incidencia=incidencia, fin__isnull=True)
+            .order_by("-inicio")
+            .first()
+        )
+        if abierto and abierto.estado == incidencia.estado:
+            return abierto
+        if abierto:
+            TramoEstadoIncidencia.objects.filter(incidencia=incidencia, fin__isnull=True).update(fin=inicio)
+
+        horas = (
+            SlaIncidencia.objects
+            .filter(
+                estado=incidencia.estado,
+                tipo_gravedad__in=TipoIncidencia.objects.filter(
+                    pk=incidencia.tipo_incidencia_id
+                ).values("tipo_gravedad"),
+            )
+            .values_list("horas_limite", flat=True)
+            .first()
+        )
+        return TramoEstadoIncidencia.objects.create(
+            incidencia=incidencia,
+            estado=incidencia.estado,
+            inicio=inicio,
+            vence=calcular_vencimiento(horas, inicio),
+        )
+
+
+def abrir_tramos(incidencias, inicio=None, batch_size=1000):
+    """
+    Versión masiva de ``abrir_tramo`` para incidencias sin tramo abierto
+    (recién insertadas con ``bulk_create`` o existentes antes del SLA).
+    Si no se indica ``inicio`` se usa ``actualizadoEl`` de cada incidencia.
+    """
+    objetivos = objetivos_sla()
+    gravedades = dict(TipoIncidencia.objects.values_list("id", "tipo_gravedad"))
+    tramos = []
+    for inc in incidencias:
+        desde = inicio or inc.actualizadoEl or timezone.now()
+        horas = objetivos.get((gravedades.get(inc.tipo_incidencia_id), inc.estado))
+        tramos.append(
+            TramoEstadoIncidencia(
+                incidencia_id=inc.pk,
+                estado=inc.estado,
+                inicio=desde,
+                vence=calcular_vencimiento(horas, desde),
+            )
+        )
+    return TramoEstadoIncidencia.objects.bulk_create(tramos, batch_size=batch_size)
+
+
+def tramos_vencidos(ahora=None):
+    """Tramos abiertos cuyo plazo venció y aún no tienen alerta (usa el índice parcial)."""
+    ahora = ahora or timezone.now()
+    return TramoEstadoIncidencia.objects.filter(
+        fin__isnull=True,
+        alerta_encolada=False,
+        vence__isnull=False,
+        vence__lte=ahora,
+    )
+
+
+def encolar_alertas(ahora=None, lote=1000):
+    """Crea una ``AlertaSla`` por cada tramo vencido. Devuelve cuántas se encolaron."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                tramos_vencidos(ahora)
+                .select_for_update(skip_locked=True)
+                .order_by("vence")
+                .values_list("id", "incidencia_id")[:lote]
+            )
+            if not filas:
+                return total
+            AlertaSla.objects.bulk_create(
+                [AlertaSla(tramo_id=tramo_id, incidencia_id=inc_id) for tramo_id, inc_id in filas],
+                ignore_conflicts=True,
+            )
+            TramoEstadoIncidencia.objects.filter(id__in=[f[0] for f in filas]).update(alerta_encolada=True)
+            contadores.sumar({contadores.ALERTAS_PENDIENTES: len(filas)})
+        total += len(filas)
+
+
+def enviar_alertas_pendientes(lote=200):
+    """
+    Envía por correo las alertas pendientes al encargado del departamento. Solo
+    se marca enviada la alerta cuyo correo salió; las que fallan quedan en el
+    log y se reintentan en la próxima pasada.
+    """
+    enviadas = 0
+    pendientes = (
+        AlertaSla.objects
+        .filter(enviadaEl__isnull=True)
+        .select_related(
+            "tramo",
+            "incidencia__departamento__encargado__user",
+        )
+        .order_by("creadoEl")[:lote]
+    )
+    for alerta in pendientes:
+        incidencia = alerta.incidencia
+        departamento = incidencia.departamento
+        if departamento and departamento.encargado and departamento.encargado.user.email:
+            destinatario = departamento.encargado.user.email
+        else:
+            destinatario = "soporte@municipalidad.local"
+        try:
+            send_mail(
+                f"[SLA] Plazo vencido: {incidencia.titulo}",
+                (
+                    f"La incidencia '{incidencia.titulo}' (#{incidencia.pk}) lleva en estado "
+                    f"'{alerta.tramo.estado}' desde {timezone.localtime(alerta.tramo.inicio):%d-%m-%Y %H:%M} "
+                    f"y su plazo venció el {timezone.localtime(alerta.tramo.vence):%d-%m-%Y %H:%M}.\n\n"
+                    "Sistema Municipal de Incidencias"
+                ),
+                settings.DEFAULT_FROM_EMAIL,
+                [destinatario],
+            )
+        except Exception:
+            logger.exception("No se pudo enviar la alerta SLA %s a %s", alerta.pk, destinatario)
+            continue
+        AlertaSla.objects.filter(pk=alerta.pk).update(enviadaEl=timezone.now())
+        enviadas += 1
+    contadores.sumar({contadores.ALERTAS_PENDIENTES: -enviadas})
+    return enviadas
+
+
+def inicializar_tramos(chunk_size=2000):
+    """Abre el tramo actual para incidencias que aún no tienen ninguno abierto."""
+    sin_tramo = (
+        Incidencia.objects
+        .exclude(tramos_estado__fin__isnull=True)
+        .only("id", "estado", "tipo_incidencia_id", "actualizadoEl")
+        .order_by("id")
+    )
+    total = 0
+    lote = []
+    for inc in sin_tramo.iterator(chunk_size=chunk_size):
+        lote.append(inc)
+        if len(lote) >= chunk_size:
+            total += len(abrir_tramos(lote))
+            lote = []
+    if lote:
+        total += len(abrir_tramos(lote))
+    return total
@@ -1,5 +1,7 @@
 from django import template
 
+from core import permisos
+
 register = template.Library()
 
 @register.filter(name="has_group")
@@ -9,6 +11,13 @@ def has_group(user, group_name: str) -> bool:
     Uso en plantilla:  {% if user|has_group:"Administrador" %} ... {% endif %}
     """
     try:
-        return user.is_authenticated and user.groups.filter(name=group_name).exists()
+        if not user.is_authenticated:
+            return False
+        if group_name in permisos.GRUPO:
+            return permisos.tiene(user, permisos.GRUPO[group_name])
+        # Una consulta por request aunque el filtro se use en cada fila de una tabla
+        if not hasattr(user, "_nombres_grupos"):
+            user._nombres_grupos = set(user.groups.values_list("name", flat=True))
+        return group_name in user._nombres_grupos
     except Exception:
         return False
@@ -1,5 +1,7 @@
 from django import template
 
+from core import permisos
+
 register = template.Library()
 
 @register.filter(name="has_group")
@@ -9,6 +11,8 @@ def has_group(user, group_name: str) -> bool:
     Uso en plantilla:  {% if user|has_group:"Administrador" %} ... {% endif %}
     """
     try:
+        if group_name in permisos.GRUPO:
+            return permisos.tiene(user, permisos.GRUPO[group_name])
         return user.is_authenticated and user.groups.filter(name=group_name).exists()
     except Exception:
         return False
@@ -6,6 +6,8 @@ app_name = "core"
 urlpatterns = [
     # Panel de Administración
     path("dashboard/admin/", views.dashboard_admin, name="dashboard_admin"),
+    path("metricas/consultas/", views.metricas_consultas, name="metricas_consultas"),
+    path("api/autocompletar/<str:fuente>/", views.autocompletar, name="autocompletar"),
     path("usuarios/", views.usuarios_lista, name="usuarios_lista"),
     path("usuarios/nuevo/", views.usuario_crear, name="usuario_crear"),
     path("usuarios/<int:pk>/", views.usuario_detalle, name="usuario_detalle"),
@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import Q
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import autocompletar as autocompletado
+from . import instrumentacion, permisos
 from .forms import UsuarioCrearForm, UsuarioEditarForm
 from .utils import solo_admin
 from .models import Incidencia
@@ -16,6 +21,41 @@ def dashboard_admin(request):
     return render(request, "personas/dashboards/admin.html")
 
 
+@login_required
+@solo_admin
+def metricas_consultas(request):
+    """Consultas SQL por vista acumuladas por el middleware de instrumentación."""
+    if request.method == "POST":
+        instrumentacion.reiniciar()
+        messages.success(request, "Métricas reiniciadas.")
+        return redirect("core:metricas_consultas")
+    return render(request, "core/metricas_consultas.html", {
+        "vistas": instrumentacion.resumen(),
+        "activo": getattr(settings, "INSTRUMENTAR_CONSULTAS", False),
+    })
+
+
+@login_required
+def autocompletar(request, fuente):
+    """
+    Sugerencias por prefijo para los campos con autocompletado.
+    Ruta: /core/api/autocompletar/<perfiles|departamentos|cuadrillas>/?q=...
+    Cada fuente exige las capacidades de los formularios que la usan.
+    """
+    if fuente not in autocompletado.FUENTES:
+        raise Http404
+    if not permisos.tiene(request.user, autocompletado.FUENTES[fuente].mascara):
+        raise PermissionDenied
+    filtros = {p: request.GET.getlist(p) for p in autocompletado.FUENTES[fuente].filtros}
+    try:
+        limite = max(1, min(int(request.GET.get("limite", autocompletado.LIMITE)), 50))
+    except ValueError:
+        limite = autocompletado.LIMITE
+    return JsonResponse({
+        "resultados": autocompletado.buscar(fuente, request.GET.get("q", ""), filtros, limite),
+    })
+
+
 @login_required
 @solo_admin
 def usuarios_lista(request):
@@ -0,0 +1,53 @@
+from urllib.parse import urlencode
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompletarSelect(forms.Select):
+    """
+    Select que solo trae la opción elegida: el resto se busca mientras se
+    escribe en /core/api/autocompletar/<fuente>/ (script en base.html).
+    ``filtros`` fija parámetros de la búsqueda (p. ej. ``{"grupo": ["Departamento"]}``)
+    y ``depende`` los toma de otro campo del formulario (``{"direccion": "id_direccion"}``).
+    """
+
+    def __init__(self, fuente, filtros=None, depende=None, attrs=None):
+        super().__init__(attrs)
+        self.fuente = fuente
+        self.filtros = filtros or {}
+        self.depende = depende or {}
+
+    def optgroups(self, name, value, attrs=None):
+        iterador = self.choices
+        if not hasattr(iterador, "queryset"):
+            return super().optgroups(name, value, attrs)
+        opciones = []
+        if iterador.field.empty_label is not None:
+            opciones.append(("", iterador.field.empty_label))
+        elegidos = [v for v in value if v not in ("", None)]
+        if elegidos:
+            try:
+                if hasattr(iterador, "seleccionados"):  # catálogo en memoria (core.referencias)
+                    objetos = iterador.seleccionados(elegidos)
+                else:
+                    objetos = iterador.queryset.filter(pk__in=elegidos)
+                opciones += [iterador.choice(obj) for obj in objetos]
+            except (ValueError, ValidationError):
+                pass
+        self.choices = opciones
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterador
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        url = reverse("core:autocompletar", args=[self.fuente])
+        if self.filtros:
+            url += "?" + urlencode(self.filtros, doseq=True)
+        context["widget"]["attrs"]["data-autocompletar"] = url
+        if self.depende:
+            context["widget"]["attrs"]["data-depende"] = ",".join(f"{p}:{i}" for p, i in self.depende.items())
+        return context
@@ -1,7 +1,13 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from core import metricas, salud
+
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -14,3 +20,29 @@ def health(request):
     """
     return Response({"status": "ok"})
 
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@authentication_classes([])
+def ready(request):
+    """
+    Readiness para balanceadores: tiempos de BD, almacenamiento, caché y correo.
+    Ruta: /api/ready/  (200 si todo responde, 503 si algo falla)
+    """
+    resultado = salud.estado()
+    return Response(resultado, status=200 if resultado["status"] == "ok" else 503)
+
+
+@require_GET
+def metrics(request):
+    """
+    Métricas en formato de texto de Prometheus (todos los workers sumados).
+    Ruta: /api/metrics/
+    """
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        # Rutas, volumen y errores no son públicos: fuera de DEBUG hace falta el token
+        return HttpResponse(status=403)
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(metricas.exposicion(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,96 @@
+"""
+Lecturas en una réplica de solo lectura (``settings.DB_REPLICA``, vacío = sin réplica).
+
+Solo van a la réplica las peticiones GET/HEAD a vistas marcadas con
+``@usa_replica`` (o vistas DRF con ``usa_replica = True``): dashboards,
+listados, analítica y exportaciones. Todo lo demás lee la primaria:
+
+- si la petición escribe algo, desde ese momento lee la primaria;
+- durante ``DB_REPLICA_PEGAJOSA_SEGUNDOS`` después de una escritura el
+  cliente sigue leyendo la primaria (cookie), para ver su propio cambio
+  aunque la réplica venga atrasada;
+- sesiones, usuarios, grupos, tokens y la caché de base de datos se leen
+  siempre en la primaria; los catálogos de core.referencias y los índices de
+  core.autocompletar también (se fijan bajo una versión y durarían viejos).
+"""
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+COOKIE = "primaria"
+SIEMPRE_PRIMARIA = {"sessions", "auth", "authtoken", "registration", "contenttypes", "django_cache"}
+METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+# {"replica": bool, "escribio": bool} de la petición en curso (None fuera de una petición)
+_estado = contextvars.ContextVar("estado_replica", default=None)
+
+
+def alias_replica():
+    return getattr(settings, "DB_REPLICA", "")
+
+
+def usa_replica(vista):
+    """Marca una vista de solo lectura cuyas consultas pueden ir a la réplica."""
+    vista.usa_replica = True
+    return vista
+
+
+def _marcada(vista):
+    return getattr(vista, "usa_replica", False) or getattr(getattr(vista, "cls", None), "usa_replica", False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if (
+            estado and estado["replica"]
+            and model._meta.app_label not in SIEMPRE_PRIMARIA
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return alias_replica()
+        # Explícito: si no, Django usaría la base de la instancia de las hints (quizá la réplica)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado and model._meta.app_label not in SIEMPRE_PRIMARIA:
+            estado["replica"] = False
+            estado["escribio"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != alias_replica()
+
+
+class ReplicaMiddleware:
+    """Decide por petición si las lecturas pueden ir a la réplica y marca al cliente tras escribir."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Se fija al empezar y no se limpia al terminar: las exportaciones en streaming
+        # consultan después de que la respuesta sale del middleware
+        estado = {"replica": False, "escribio": False}
+        _estado.set(estado)
+        response = self.get_response(request)
+        if alias_replica() and (estado["escribio"] or request.method not in METODOS_LECTURA):
+            response.set_cookie(
+                COOKIE, "1", max_age=settings.DB_REPLICA_PEGAJOSA_SEGUNDOS, httponly=True, samesite="Lax"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        estado = _estado.get()
+        if (
+            estado is not None
+            and alias_replica()
+            and request.method in METODOS_LECTURA
+            and COOKIE not in request.COOKIES
+            and _marcada(view_func)
+        ):
+            estado["replica"] = True
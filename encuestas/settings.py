@@ -1,7 +1,10 @@
 
 from pathlib import Path
+import copy
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -32,15 +35,33 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "core.metricas.MetricasMiddleware",
+    "core.instrumentacion.InstrumentacionConsultasMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.permisos.PermisosMiddleware",
+    "encuestas.db_router.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Conteo/tiempo de consultas por vista (Server-Timing + /core/metricas/consultas/)
+INSTRUMENTAR_CONSULTAS = os.getenv("INSTRUMENTAR_CONSULTAS", "False") == "True"
+
+# /api/metrics/: un archivo por proceso en este directorio (compartido por los workers)
+METRICAS_DIR = os.getenv("METRICAS_DIR", "")
+# /api/metrics/ exige "Authorization: Bearer <token>"; sin token solo responde con DEBUG
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "")
+
+# /api/ready/ reutiliza su resultado durante estos segundos
+READY_CACHE_SEGUNDOS = int(os.getenv("READY_CACHE_SEGUNDOS", "5"))
+
+# incidencias_lista lee core.IncidenciaListado (al activarlo: manage.py reconstruir_listado)
+LISTADO_DESNORMALIZADO = os.getenv("LISTADO_DESNORMALIZADO", "False") == "True"
+
 ROOT_URLCONF = "encuestas.urls"
 
 TEMPLATES = [
@@ -59,6 +80,16 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # En producción las plantillas se compilan una vez por proceso (sin revisar si cambiaron)
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("django.template.loaders.cached.Loader", [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ]),
+    ]
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
@@ -74,17 +105,72 @@ WSGI_APPLICATION = "encuestas.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": ("muni"),
-        "USER": ("postgres"),
-        "PASSWORD": ("root"),
-        "HOST": ("localhost"),
-        "PORT": ("5432"),
-        "CONN_MAX_AGE": 60,
+        "ENGINE": os.getenv("DB_ENGINE", "django.db.backends.postgresql"),
+        "NAME": os.getenv("DB_NAME", "muni"),
+        "USER": os.getenv("DB_USER", "postgres"),
+        "PASSWORD": os.getenv("DB_PASSWORD", "root"),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
         "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Manejo de conexiones (benchmark: manage.py benchmark_conexiones):
+# - "persistente": una conexión por hilo que dura DB_CONN_MAX_AGE segundos (una por worker).
+# - "pool": pool nativo de psycopg 3 por proceso (requiere psycopg-pool); Django exige CONN_MAX_AGE=0.
+# - "pgbouncer": detrás de PgBouncer en modo transacción; sin cursores del lado del servidor
+#   ni sentencias preparadas, que no sobreviven a cambiar de conexión entre transacciones.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "persistente")
+if DB_POOL_MODE not in ("persistente", "pool", "pgbouncer"):
+    raise ImproperlyConfigured(f"DB_POOL_MODE desconocido: {DB_POOL_MODE!r}")
+if "postgresql" in DATABASES["default"]["ENGINE"]:
+    if DB_POOL_MODE == "pool":
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"] = {"pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }}
+    elif DB_POOL_MODE == "pgbouncer":
+        DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+        DATABASES["default"]["OPTIONS"] = {"prepare_threshold": None}
+
+# Réplica de solo lectura opcional (encuestas/db_router.py); hereda lo que no se defina
+DB_REPLICA = "replica" if (os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_NAME")) else ""
+if DB_REPLICA:
+    DATABASES[DB_REPLICA] = {
+        **DATABASES["default"],
+        "OPTIONS": copy.deepcopy(DATABASES["default"].get("OPTIONS", {})),  # pool propio
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        # En los tests la réplica es la misma base de pruebas
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["encuestas.db_router.ReplicaRouter"]
+# Segundos que un cliente sigue leyendo la primaria después de escribir
+DB_REPLICA_PEGAJOSA_SEGUNDOS = int(os.getenv("DB_REPLICA_PEGAJOSA_SEGUNDOS", "5"))
+
+# Caché compartida por todos los workers: las invalidaciones (permisos, catálogos,
+# autocompletado, paneles) cambian versiones guardadas aquí y cada
+# proceso las compara. Una caché por proceso (LocMemCache) no sirve: core/checks.py
+# lo rechaza fuera de DEBUG. Sin Redis se usa una tabla (la crea la migración core 0018):
+# es correcta, pero cada lectura de versión pasa a ser una consulta (permisos, catálogos,
+# fragmentos y definiciones dejan de ahorrar la base), así que check --deploy avisa core.W002.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_REDIS_URL}}
+else:
+    CACHES = {"default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "core_cache",
+        # Las versiones no tienen vencimiento: que el descarte por tamaño sea raro
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
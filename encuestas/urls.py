@@ -48,6 +48,8 @@ urlpatterns = [
 
     # API básica para frontend React
     path("api/health/", api_views.health, name="api_health"),
+    path("api/ready/", api_views.ready, name="api_ready"),
+    path("api/metrics/", api_views.metrics, name="api_metrics"),
     path("api/login/", obtain_auth_token, name="api_login"),
     path("api/auth/token/", obtain_auth_token, name="api_token_auth"),
 ]
@@ -0,0 +1,191 @@
+"""
+Series de tiempo de incidencias para reportes de gestión.
+
+Los volúmenes (creadas/cerradas por día o semana, agrupados por fecha
+truncada) y los tiempos de cierre (mediana y p90, ``percentile_cont`` en
+PostgreSQL) salen de una sola consulta ``UNION ALL`` de tres ramas. Los
+resultados se guardan en caché por combinación de parámetros.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Aggregate, CharField, Count, DateTimeField, F, FloatField, Func, IntegerField, Value,
+)
+from django.db.models.functions import Cast, TruncDay, TruncWeek
+from django.utils import timezone
+
+from core.models import Incidencia
+
+CACHE_TIMEOUT = 300
+TRUNCADORES = {"dia": TruncDay, "semana": TruncWeek}
+AGRUPACIONES = {
+    "departamento": ("departamento_id", "departamento__nombre_departamento"),
+    "tipo": ("tipo_incidencia_id", "tipo_incidencia__nombre_problema"),
+}
+# Columnas del UNION, en el mismo orden en las tres ramas
+GRUPOS = [c for clave in AGRUPACIONES for c in (f"g_{clave}", f"g_{clave}_nombre")]
+COLUMNAS = ("serie", "periodo", "inicio", "fin", *GRUPOS, "n", "mediana", "p90")
+
+
+class Percentil(Aggregate):
+    """percentile_cont(p) WITHIN GROUP (ORDER BY expr) de PostgreSQL."""
+    function = "PERCENTILE_CONT"
+    name = "Percentil"
+    template = "%(function)s(%(percentil)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentil, **extra):
+        super().__init__(expression, percentil=float(percentil), **extra)
+
+
+class SegundosHastaCierre(Func):
+    template = "EXTRACT(EPOCH FROM (%(expressions)s))"
+    arg_joiner = " - "
+    output_field = FloatField()
+
+    def __init__(self, **extra):
+        super().__init__(F("fecha_cierre"), F("creadoEl"), **extra)
+
+
+def percentil(valores, p):
+    """Percentil continuo (interpolación lineal, igual que percentile_cont); ``p`` entre 0 y 1."""
+    if not valores:
+        return None
+    valores = sorted(valores)
+    k = (len(valores) - 1) * p
+    piso = int(k)
+    techo = min(piso + 1, len(valores) - 1)
+    return valores[piso] + (valores[techo] - valores[piso]) * (k - piso)
+
+
+def _nulo(campo):
+    # NULL con tipo: las ramas del UNION deben coincidir columna a columna
+    return Cast(Value(None), campo)
+
+
+def _volumen(qs, serie, fecha, periodo, desde, hasta):
+    """Creadas (``creadoEl``) o cerradas (``fecha_cierre``) por periodo."""
+    return (
+        qs.filter(**{f"{fecha}__date__gte": desde, f"{fecha}__date__lte": hasta})
+        .annotate(
+            serie=Value(serie), periodo=TRUNCADORES[periodo](fecha),
+            inicio=_nulo(DateTimeField()), fin=_nulo(DateTimeField()),
+            **{g: _nulo(CharField() if g.endswith("_nombre") else IntegerField()) for g in GRUPOS},
+        )
+        .values(*COLUMNAS[:-3])
+        .annotate(n=Count("id"), mediana=_nulo(FloatField()), p90=_nulo(FloatField()))
+        .values(*COLUMNAS)
+        .order_by()
+    )
+
+
+def _tiempos(qs, agrupar, desde, hasta):
+    """Tiempos de cierre por grupo; fuera de PostgreSQL, una fila por incidencia cerrada."""
+    grupos = {}
+    for clave, (id_, nombre) in AGRUPACIONES.items():
+        usado = clave in agrupar
+        grupos[f"g_{clave}"] = F(id_) if usado else _nulo(IntegerField())
+        grupos[f"g_{clave}_nombre"] = F(nombre) if usado else _nulo(CharField())
+    cerradas = qs.filter(fecha_cierre__date__gte=desde, fecha_cierre__date__lte=hasta)
+    if connection.vendor == "postgresql":
+        return (
+            cerradas
+            .annotate(
+                serie=Value("t"), periodo=_nulo(DateTimeField()), inicio=_nulo(DateTimeField()),
+                fin=_nulo(DateTimeField()), **grupos,
+            )
+            .values(*COLUMNAS[:-3])
+            .annotate(
+                n=Count("id"),
+                mediana=Percentil(SegundosHastaCierre(), 0.5),
+                p90=Percentil(SegundosHastaCierre(), 0.9),
+            )
+            .values(*COLUMNAS)
+            .order_by()
+        )
+    # Otros motores (SQLite en desarrollo) no tienen percentile_cont
+    return (
+        cerradas
+        .annotate(
+            serie=Value("t"), periodo=_nulo(DateTimeField()), inicio=F("creadoEl"), fin=F("fecha_cierre"), **grupos,
+            n=Value(1), mediana=_nulo(FloatField()), p90=_nulo(FloatField()),
+        )
+        .values(*COLUMNAS)
+        .order_by()
+    )
+
+
+def _horas(segundos):
+    return round(segundos / 3600, 2) if segundos is not None else None
+
+
+def calcular(qs, periodo, desde, hasta, agrupar):
+    """
+    Volumen por periodo y tiempos de cierre por grupo en una sola consulta
+    ``UNION ALL`` (la columna ``serie`` dice de qué rama viene cada fila).
+    """
+    consulta = _volumen(qs, "c", "creadoEl", periodo, desde, hasta).union(
+        _volumen(qs, "x", "fecha_cierre", periodo, desde, hasta),
+        _tiempos(qs, agrupar, desde, hasta),
+        all=True,
+    )
+    campos = []
+    for clave in agrupar:
+        campos.extend(AGRUPACIONES[clave])
+    volumen, tiempos, segundos = {}, {}, {}
+    for fila in consulta:
+        if fila["serie"] != "t":
+            clave = fila["periodo"].date().isoformat()
+            actual = volumen.setdefault(clave, {"periodo": clave, "creadas": 0, "cerradas": 0})
+            actual["creadas" if fila["serie"] == "c" else "cerradas"] += fila["n"]
+            continue
+        grupo = tuple(fila[f"g_{c}{sufijo}"] for c in agrupar for sufijo in ("", "_nombre"))
+        if fila["fin"] is None:
+            tiempos[grupo] = {
+                **dict(zip(campos, grupo)), "cerradas": fila["n"],
+                "mediana_horas": _horas(fila["mediana"]), "p90_horas": _horas(fila["p90"]),
+            }
+        else:
+            segundos.setdefault(grupo, []).append((fila["fin"] - fila["inicio"]).total_seconds())
+    for grupo, valores in segundos.items():
+        tiempos[grupo] = {
+            **dict(zip(campos, grupo)), "cerradas": len(valores),
+            "mediana_horas": _horas(percentil(valores, 0.5)), "p90_horas": _horas(percentil(valores, 0.9)),
+        }
+    return [volumen[k] for k in sorted(volumen)], [tiempos[k] for k in sorted(tiempos, key=_orden)]
+
+
+def _orden(grupo):
+    # Los None (sin departamento) van al final, como en el ORDER BY de PostgreSQL
+    return tuple((v is None, v) for v in grupo)
+
+
+def resumen(periodo="dia", desde=None, hasta=None, agrupar=("departamento", "tipo"), departamento_id=None):
+    """Calcula (o lee de caché) el reporte completo para los parámetros dados."""
+    hasta = hasta or timezone.localdate()
+    desde = desde or hasta - timedelta(days=90)
+    clave = "analitica:incidencias:" + hashlib.md5(
+        repr((periodo, desde, hasta, tuple(agrupar), departamento_id)).encode()
+    ).hexdigest()
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    qs = Incidencia.objects.all()
+    if departamento_id:
+        qs = qs.filter(departamento_id=departamento_id)
+
+    volumen, tiempos_cierre = calcular(qs, periodo, desde, hasta, agrupar)
+    datos = {
+        "periodo": periodo,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "volumen": volumen,
+        "tiempos_cierre": tiempos_cierre,
+        "generado": timezone.now().isoformat(),
+    }
+    cache.set(clave, datos, CACHE_TIMEOUT)
+    return datos
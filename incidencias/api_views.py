@@ -2,11 +2,17 @@ import os
 from django.utils.text import slugify
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from core.models import Incidencia, JefeCuadrilla, Multimedia
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from core.models import Incidencia, Multimedia
+from core.historial import registrar_transicion
+from core.permisos import EsAdminODireccion
+from encuestas.db_router import usa_replica
+from . import analitica
 from .serializers import IncidenciaSerializer, ResolverIncidenciaSerializer, RechazarIncidenciaSerializer
 
 class IncidenciaViewSet(viewsets.ModelViewSet):
@@ -18,22 +24,11 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     queryset = Incidencia.objects.none() 
+    usa_replica = True  # solo los GET (encuestas.db_router)
 
     def get_queryset(self):
-        user = self.request.user
-        profile = getattr(user, "profile", None)
-        if not profile:
-            return Incidencia.objects.none()
-
-        try:
-            cuadrillas = JefeCuadrilla.objects.filter(usuario=profile) | JefeCuadrilla.objects.filter(encargado=profile)
-        except Exception:
-            return Incidencia.objects.none()
-
-        if not cuadrillas.exists():
-            return Incidencia.objects.none()
-
-        qs = Incidencia.objects.filter(cuadrilla__in=cuadrillas)
+        # Solo las de sus cuadrillas: ids resueltos una vez, filtro cuadrilla_id IN (...)
+        qs = Incidencia.objects.de_cuadrillas_de(self.request.user)
 
         estado = self.request.query_params.get("estado")
         if estado:
@@ -41,6 +36,11 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
         
         return qs.select_related("cuadrilla", "departamento", "tipo_incidencia").prefetch_related("multimedias").order_by("-creadoEl")
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            incidencia = serializer.save(estado="pendiente")
+            registrar_transicion(incidencia, None, self.request.user)
+
     @action(detail=False, methods=['get'])
     def asignadas(self, request):
         """
@@ -58,7 +58,9 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
         Ruta: /api/incidencias/{pk}/resolver/
         """
         incidencia = self.get_object()
-        serializer = ResolverIncidenciaSerializer(incidencia, data=request.data, partial=True)
+        serializer = ResolverIncidenciaSerializer(
+            incidencia, data=request.data, partial=True, context=self.get_serializer_context()
+        )
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -71,7 +73,9 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
         Ruta: /api/incidencias/{pk}/rechazar/
         """
         incidencia = self.get_object()
-        serializer = RechazarIncidenciaSerializer(incidencia, data=request.data, partial=True)
+        serializer = RechazarIncidenciaSerializer(
+            incidencia, data=request.data, partial=True, context=self.get_serializer_context()
+        )
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -90,7 +94,9 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         incidencia.estado = "en_proceso"
-        incidencia.save(update_fields=["estado", "actualizadoEl"])
+        with transaction.atomic():
+            incidencia.save(update_fields=["estado", "actualizadoEl"])
+            registrar_transicion(incidencia, "pendiente", request.user)
         serializer = self.get_serializer(incidencia)
         return Response(serializer.data)
 
@@ -121,7 +127,9 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
             incidencia.motivo_rechazo = comentario
 
         incidencia.estado = "finalizada"
-        incidencia.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+        with transaction.atomic():
+            incidencia.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+            registrar_transicion(incidencia, "en_proceso", request.user, comentario)
 
         serializer = self.get_serializer(incidencia)
         return Response(serializer.data)
@@ -155,3 +163,44 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
             )
 
         return Response({"urls": urls, "absolute_urls": [request.build_absolute_uri(u) for u in urls]}, status=status.HTTP_201_CREATED)
+
+
+@usa_replica
+@api_view(["GET"])
+@authentication_classes([SessionAuthentication, TokenAuthentication])
+@permission_classes([EsAdminODireccion])
+def analitica_incidencias(request):
+    """
+    Incidencias creadas/cerradas por día o semana y mediana/p90 del tiempo de cierre.
+    Ruta: /incidencias/api/analitica/?periodo=dia|semana&desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+          &agrupar=departamento,tipo&departamento=<id>
+    """
+    periodo = request.query_params.get("periodo", "dia")
+    if periodo not in analitica.TRUNCADORES:
+        return Response({"detail": "periodo debe ser 'dia' o 'semana'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    agrupar = [a for a in request.query_params.get("agrupar", "departamento,tipo").split(",") if a]
+    if not agrupar or any(a not in analitica.AGRUPACIONES for a in agrupar):
+        return Response(
+            {"detail": "agrupar acepta 'departamento' y/o 'tipo'."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fechas = {}
+    for campo in ("desde", "hasta"):
+        valor = request.query_params.get(campo)
+        try:
+            fechas[campo] = parse_date(valor) if valor else None
+        except ValueError:  # bien formada pero imposible (2024-13-45)
+            fechas[campo] = None
+        if valor and fechas[campo] is None:
+            return Response({"detail": f"'{campo}' debe tener formato AAAA-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+    departamento = request.query_params.get("departamento")
+    datos = analitica.resumen(
+        periodo=periodo,
+        desde=fechas["desde"],
+        hasta=fechas["hasta"],
+        agrupar=agrupar,
+        departamento_id=int(departamento) if departamento and departamento.isdigit() else None,
+    )
+    return Response(datos)
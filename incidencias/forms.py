@@ -1,6 +1,12 @@
 from django import forms
-from core.models import Incidencia, Departamento, JefeCuadrilla, Direccion, TipoIncidencia
+from core.models import Incidencia
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
+from django.urls import reverse
+from urllib.parse import urlencode
+from core import referencias
+from core.referencias import ReferenciaChoiceField
+from core.widgets import AutocompletarSelect
 
 class IncidenciaForm(forms.ModelForm):
     ESTADO_CHOICES = [
@@ -57,6 +63,12 @@ class IncidenciaForm(forms.ModelForm):
             "latitud", "longitud", "direccion", "departamento","nombre_vecino","correo_vecino","telefono_vecino",
             "cuadrilla", "tipo_incidencia", "evidencia_inicial"
         ]
+        field_classes = {
+            "direccion": ReferenciaChoiceField,
+            "departamento": ReferenciaChoiceField,
+            "cuadrilla": ReferenciaChoiceField,
+            "tipo_incidencia": ReferenciaChoiceField,
+        }
         widgets = {
             "titulo": forms.TextInput(attrs={"class": "form-control", "placeholder": "Título"}),
             "descripcion": forms.Textarea(attrs={"class": "form-control", "rows": 3}),
@@ -64,7 +76,7 @@ class IncidenciaForm(forms.ModelForm):
             "latitud": forms.NumberInput(attrs={"class": "form-control"}),
             "longitud": forms.NumberInput(attrs={"class": "form-control"}),
             "direccion": forms.Select(attrs={"class": "form-select"}),
-            "departamento": forms.Select(attrs={"class": "form-select"}),
+            "departamento": AutocompletarSelect("departamentos", depende={"direccion": "id_direccion"}, attrs={"class": "form-select"}),
             "nombre_vecino": forms.TextInput(attrs={"class": "form-control", "placeholder": "Nombre del vecino"}),
             "correo_vecino": forms.EmailInput(attrs={"class": "form-control", "placeholder": "Correo del vecino"}),
             "telefono_vecino": forms.TextInput(attrs={"class": "form-control", "placeholder": "Teléfono del vecino"}),
@@ -74,12 +86,12 @@ class IncidenciaForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        direcciones_qs = Direccion.objects.filter(estado=True)
-        departamentos_activos = Departamento.objects.filter(estado=True).select_related("direccion")
+        # Opciones desde el catálogo en memoria (core.referencias): sin consultas al armar ni validar
+        departamentos_activos = referencias.departamentos(activos=True)
 
-        self.fields["direccion"].queryset = direcciones_qs
-        self.fields['departamento'].queryset = departamentos_activos
-        self.fields['tipo_incidencia'].queryset = TipoIncidencia.objects.all().order_by("nombre_problema")
+        self.fields["direccion"].opciones = referencias.direcciones(activas=True)
+        self.fields['departamento'].opciones = departamentos_activos
+        self.fields['tipo_incidencia'].opciones = referencias.tipos()
         self.fields['titulo'].required = True
         self.fields['descripcion'].required = True
         self.fields['departamento'].required = True
@@ -88,47 +100,37 @@ class IncidenciaForm(forms.ModelForm):
         # La cuadrilla no es obligatoria inicialmente
         self.fields['cuadrilla'].required = False
         
-        # Filtrar cuadrillas según el departamento
-        if self.instance and self.instance.pk and self.instance.departamento:
-            # Si la instancia ya existe y tiene departamento, filtrar por ese departamento
-            cuadrillas_disponibles = JefeCuadrilla.objects.filter(
-                departamento=self.instance.departamento
-            )
-            # Si la instancia tiene una cuadrilla asignada, incluirla aunque no esté en el filtro
-            if self.instance.cuadrilla and self.instance.cuadrilla not in cuadrillas_disponibles:
-                cuadrillas_disponibles = cuadrillas_disponibles | JefeCuadrilla.objects.filter(
-                    pk=self.instance.cuadrilla.pk
-            )
-            self.fields['cuadrilla'].queryset = cuadrillas_disponibles
-        else:
-            # Para nuevas incidencias, mostrar todas las cuadrillas
-            self.fields['cuadrilla'].queryset = JefeCuadrilla.objects.all()
+        # Filtrar cuadrillas según el departamento (enviado o el de la instancia); sin
+        # departamento el select parte vacío y el JS lo llena al elegir uno
+        departamento_id = self.data.get("departamento") or (self.instance.departamento_id if self.instance else None)
+        cuadrillas_disponibles = referencias.cuadrillas(departamento=departamento_id) if departamento_id else []
+        # Si la instancia tiene una cuadrilla asignada, incluirla aunque no esté en el filtro
+        if self.instance and self.instance.cuadrilla_id:
+            cuadrilla_actual = referencias.obtener("cuadrillas", self.instance.cuadrilla_id)
+            if cuadrilla_actual and cuadrilla_actual not in cuadrillas_disponibles:
+                cuadrillas_disponibles.append(cuadrilla_actual)
+        self.fields['cuadrilla'].opciones = cuadrillas_disponibles
+        # El JS del formulario baja una vez el mapa departamento -> cuadrillas (URL versionada, cacheable)
+        etag = referencias.mapa_cuadrillas()["etag"].strip('"')
+        self.fields['cuadrilla'].widget.attrs["data-mapa"] = (
+            reverse("incidencias:cuadrillas_por_departamento_mapa") + "?" + urlencode({"v": etag})
+        )
 
         # Preseleccionar dirección según el departamento existente o dato enviado
-        if self.instance and self.instance.pk and self.instance.departamento and self.instance.departamento.direccion:
-            self.fields["direccion"].initial = self.instance.departamento.direccion
+        departamento_actual = referencias.obtener("departamentos", self.instance.departamento_id) if self.instance else None
+        if self.instance and self.instance.pk and departamento_actual and departamento_actual.direccion_id:
+            self.fields["direccion"].initial = referencias.obtener("direcciones", departamento_actual.direccion_id)
         elif self.data.get("direccion"):
-            try:
-                self.fields["direccion"].initial = Direccion.objects.get(pk=self.data.get("direccion"))
-            except Direccion.DoesNotExist:
-                pass
+            direccion = referencias.obtener("direcciones", self.data.get("direccion"))
+            if direccion is not None:
+                self.fields["direccion"].initial = direccion
 
         # Filtrar departamentos por dirección seleccionada si existe
-        direccion_id = self.data.get("direccion") or (
-            self.instance.departamento.direccion.pk
-            if self.instance and self.instance.departamento and self.instance.departamento.direccion
-            else None
-        )
+        direccion_id = self.data.get("direccion") or (departamento_actual.direccion_id if departamento_actual else None)
         if direccion_id:
-            try:
-                dep_filtrados = departamentos_activos.filter(direccion_id=direccion_id)
-                # Si no hay departamentos en esa dirección, mantener los activos para no dejar vacío el select
-                self.fields['departamento'].queryset = dep_filtrados if dep_filtrados.exists() else departamentos_activos
-            except Exception:
-                self.fields['departamento'].queryset = departamentos_activos
-        else:
-            # Sin dirección seleccionada, mostrar todos los activos
-            self.fields['departamento'].queryset = departamentos_activos
+            dep_filtrados = referencias.departamentos(activos=True, direccion=direccion_id)
+            # Si no hay departamentos en esa dirección, mantener los activos para no dejar vacío el select
+            self.fields['departamento'].opciones = dep_filtrados or departamentos_activos
 
         if not self.instance or not getattr(self.instance, 'pk', None):
 
@@ -139,7 +141,8 @@ class IncidenciaForm(forms.ModelForm):
         titulo = self.cleaned_data.get("titulo", "").strip()
         if not titulo:
             raise ValidationError("El título de la incidencia es obligatorio.")
-        if Incidencia.objects.filter(titulo__iexact=titulo).exclude(pk=self.instance.pk).exists():
+        repetidas = Incidencia.objects.alias(titulo_min=Lower("titulo")).filter(titulo_min=titulo.lower())
+        if repetidas.exclude(pk=self.instance.pk).exists():
             raise ValidationError("Ya existe una incidencia con este título.")
         return titulo
 
@@ -192,16 +195,16 @@ class IncidenciaForm(forms.ModelForm):
         direccion = cleaned.get("direccion")
         departamento = cleaned.get("departamento")
         # Si el departamento tiene dirección, sincronizamos y evitamos error
-        if departamento and departamento.direccion:
-            cleaned["direccion"] = departamento.direccion
+        if departamento and departamento.direccion_id:
+            cleaned["direccion"] = referencias.obtener("direcciones", departamento.direccion_id) or direccion
         return cleaned
 
     def save(self, commit=True):
         incidencia = super().save(commit=False)
         incidencia.titulo = incidencia.titulo.strip()
         # Sincronizar dirección con el departamento
-        if incidencia.departamento and incidencia.departamento.direccion:
-            incidencia.direccion = incidencia.departamento.direccion
+        if incidencia.departamento and incidencia.departamento.direccion_id:
+            incidencia.direccion_id = incidencia.departamento.direccion_id
         
         # Preservar la cuadrilla si no se cambió en el formulario
         if self.instance.pk and 'cuadrilla' not in self.changed_data:
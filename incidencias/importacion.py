@@ -0,0 +1,219 @@
+"""
+Importación masiva de incidencias desde CSV (sistemas municipales legados).
+
+El archivo se lee en streaming con ``csv.DictReader``; los nombres de
+departamento, tipo y cuadrilla se resuelven con mapas en memoria construidos
+una sola vez, y las filas válidas se insertan con ``bulk_create`` por lotes,
+cada lote en su propia transacción junto con su historial y tramos de SLA.
+Las filas con error no detienen la carga: se informan con su número de línea.
+
+Columnas reconocidas (encabezado obligatorio): titulo, descripcion, estado,
+prioridad, departamento, tipo_incidencia, cuadrilla, latitud, longitud,
+nombre_vecino, correo_vecino, telefono_vecino, creado_el, fecha_cierre.
+"""
+import csv
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import contadores, fragmentos, listado, sla
+from core.historial import nueva_transicion, registrar_transiciones
+from core.models import ESTADO_INCIDENCIA_CHOICES, Departamento, Incidencia, JefeCuadrilla, TipoIncidencia
+
+ESTADOS = {e for e, _ in ESTADO_INCIDENCIA_CHOICES}
+PRIORIDADES = {"alta", "media", "baja"}
+COLUMNAS_OBLIGATORIAS = {"titulo", "departamento"}
+
+
+def _clave(nombre):
+    return (nombre or "").strip().casefold()
+
+
+@dataclass
+class ResultadoImportacion:
+    leidas: int = 0
+    validas: int = 0
+    creadas: int = 0
+    errores: list = field(default_factory=list)  # [(linea, mensaje)]
+
+
+class ImportadorIncidencias:
+    def __init__(self, usuario=None, batch_size=1000, validar_solo=False):
+        self.usuario = usuario
+        self.batch_size = batch_size
+        self.validar_solo = validar_solo
+        # Mapas nombre -> ids, una consulta por tabla para todo el archivo
+        self.departamentos = {
+            _clave(nombre): (pk, direccion_id)
+            for pk, nombre, direccion_id in Departamento.objects.values_list(
+                "id", "nombre_departamento", "direccion_id"
+            )
+        }
+        self.tipos = {
+            _clave(nombre): pk for pk, nombre in TipoIncidencia.objects.values_list("id", "nombre_problema")
+        }
+        self.cuadrillas = {
+            _clave(nombre): pk for pk, nombre in JefeCuadrilla.objects.values_list("id", "nombre_cuadrilla")
+        }
+
+    # ----------------- validación de filas -----------------
+    def _fecha(self, valor, campo):
+        if not valor:
+            return None
+        try:
+            fecha = parse_datetime(valor.strip())
+        except ValueError:  # bien formada pero imposible, p. ej. 2024-02-30
+            fecha = None
+        if fecha is None:
+            raise ValidationError(f"'{campo}' no tiene un formato de fecha válido (AAAA-MM-DD HH:MM).")
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        return fecha
+
+    def construir(self, fila):
+        """Convierte una fila del CSV en una Incidencia sin guardar o lanza ValidationError."""
+        titulo = (fila.get("titulo") or "").strip()
+        if not titulo:
+            raise ValidationError("El título es obligatorio.")
+
+        departamento = self.departamentos.get(_clave(fila.get("departamento")))
+        if departamento is None:
+            raise ValidationError(f"Departamento '{fila.get('departamento')}' no existe.")
+        departamento_id, direccion_id = departamento
+
+        tipo_id = None
+        if fila.get("tipo_incidencia"):
+            tipo_id = self.tipos.get(_clave(fila["tipo_incidencia"]))
+            if tipo_id is None:
+                raise ValidationError(f"Tipo de incidencia '{fila['tipo_incidencia']}' no existe.")
+
+        cuadrilla_id = None
+        if fila.get("cuadrilla"):
+            cuadrilla_id = self.cuadrillas.get(_clave(fila["cuadrilla"]))
+            if cuadrilla_id is None:
+                raise ValidationError(f"Cuadrilla '{fila['cuadrilla']}' no existe.")
+
+        estado = _clave(fila.get("estado")) or "pendiente"
+        if estado not in ESTADOS:
+            raise ValidationError(f"Estado '{fila.get('estado')}' no válido.")
+        prioridad = _clave(fila.get("prioridad")) or "media"
+        if prioridad not in PRIORIDADES:
+            raise ValidationError(f"Prioridad '{fila.get('prioridad')}' no válida.")
+
+        # Sin coordenadas quedan nulas (no 0,0)
+        try:
+            latitud = float(fila["latitud"]) if fila.get("latitud") else None
+            longitud = float(fila["longitud"]) if fila.get("longitud") else None
+        except ValueError:
+            raise ValidationError("Latitud/longitud deben ser numéricas.")
+
+        correo = (fila.get("correo_vecino") or "").strip()
+        if correo:
+            validate_email(correo)
+
+        incidencia = Incidencia(
+            titulo=titulo[:200],
+            descripcion=(fila.get("descripcion") or "").strip(),
+            estado=estado,
+            prioridad=prioridad,
+            latitud=latitud,
+            longitud=longitud,
+            nombre_vecino=(fila.get("nombre_vecino") or "").strip()[:100],
+            correo_vecino=correo,
+            telefono_vecino=(fila.get("telefono_vecino") or "").strip()[:20],
+            departamento_id=departamento_id,
+            direccion_id=direccion_id,
+            tipo_incidencia_id=tipo_id,
+            cuadrilla_id=cuadrilla_id,
+            fecha_cierre=self._fecha(fila.get("fecha_cierre"), "fecha_cierre"),
+        )
+        incidencia._creado_legado = self._fecha(fila.get("creado_el"), "creado_el")
+        return incidencia
+
+    # ----------------- inserción por lotes -----------------
+    def _insertar(self, lote, resultado):
+        # Títulos repetidos dentro del lote o ya existentes en la base, sin distinguir
+        # mayúsculas como el formulario (índice incidencia_titulo_lower_idx)
+        titulos = {inc.titulo.lower() for _, inc in lote}
+        existentes = set(
+            Incidencia.objects.annotate(titulo_min=Lower("titulo"))
+            .filter(titulo_min__in=titulos)
+            .values_list("titulo_min", flat=True)
+        )
+        vistos = set()
+        validas = []
+        for linea, inc in lote:
+            clave = inc.titulo.lower()
+            if clave in existentes or clave in vistos:
+                resultado.errores.append((linea, f"Ya existe una incidencia con el título '{inc.titulo}'."))
+                continue
+            vistos.add(clave)
+            validas.append(inc)
+
+        resultado.validas += len(validas)
+        if self.validar_solo or not validas:
+            return
+
+        with transaction.atomic():
+            creadas = Incidencia.objects.bulk_create(validas, batch_size=self.batch_size)
+            # creadoEl es auto_now_add: se restaura la fecha original del sistema legado
+            con_fecha = [inc for inc in creadas if inc._creado_legado]
+            for inc in con_fecha:
+                inc.creadoEl = inc._creado_legado
+            if con_fecha:
+                Incidencia.objects.bulk_update(con_fecha, ["creadoEl"], batch_size=self.batch_size)
+
+            registrar_transiciones(
+                [
+                    nueva_transicion(inc, None, self.usuario, "Importación CSV", fecha=inc.creadoEl)
+                    for inc in creadas
+                ],
+                batch_size=self.batch_size,
+            )
+            sla.abrir_tramos(creadas, batch_size=self.batch_size)
+            contadores.incidencias_creadas(creadas)
+            listado.incidencias_creadas(creadas, batch_size=self.batch_size)
+        # bulk_create no dispara signals: los paneles de los dashboards se invalidan a mano
+        fragmentos.invalidar_paneles()
+        resultado.creadas += len(creadas)
+
+    def importar(self, archivo):
+        """
+        ``archivo`` es un objeto de texto (abierto con encoding utf-8-sig). Si el
+        archivo deja de poderse leer (otra codificación, CSV malformado) la carga
+        se detiene ahí y se informa como error; lo leído antes sí se procesa.
+        """
+        resultado = ResultadoImportacion()
+        lector = csv.DictReader(archivo)
+        lote = []
+        try:
+            faltantes = COLUMNAS_OBLIGATORIAS - set(lector.fieldnames or [])
+            if faltantes:
+                resultado.errores.append((1, f"Faltan columnas obligatorias: {', '.join(sorted(faltantes))}."))
+                return resultado
+
+            for fila in lector:
+                resultado.leidas += 1
+                linea = lector.line_num
+                try:
+                    lote.append((linea, self.construir(fila)))
+                except ValidationError as e:
+                    resultado.errores.append((linea, " ".join(e.messages)))
+                if len(lote) >= self.batch_size:
+                    self._insertar(lote, resultado)
+                    lote = []
+        except UnicodeDecodeError:
+            resultado.errores.append((
+                lector.line_num + 1,
+                "El archivo no está en UTF-8 desde esta línea (¿exportado en Latin-1?); se detuvo la carga.",
+            ))
+        except csv.Error as e:
+            resultado.errores.append((lector.line_num, f"CSV malformado ({e}); se detuvo la carga."))
+        if lote:
+            self._insertar(lote, resultado)
+        return resultado
@@ -1,5 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 from core.models import Incidencia, Multimedia
+from core.historial import registrar_transicion
+
+
+def _usuario_contexto(serializer):
+    request = serializer.context.get("request")
+    return getattr(request, "user", None)
 
 
 class MultimediaSerializer(serializers.ModelSerializer):
@@ -30,6 +37,9 @@ class IncidenciaSerializer(serializers.ModelSerializer):
             "longitud",
             "multimedias",
         ]
+        # El estado solo cambia por las acciones (resolver, rechazar, ...), que validan
+        # la transición y la registran en el historial
+        read_only_fields = ["estado"]
 
 
 class ResolverIncidenciaSerializer(serializers.ModelSerializer):
@@ -61,21 +71,24 @@ class ResolverIncidenciaSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         urls = validated_data.pop("evidencia_urls", [])
         comentario = validated_data.pop("comentario", None)
-
-        for url in urls:
-            Multimedia.objects.create(
-                nombre="Evidencia",
-                url=url,
-                tipo="image",
-                formato=url.split(".")[-1][:10] if "." in url else "",
-                incidencia=instance,
-            )
-
-        if comentario:
-            instance.motivo_rechazo = comentario
-
-        instance.estado = "finalizada"
-        instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+        estado_anterior = instance.estado
+
+        with transaction.atomic():
+            for url in urls:
+                Multimedia.objects.create(
+                    nombre="Evidencia",
+                    url=url,
+                    tipo="image",
+                    formato=url.split(".")[-1][:10] if "." in url else "",
+                    incidencia=instance,
+                )
+
+            if comentario:
+                instance.motivo_rechazo = comentario
+
+            instance.estado = "finalizada"
+            instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+            registrar_transicion(instance, estado_anterior, _usuario_contexto(self), comentario)
         return instance
 
 
@@ -95,9 +108,12 @@ class RechazarIncidenciaSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         motivo = validated_data.get("motivo_rechazo")
+        estado_anterior = instance.estado
         instance.motivo_rechazo = motivo
         instance.estado = "rechazada"
-        instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+        with transaction.atomic():
+            instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+            registrar_transicion(instance, estado_anterior, _usuario_contexto(self), motivo)
         return instance
 
 
@@ -121,10 +137,13 @@ class FinalizarIncidenciaSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         comentario = validated_data.pop("comentario", None)
+        estado_anterior = instance.estado
 
         if comentario:
             instance.motivo_rechazo = comentario 
 
         instance.estado = "finalizada"
-        instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+        with transaction.atomic():
+            instance.save(update_fields=["estado", "motivo_rechazo", "actualizadoEl"])
+            registrar_transicion(instance, estado_anterior, _usuario_contexto(self), comentario)
         return instance
\ No newline at end of file
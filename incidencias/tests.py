@@ -1,3 +1,330 @@
-from django.test import TestCase
+import csv
+import io
+import zipfile
+from contextlib import ExitStack
+from datetime import date, datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import exportar, listado, referencias, semillas
+from core.benchmark import ConsultasConstantesMixin
+from core.historial import registrar_transicion
+from core.models import (
+    Departamento, Direccion, HistorialIncidencia, Incidencia, IncidenciaListado, JefeCuadrilla, Multimedia,
+    Territorial, TipoIncidencia,
+)
+
+from . import analitica
+from .importacion import ImportadorIncidencias
+
+
+def _incidencia():
+    return {"pk": Incidencia.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+def _tipo():
+    return {"pk": TipoIncidencia.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+class ConsultasIncidenciasTests(ConsultasConstantesMixin, TestCase):
+    RUTAS = [
+        ("incidencias:cuadrillas_por_departamento_mapa", None),
+        ("incidencias:cuadrillas_por_departamento",
+         lambda: {"departamento_id": Departamento.objects.order_by("pk").values_list("pk", flat=True).first()}),
+        ("incidencias:analitica_incidencias", None),
+        ("incidencias:api_incidencias-list", None),
+        ("incidencias:api_incidencias-asignadas", None),
+        ("incidencias:api_cuadrilla_incidencias-list", None),
+        ("incidencias:tipo_lista", None),
+        ("incidencias:tipo_crear", None),
+        ("incidencias:tipo_editar", _tipo),
+        ("incidencias:tipo_eliminar", _tipo),
+        ("incidencias:incidencias_lista", None),
+        ("incidencias:incidencias_exportar", None),
+        ("incidencias:incidencia_crear", None),
+        ("incidencias:incidencia_editar", _incidencia),
+        ("incidencias:incidencia_detalle", _incidencia),
+        ("incidencias:incidencia_eliminar", _incidencia),
+        ("incidencias:subir_evidencia", _incidencia),
+        ("incidencias:finalizar_incidencia", _incidencia),
+    ]
+
+
+@override_settings(LISTADO_DESNORMALIZADO=True)
+class ConsultasListadoDesnormalizadoTests(ConsultasConstantesMixin, TestCase):
+    RUTAS = [("incidencias:incidencias_lista", None)]
+
+    def test_mantenido_igual_a_reconstruido(self):
+        semillas.Sembrador(semillas.Escala(**self.ESCALA), semilla=7, prefijo="prueba").sembrar()
+        incidencia = Incidencia.objects.filter(cuadrilla__isnull=False).first()
+        incidencia.estado = "en_proceso"
+        incidencia.save()
+        Multimedia.objects.create(
+            nombre="e.jpg", url="https://example.org/e.jpg", tipo="imagen", formato="jpg", incidencia=incidencia
+        )
+        cuadrilla = incidencia.cuadrilla
+        cuadrilla.nombre_cuadrilla = "Renombrada"
+        with self.captureOnCommitCallbacks(execute=True):
+            cuadrilla.save()
+        mantenido = list(IncidenciaListado.objects.order_by("pk").values())
+        listado.reconstruir()
+        self.assertEqual(mantenido, list(IncidenciaListado.objects.order_by("pk").values()))
+        self.assertEqual(IncidenciaListado.objects.count(), Incidencia.objects.count())
+
+    def test_nombres_de_la_base_aunque_el_catalogo_este_viejo(self):
+        semillas.Sembrador(semillas.Escala(**self.ESCALA), semilla=7, prefijo="prueba").sembrar()
+        incidencia = Incidencia.objects.filter(cuadrilla__isnull=False).first()
+        referencias.cuadrillas()
+        # Renombrada en "otro proceso": este catálogo no se entera
+        JefeCuadrilla.objects.filter(pk=incidencia.cuadrilla_id).update(nombre_cuadrilla="Renombrada")
+        incidencia.save()
+        self.assertEqual(IncidenciaListado.objects.get(pk=incidencia.pk).cuadrilla_nombre, "Renombrada")
+
+
+class HistorialTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user("jefe", password="x")
+        self.cuadrilla = JefeCuadrilla.objects.create(nombre_cuadrilla="Norte", usuario=self.usuario.profile)
+        self.incidencia = Incidencia.objects.create(
+            titulo="Bache", descripcion="Hoyo", estado="en_proceso", prioridad="media",
+            latitud=-33.4, longitud=-70.6, cuadrilla=self.cuadrilla,
+        )
+        self.token = f"Token {Token.objects.create(user=self.usuario)}"
+
+    def test_historial_es_de_solo_insercion(self):
+        entrada = registrar_transicion(self.incidencia, "pendiente", self.usuario)
+        with self.assertRaises(ValueError):
+            entrada.save()
+        with self.assertRaises(ValueError):
+            entrada.delete()
+
+    def test_api_no_cambia_el_estado_sin_pasar_por_las_acciones(self):
+        respuesta = self.client.patch(
+            reverse("incidencias:api_incidencias-detail", args=[self.incidencia.pk]),
+            {"estado": "validada"}, content_type="application/json", HTTP_AUTHORIZATION=self.token,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.incidencia.refresh_from_db()
+        self.assertEqual(self.incidencia.estado, "en_proceso")
+        self.assertFalse(HistorialIncidencia.objects.exists())
+
+    def test_resolver_registra_la_transicion(self):
+        respuesta = self.client.post(
+            reverse("incidencias:api_incidencias-resolver", args=[self.incidencia.pk]),
+            {"comentario": "Listo"}, content_type="application/json", HTTP_AUTHORIZATION=self.token,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        entrada = HistorialIncidencia.objects.get()
+        self.assertEqual((entrada.estado_anterior, entrada.estado_nuevo), ("en_proceso", "finalizada"))
+
+
+class ImportacionCsvTests(TestCase):
+    ENCABEZADO = "titulo,departamento,estado,prioridad,latitud,longitud,correo_vecino\n"
+
+    def setUp(self):
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        self.departamento = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        Incidencia.objects.create(
+            titulo="Bache en Av. Central", descripcion="", estado="pendiente", prioridad="media",
+            latitud=-33.4, longitud=-70.6, departamento=self.departamento,
+        )
+
+    def _importar(self, filas, **kwargs):
+        return ImportadorIncidencias(**kwargs).importar(io.StringIO(self.ENCABEZADO + filas))
+
+    def test_faltan_columnas_obligatorias(self):
+        resultado = ImportadorIncidencias().importar(io.StringIO("titulo,estado\nBache,pendiente\n"))
+        self.assertEqual(resultado.errores, [(1, "Faltan columnas obligatorias: departamento.")])
+
+    def test_filas_invalidas_se_informan_con_su_linea(self):
+        resultado = self._importar(
+            "Poste caído,Aseo,perdida,alta,,,\n"
+            "Árbol caído,Parques,pendiente,alta,,,\n"
+            "Luminaria,Aseo,pendiente,alta,norte,,\n"
+            "Basural,aseo,,,,,no-es-correo\n"
+            "Semáforo,Aseo,pendiente,baja,-33.4,-70.6,vecino@correo.local\n"
+        )
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 3, 4, 5])
+        self.assertEqual((resultado.leidas, resultado.creadas), (5, 1))
+        semaforo = Incidencia.objects.get(titulo="Semáforo")
+        self.assertEqual((semaforo.latitud, semaforo.departamento), (-33.4, self.departamento))
+
+    def test_titulos_repetidos_sin_distinguir_mayusculas(self):
+        resultado = self._importar(
+            "BACHE EN AV. CENTRAL,Aseo,,,,,\n"
+            "Poste caído,Aseo,,,,,\n"
+            "poste CAÍDO,Aseo,,,,,\n"
+        )
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 4])
+        self.assertEqual(resultado.creadas, 1)
+        self.assertIsNone(Incidencia.objects.get(titulo="Poste caído").latitud)
+
+    def test_fecha_imposible_es_error_de_la_fila(self):
+        resultado = ImportadorIncidencias().importar(io.StringIO(
+            "titulo,departamento,creado_el\nPoste caído,Aseo,2024-02-30 10:00\nLuminaria,Aseo,2024-02-28 10:00\n"
+        ))
+        self.assertEqual([linea for linea, _ in resultado.errores], [2])
+        self.assertEqual(resultado.creadas, 1)
+
+    def test_archivo_latin1_se_informa_sin_excepcion(self):
+        contenido = (self.ENCABEZADO + "Poste caído,Aseo,,,,,\n").encode("latin-1")
+        archivo = io.TextIOWrapper(io.BytesIO(contenido), encoding="utf-8-sig", newline="")
+        resultado = ImportadorIncidencias().importar(archivo)
+        self.assertEqual(resultado.creadas, 0)
+        self.assertIn("UTF-8", resultado.errores[0][1])
+
+    def test_validar_solo_no_crea(self):
+        resultado = self._importar("Poste caído,Aseo,,,,,\n", validar_solo=True)
+        self.assertEqual((resultado.validas, resultado.creadas), (1, 0))
+        self.assertFalse(Incidencia.objects.filter(titulo="Poste caído").exists())
+
+
+class VisibilidadTests(TestCase):
+    def setUp(self):
+        for nombre in ("Administrador", "Jefe de Cuadrilla", "Territorial"):
+            Group.objects.create(name=nombre)
+        self.jefe = self._usuario("jefe", "Jefe de Cuadrilla")
+        self.territorial = self._usuario("territorial", "Territorial")
+        cuadrilla = JefeCuadrilla.objects.create(nombre_cuadrilla="Norte", usuario=self.jefe.profile)
+        self.de_cuadrilla = self._incidencia("De la cuadrilla", cuadrilla=cuadrilla)
+        self.de_territorial = self._incidencia("Del territorial")
+        Territorial.objects.create(incidencia=self.de_territorial, usuario=self.territorial.profile)
+        self.de_vecino = self._incidencia("Del vecino", correo_vecino="vecina@correo.local")
+
+    def _usuario(self, nombre, grupo=None, **extra):
+        usuario = User.objects.create_user(nombre, password="x", **extra)
+        if grupo:
+            usuario.groups.add(Group.objects.get(name=grupo))
+        return User.objects.get(pk=usuario.pk)
+
+    def _incidencia(self, titulo, **extra):
+        return Incidencia.objects.create(
+            titulo=titulo, descripcion="", estado="pendiente", prioridad="media", latitud=-33.4, longitud=-70.6,
+            **extra,
+        )
+
+    def _visibles(self, usuario):
+        return set(Incidencia.objects.visible_to(usuario).values_list("titulo", flat=True))
+
+    def test_administrador_ve_todo(self):
+        self.assertEqual(len(self._visibles(self._usuario("admin", "Administrador"))), 3)
+
+    def test_jefe_de_cuadrilla_ve_las_de_sus_cuadrillas(self):
+        self.assertEqual(self._visibles(self.jefe), {"De la cuadrilla"})
+
+    def test_territorial_ve_las_vinculadas(self):
+        self.assertEqual(self._visibles(self.territorial), {"Del territorial"})
+
+    def test_sin_rol_ve_las_de_su_correo(self):
+        self.assertEqual(self._visibles(self._usuario("vecina", email="vecina@correo.local")), {"Del vecino"})
+        self.assertEqual(self._visibles(self._usuario("sin_correo")), set())
+
+    def test_detalle_fuera_de_su_alcance(self):
+        self.client.force_login(self.jefe)
+        url = reverse("incidencias:incidencia_detalle", args=[self.de_vecino.pk])
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        url = reverse("incidencias:incidencia_detalle", args=[self.de_cuadrilla.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class AnaliticaTests(TestCase):
+    URL = reverse("incidencias:analitica_incidencias")
+
+    def setUp(self):
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Administrador"))
+        self.client.force_login(admin)
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        self.aseo = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        self.parques = Departamento.objects.create(nombre_departamento="Parques", direccion=direccion)
+        self._incidencia(self.aseo, (2024, 3, 4, 10), (2024, 3, 4, 12))
+        self._incidencia(self.aseo, (2024, 3, 5, 10), (2024, 3, 6, 14))
+        self._incidencia(self.parques, (2024, 3, 5, 9), None)
+
+    def _incidencia(self, departamento, creada, cerrada):
+        incidencia = Incidencia.objects.create(
+            titulo="Bache", descripcion="", estado="pendiente", prioridad="media", departamento=departamento,
+        )
+        fecha = lambda t: timezone.make_aware(datetime(*t)) if t else None
+        Incidencia.objects.filter(pk=incidencia.pk).update(creadoEl=fecha(creada), fecha_cierre=fecha(cerrada))
+
+    def _get(self, **parametros):
+        return self.client.get(self.URL, {"desde": "2024-03-01", "hasta": "2024-03-31", **parametros})
+
+    def test_creadas_y_cerradas_por_dia(self):
+        datos = self._get(periodo="dia", agrupar="departamento").json()
+        self.assertEqual(datos["volumen"], [
+            {"periodo": "2024-03-04", "creadas": 1, "cerradas": 1},
+            {"periodo": "2024-03-05", "creadas": 2, "cerradas": 0},
+            {"periodo": "2024-03-06", "creadas": 0, "cerradas": 1},
+        ])
+        self.assertEqual(datos["tiempos_cierre"], [{
+            "departamento_id": self.aseo.pk, "departamento__nombre_departamento": "Aseo",
+            "cerradas": 2, "mediana_horas": 15.0, "p90_horas": 25.4,
+        }])
+
+    def test_por_semana(self):
+        datos = self._get(periodo="semana").json()
+        self.assertEqual(datos["volumen"], [{"periodo": "2024-03-04", "creadas": 3, "cerradas": 2}])
+
+    def test_filtros_de_departamento_y_fechas(self):
+        datos = self._get(departamento=self.parques.pk).json()
+        self.assertEqual(datos["volumen"], [{"periodo": "2024-03-05", "creadas": 1, "cerradas": 0}])
+        self.assertEqual(datos["tiempos_cierre"], [])
+        datos = self._get(desde="2024-03-06").json()
+        self.assertEqual(datos["volumen"], [{"periodo": "2024-03-06", "creadas": 0, "cerradas": 1}])
+
+    def test_una_sola_consulta(self):
+        with self.assertNumQueries(1):
+            analitica.calcular(Incidencia.objects.all(), "dia", date(2024, 3, 1), date(2024, 3, 31), ["tipo"])
+
+    def test_fecha_imposible_es_400(self):
+        self.assertEqual(self._get(desde="2024-13-45").status_code, 400)
+        self.assertEqual(self._get(periodo="mes").status_code, 400)
+
+
+class ExportacionTests(TestCase):
+    URL = reverse("incidencias:incidencias_exportar")
+
+    def setUp(self):
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Administrador"))
+        self.client.force_login(admin)
+        for i, estado in enumerate(["pendiente", "pendiente", "finalizada", "pendiente", "pendiente"]):
+            Incidencia.objects.create(
+                titulo=f"=Bache {i}", descripcion="", estado=estado, prioridad="media", latitud=-33.4, longitud=-70.6,
+            )
+
+    def _csv(self, **parametros):
+        respuesta = self.client.get(self.URL, parametros)
+        self.assertEqual(respuesta["Content-Disposition"], 'attachment; filename="incidencias.csv"')
+        return list(csv.reader(io.StringIO(b"".join(respuesta.streaming_content).decode("utf-8-sig"))))
+
+    def test_csv_con_encabezados_y_filtros(self):
+        filas = self._csv(estado="pendiente", q="bache")
+        self.assertEqual(filas[0][:4], ["ID", "Título", "Estado", "Prioridad"])
+        self.assertEqual([f[1] for f in filas[1:]], ["'=Bache 4", "'=Bache 3", "'=Bache 1", "'=Bache 0"])
+        self.assertEqual(self._csv(q="bache 2")[1][2], "finalizada")
+
+    def test_xlsx_es_un_zip_legible(self):
+        respuesta = self.client.get(self.URL, {"formato": "xlsx", "estado": "finalizada"})
+        libro = zipfile.ZipFile(io.BytesIO(b"".join(respuesta.streaming_content)))
+        self.assertIsNone(libro.testzip())
+        hoja = libro.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(hoja.count("<row>"), 2)
+        self.assertIn("<t xml:space=\"preserve\">Título</t>", hoja)
+        self.assertIn("'=Bache 2", hoja)
+
+    def test_keyset_sin_cursores_del_servidor_mantiene_el_orden(self):
+        esperado = self._csv()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(mock.patch.dict(conexion.settings_dict, DISABLE_SERVER_SIDE_CURSORS=True))
+            pila.enter_context(mock.patch.object(exportar, "CHUNK_SIZE", 2))
+            self.assertEqual(self._csv(), esperado)
@@ -14,7 +14,9 @@ urlpatterns = [
     path('', include(router.urls)),
 
     # API endpoints (Legacy/Manual - if any needed, but ViewSet covers them)
+    path("api/cuadrillas-por-departamento/", views.cuadrillas_por_departamento_mapa, name="cuadrillas_por_departamento_mapa"),
     path("api/cuadrillas-por-departamento/<int:departamento_id>/", views.cuadrillas_por_departamento, name="cuadrillas_por_departamento"),
+    path("api/analitica/", api_views.analitica_incidencias, name="analitica_incidencias"),
 
     # URLs de Tipos de Incidencia
     path("tipos/", views_clasificacion.tipo_lista, name="tipo_lista"),
@@ -24,6 +26,7 @@ urlpatterns = [
 
     # URLs de Vistas (Templates)
     path("incidencias/", views.incidencias_lista, name ="incidencias_lista"),
+    path("incidencias/exportar/", views.incidencias_exportar, name="incidencias_exportar"),
     path("incidencias/nuevo/", views.incidencia_crear, name = "incidencia_crear"),
     path("incidencias/<int:pk>/", views.incidencia_editar, name = "incidencia_editar") ,
     path("incidencias/<int:pk>/detalle/", views.incidencia_detalle, name = "incidencia_detalle"), 
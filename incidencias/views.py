@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from core.models import Incidencia, Departamento, JefeCuadrilla, Multimedia
+from django.http import HttpResponseNotModified, JsonResponse
+from core.models import Incidencia, IncidenciaListado, Multimedia
+from core import listado, permisos, referencias
 from .forms import IncidenciaForm, SubirEvidenciaForm
 # from categorias.models import Categoria, Tipo
 from django.contrib.auth.decorators import login_required
@@ -10,6 +11,11 @@ from core.utils import solo_admin, admin_o_territorial
 from django.core.mail import send_mail
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from core.historial import registrar_transicion
+from core.exportar import respuesta_exportacion
+from encuestas.db_router import usa_replica
 import os
 from datetime import datetime
 
@@ -17,10 +23,33 @@ from datetime import datetime
 @login_required
 def cuadrillas_por_departamento(request, departamento_id):
     """Vista AJAX para cargar las cuadrillas de un departamento."""
-    cuadrillas = JefeCuadrilla.objects.filter(departamento_id=departamento_id)
+    cuadrillas = referencias.cuadrillas(departamento=departamento_id)
     data = [{'id': c.id, 'nombre_cuadrilla': str(c)} for c in cuadrillas]
     return JsonResponse(data, safe=False)
 
+# Con ?v=<etag> la URL cambia cuando cambian las cuadrillas: el navegador la guarda un año
+CACHE_MAPA_VERSIONADO = "private, max-age=31536000, immutable"
+
+
+@login_required
+def cuadrillas_por_departamento_mapa(request):
+    """
+    Todas las cuadrillas agrupadas por departamento, en una sola respuesta.
+    Con If-None-Match igual al ETag responde 304; sin ``v`` (o con uno viejo)
+    el navegador revalida en cada uso.
+    """
+    entrada = referencias.mapa_cuadrillas()
+    if entrada["etag"] in [e.strip() for e in request.headers.get("If-None-Match", "").split(",")]:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(entrada["mapa"])
+    response["ETag"] = entrada["etag"]
+    if request.GET.get("v") == entrada["etag"].strip('"'):
+        response["Cache-Control"] = CACHE_MAPA_VERSIONADO
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
 # ----------------- intento de API 2 sjsj para cargar tipos -----------------
 @login_required
 def cargar_tipos(request):
@@ -36,69 +65,23 @@ def cargar_tipos(request):
     
     return JsonResponse({'tipos': list(tipos)})
 
-# ----------------- Ayudantes de filtrado por rol -----------------
-def _roles_usuario(user):
-    return set(user.groups.values_list("name", flat=True))
-
-def _filtrar_por_rol(qs, user):
+# ----------------- LISTA / DETALLE (abiertao a usuarios logueadoops) -----------------
+def _incidencias_filtradas(request, modelo=Incidencia):
     """
-    Restringe el queryset según el rol del usuario.
-    Reglas:
-      - Admin (is_superuser) o grupo 'Administrador' y 'Dirección' ven todo.
-      - 'Departamento' ve todo.
-      - 'Jefe de Cuadrilla' -> solo incidencias de sus cuadrillas (pendiente y en_proceso).
-      - 'Territorial' -> solo pendiente.
-      - Sin grupo -> solo incidencias asociadas a su email.
+    Aplica búsqueda, rol, estado y departamento de la querystring (lista y exportación).
+    ``modelo`` puede ser ``IncidenciaListado``: tiene las mismas columnas de filtro.
     """
-    roles = _roles_usuario(user)
-
-    if user.is_superuser or "Administrador" in roles or "Dirección" in roles:
-        return qs
-
-    if "Departamento" in roles:
-        return qs
-
-    if "Jefe de Cuadrilla" in roles:
-        # Filtrar todas las incidencias de las cuadrillas donde el usuario es usuario o encargado
-        from core.models import JefeCuadrilla
-        from django.db.models import Q
-        try:
-            profile = user.profile
-            cuadrillas = JefeCuadrilla.objects.filter(
-                Q(usuario=profile) | Q(encargado=profile)
-            )
-            return qs.filter(
-                cuadrilla__in=cuadrillas
-            )
-        except:
-            return qs.none()
-
-    if "Territorial" in roles:
-        # Incidencias vinculadas al territorial (todas las etapas)
-        try:
-            profile = user.profile
-            return qs.filter(territoriales__usuario=profile)
-        except Exception:
-            return qs.none()
-
-    # Sin rol: solo ve las suyas (por email)
-    return qs.filter(email_usuario=user.email)
-
-
-# ----------------- LISTA / DETALLE (abiertao a usuarios logueadoops) -----------------
-@login_required
-def incidencias_lista(request):
     q = (request.GET.get("q") or "").strip()
     estado = request.GET.get("estado")  # 'pendiente' | 'en_proceso' | 'finalizada' | 'validada' | 'rechazada'
     departamento_id = request.GET.get("departamento") #novo filtrasaon
-    qs = Incidencia.objects.all().order_by("-creadoEl")
+    qs = modelo.objects.all().order_by("-creadoEl")
 
     # Filtro por string yiaa
     if q:
         qs = qs.filter(titulo__icontains=q)
 
-    # Filtro por rol
-    qs = _filtrar_por_rol(qs, request.user)
+    # Filtro por rol (core.models.IncidenciaQuerySet.visible_to)
+    qs = qs.visible_to(request.user)
 
     # Filtro por status
     estados_validos = [e[0] for e in IncidenciaForm.ESTADO_CHOICES]
@@ -109,6 +92,16 @@ def incidencias_lista(request):
     if departamento_id:
         qs = qs.filter(departamento_id =departamento_id)
 
+    return qs, q, estado, departamento_id
+
+
+@usa_replica
+@login_required
+def incidencias_lista(request):
+    # Con el modelo de lectura se lista y filtra una sola tabla (core.listado)
+    modelo = IncidenciaListado if listado.activo() else Incidencia
+    qs, q, estado, departamento_id = _incidencias_filtradas(request, modelo)
+
     #etiquetas de colores para cada estadoa
     ESTADOS_COLORES = {
     "pendiente": "secondary",
@@ -118,51 +111,85 @@ def incidencias_lista(request):
     "rechazada": "danger",
 }
 
-    departamento_nombre = None
-    if departamento_id:
-        try:
-            departamento_nombre = Departamento.objects.get(id=departamento_id).nombre_departamento
-        except Departamento.DoesNotExist:
-            departamento_nombre = None
+    departamento = referencias.obtener("departamentos", departamento_id) if departamento_id else None
+    departamento_nombre = departamento.nombre_departamento if departamento else None
+
+    # Columnas y botones de cada fila sin una consulta por fila (IncidenciaListado ya las trae)
+    if modelo is Incidencia:
+        qs = qs.annotate(
+            departamento_nombre=F("departamento__nombre_departamento"),
+            cuadrilla_nombre=F("cuadrilla__nombre_cuadrilla"),
+            tiene_multimedia=Exists(Multimedia.objects.filter(incidencia=OuterRef("pk"))),
+        )
 
     ctx = {
         "incidencias": qs,
         "q": q,
         "estado_seleccionado": estado,
-        "departamentos": Departamento.objects.all(),
+        "departamentos": referencias.departamentos(),
         "departamento_seleccionado": str(departamento_id) if departamento_id else "",
         "departamento_nombre": departamento_nombre,
         "estados_colores" : ESTADOS_COLORES,
     }
     return render(request, "incidencias/incidencias_lista.html", ctx)
 
+
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Título", "titulo"),
+    ("Estado", "estado"),
+    ("Prioridad", "prioridad"),
+    ("Departamento", "departamento__nombre_departamento"),
+    ("Cuadrilla", "cuadrilla__nombre_cuadrilla"),
+    ("Tipo", "tipo_incidencia__nombre_problema"),
+    ("Creada", "creadoEl"),
+    ("Cierre", "fecha_cierre"),
+    ("Vecino", "nombre_vecino"),
+    ("Correo vecino", "correo_vecino"),
+    ("Teléfono vecino", "telefono_vecino"),
+    ("Latitud", "latitud"),
+    ("Longitud", "longitud"),
+]
+
+
+@usa_replica
+@login_required
+def incidencias_exportar(request):
+    """Descarga en streaming (CSV o XLSX) del listado con los mismos filtros de incidencias_lista."""
+    qs, *_ = _incidencias_filtradas(request)
+    formato = request.GET.get("formato", "csv")
+    return respuesta_exportacion(qs, COLUMNAS_EXPORTACION, "incidencias", formato)
+
 @login_required
 def incidencia_detalle(request, pk):
-    incidencia = get_object_or_404(Incidencia, pk=pk)
-    # proteccion de acceso al detalle según rol
-    visible = _filtrar_por_rol(Incidencia.objects.filter(pk=pk), request.user).exists()
-    if not visible:
+    # proteccion de acceso al detalle según rol: una sola consulta si es visible
+    incidencia = Incidencia.objects.visible_to(request.user).filter(pk=pk).first()
+    if incidencia is None:
+        get_object_or_404(Incidencia.objects.only("pk"), pk=pk)
         messages.error(request, "No tienes permisos para ver esta incidencia.")
         return redirect("incidencias:incidencias_lista")
-    return render(request, "incidencias/incidencia_detalle.html", {"obj": incidencia})
+    historial = incidencia.historial.select_related("usuario")
+    return render(request, "incidencias/incidencia_detalle.html", {"obj": incidencia, "historial": historial})
 
 
 # ----------------- CRUD (solo administrador) -----------------
 @login_required
 @admin_o_territorial
 def incidencia_crear(request):
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
     if request.method == "POST":
         form = IncidenciaForm(request.POST)
         if form.is_valid():
-            incidencia = form.save()
-            # Asociar la incidencia al territorial que la creó
-            try:
-                from core.models import Territorial
-                profile = request.user.profile
-                Territorial.objects.get_or_create(incidencia=incidencia, usuario=profile)
-            except Exception:
-                pass
+            with transaction.atomic():
+                incidencia = form.save()
+                registrar_transicion(incidencia, None, request.user)
+                # Asociar la incidencia al territorial que la creó
+                try:
+                    from core.models import Territorial
+                    profile = request.user.profile
+                    Territorial.objects.get_or_create(incidencia=incidencia, usuario=profile)
+                except Exception:
+                    pass
             messages.success(request, "Incidencia creada correctamente.")
             # Redirección: vuelve al origen si es seguro; si no, según rol
             next_url = request.POST.get("next") or request.GET.get("next")
@@ -188,7 +215,7 @@ def incidencia_editar(request, pk):
     incidencia = get_object_or_404(Incidencia, pk=pk)
     estado_anterior = incidencia.estado
     motivo_rechazo = request.POST.get('motivo_rechazo')
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
 
     if request.method == "POST":
         form = IncidenciaForm(request.POST, instance=incidencia)
@@ -232,10 +259,14 @@ def incidencia_editar(request, pk):
             incidencia = form.save(commit=False)
             
             # Si se está rechazando la incidencia, guardar el motivo
+            comentario = ""
             if incidencia.estado == 'rechazada' and motivo_rechazo:
                 incidencia.motivo_rechazo = motivo_rechazo
+                comentario = motivo_rechazo
             
-            incidencia.save()
+            with transaction.atomic():
+                incidencia.save()
+                registrar_transicion(incidencia, estado_anterior, request.user, comentario)
 
             if incidencia.estado != estado_anterior:
                 departamento = incidencia.departamento
@@ -287,7 +318,7 @@ def incidencia_editar(request, pk):
 
 @login_required
 def incidencia_eliminar(request, pk):
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
     if not (request.user.is_superuser or "Administrador" in roles or "Territorial" in roles):
         messages.error(request, "No tienes permiso para eliminar incidencias.")
         return redirect("incidencias:incidencias_lista")
@@ -308,7 +339,7 @@ def subir_evidencia(request, pk):
     Solo la cuadrilla asignada puede acceder.
     """
     incidencia = get_object_or_404(Incidencia, pk=pk)
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
     
     # DEBUG: Agregar información de depuración
     print(f"\n{'='*60}")
@@ -413,7 +444,7 @@ def subir_evidencia(request, pk):
 @login_required
 def finalizar_incidencia(request, pk):
     incidencia = get_object_or_404(Incidencia, pk=pk)
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
     
     # ... (Tus validaciones de permisos existentes se mantienen igual) ...
     # Validación 1, 2 y 3...
@@ -432,8 +463,11 @@ def finalizar_incidencia(request, pk):
             # Usamos motivo_rechazo o el campo que hayas decidido para notas de resolución
             incidencia.motivo_rechazo = comentario 
 
+        estado_anterior = incidencia.estado
         incidencia.estado = "finalizada"
-        incidencia.save()
+        with transaction.atomic():
+            incidencia.save()
+            registrar_transicion(incidencia, estado_anterior, request.user, comentario)
         
         messages.success(
             request,
@@ -3,6 +3,9 @@ from django.core.exceptions import ValidationError
 from core.models import Direccion, Departamento, JefeCuadrilla
 from registration.models import Profile
 from django.contrib.auth.models import Group
+from core import referencias
+from core.referencias import ReferenciaChoiceField
+from core.widgets import AutocompletarSelect
 
 # ==========================
 # ======== DIRECCIÓN =======
@@ -15,7 +18,7 @@ class DireccionForm(forms.ModelForm):
         widgets = {
             "nombre_direccion": forms.TextInput(attrs={"placeholder": "Nombre de la dirección"}),
             "estado": forms.CheckboxInput(attrs={"class": "form-check-input"}),
-            "encargado": forms.Select(attrs={"class": "form-select"}),
+            "encargado": AutocompletarSelect("perfiles", {"grupo": ["Dirección"]}, attrs={"class": "form-select"}),
         }
 
     def __init__(self, *args, **kwargs):
@@ -24,7 +27,7 @@ class DireccionForm(forms.ModelForm):
         self.fields['encargado'].queryset = Profile.objects.filter(
             user__groups__name__iexact="Dirección",
             user__is_active=True
-        )
+        ).select_related("user")
 
     def clean_nombre_direccion(self):
         nombre = self.cleaned_data.get("nombre_direccion", "").strip()
@@ -42,10 +45,11 @@ class DepartamentoForm(forms.ModelForm):
     class Meta:
         model = Departamento
         fields = ["nombre_departamento", "estado", "encargado", "direccion"]
+        field_classes = {"direccion": ReferenciaChoiceField}
         widgets = {
             "nombre_departamento": forms.TextInput(attrs={"placeholder": "Nombre del departamento"}),
             "estado": forms.CheckboxInput(attrs={"class": "form-check-input"}),
-            "encargado": forms.Select(attrs={"class": "form-select"}),
+            "encargado": AutocompletarSelect("perfiles", {"grupo": ["Departamento"]}, attrs={"class": "form-select"}),
             "direccion": forms.Select(attrs={"class": "form-select"}),
         }
 
@@ -55,9 +59,9 @@ class DepartamentoForm(forms.ModelForm):
         self.fields['encargado'].queryset = Profile.objects.filter(
             user__groups__name__iexact="Departamento",
             user__is_active=True
-        )
+        ).select_related("user")
         # Mostrar solo direcciones activas
-        self.fields['direccion'].queryset = Direccion.objects.filter(estado=True)
+        self.fields['direccion'].opciones = referencias.direcciones(activas=True)
 
     def clean_nombre_departamento(self):
         nombre = self.cleaned_data.get("nombre_departamento", "").strip()
@@ -71,18 +75,22 @@ class DepartamentoForm(forms.ModelForm):
 # ====== CUADRILLA =========
 # ==========================
 
+GRUPOS_CUADRILLA = ["Jefe de Cuadrilla", "Cuadrilla"]
+
+
 class JefeCuadrillaForm(forms.ModelForm):
     class Meta:
         model = JefeCuadrilla
         fields = ["nombre_cuadrilla", "usuario", "encargado", "departamento"]
+        field_classes = {"departamento": ReferenciaChoiceField}
         widgets = {
             "nombre_cuadrilla": forms.TextInput(attrs={
                 "placeholder": "Nombre de la cuadrilla",
                 "class": "form-control"
             }),
-            "usuario": forms.Select(attrs={"class": "form-select"}),
-            "encargado": forms.Select(attrs={"class": "form-select"}),
-            "departamento": forms.Select(attrs={"class": "form-select"}),
+            "usuario": AutocompletarSelect("perfiles", {"grupo": GRUPOS_CUADRILLA}, attrs={"class": "form-select"}),
+            "encargado": AutocompletarSelect("perfiles", {"grupo": GRUPOS_CUADRILLA}, attrs={"class": "form-select"}),
+            "departamento": AutocompletarSelect("departamentos", attrs={"class": "form-select"}),
         }
         help_texts = {
             'departamento': '⚠️ IMPORTANTE: Selecciona el departamento al que pertenece esta cuadrilla.',
@@ -92,14 +100,14 @@ class JefeCuadrillaForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Mostrar solo perfiles de usuarios del grupo "Jefe de Cuadrilla" o "Cuadrilla"
         cuadrilla_profiles = Profile.objects.filter(
-            user__groups__name__in=["Jefe de Cuadrilla", "Cuadrilla"],
+            user__groups__name__in=GRUPOS_CUADRILLA,
             user__is_active=True
-        )
+        ).select_related("user")
         self.fields['usuario'].queryset = cuadrilla_profiles
         self.fields['encargado'].queryset = cuadrilla_profiles
         
         # Mostrar solo departamentos activos
-        self.fields['departamento'].queryset = Departamento.objects.filter(estado=True)
+        self.fields['departamento'].opciones = referencias.departamentos(activos=True)
         
         # Hacer departamento requerido
         self.fields['departamento'].required = True
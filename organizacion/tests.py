@@ -1,3 +1,36 @@
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmark import ConsultasConstantesMixin
+from core.models import Departamento, Direccion, Incidencia
+
+
+def _direccion():
+    return {"pk": Direccion.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+def _departamento():
+    return {"pk": Departamento.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+def _pendiente():
+    return {"pk": Incidencia.objects.filter(estado="pendiente").order_by("pk").values_list("pk", flat=True).first()}
+
+
+class ConsultasOrganizacionTests(ConsultasConstantesMixin, TestCase):
+    RUTAS = [
+        ("organizacion:direcciones_lista", None),
+        ("organizacion:direccion_crear", None),
+        ("organizacion:direccion_editar", _direccion),
+        ("organizacion:direccion_detalle", _direccion),
+        ("organizacion:direccion_eliminar", _direccion),
+        ("organizacion:direccion_toggle_estado", _direccion),
+        ("organizacion:departamentos_lista", None),
+        ("organizacion:departamento_crear", None),
+        ("organizacion:departamento_editar", _departamento),
+        ("organizacion:departamento_detalle", _departamento),
+        ("organizacion:departamento_eliminar", _departamento),
+        ("organizacion:departamento_toggle_estado", _departamento),
+        ("organizacion:derivar_incidencia", _pendiente),
+        ("organizacion:rechazar_incidencia", _pendiente),
+        ("organizacion:asignar_cuadrilla", _pendiente),
+    ]
@@ -2,6 +2,9 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
+from django.db import transaction
+from core.historial import registrar_transicion
+from core import permisos
 from core.utils import solo_admin, admin_o_direccion, admin_o_departamento
 from core.models import Direccion, Departamento, Incidencia, JefeCuadrilla
 from .forms import DireccionForm, DepartamentoForm
@@ -14,11 +17,11 @@ def direcciones_lista(request):
     q = request.GET.get("q", "").strip()
     
     # Si es admin, muestra todas; si es Dirección, solo las que administra
-    if request.user.is_superuser or request.user.groups.filter(name="Administrador").exists():
-        qs = Direccion.objects.all().order_by("nombre_direccion")
+    if permisos.tiene(request.user, permisos.ADMIN):
+        qs = Direccion.objects.select_related("encargado__user").order_by("nombre_direccion")
     else:
         try:
-            qs = Direccion.objects.filter(encargado=request.user.profile).order_by("nombre_direccion")
+            qs = Direccion.objects.filter(encargado=request.user.profile).select_related("encargado__user").order_by("nombre_direccion")
         except:
             qs = Direccion.objects.none()
     
@@ -87,7 +90,7 @@ def direccion_toggle_estado(request, pk):
 @solo_admin
 def departamentos_lista(request):
     q = request.GET.get("q", "").strip()
-    qs = Departamento.objects.all().order_by("nombre_departamento")
+    qs = Departamento.objects.select_related("direccion", "encargado__user").order_by("nombre_departamento")
     if q:
         qs = qs.filter(nombre_departamento__icontains=q)
     return render(request, "organizacion/departamentos_lista.html", {"departamentos": qs, "q": q})
@@ -178,10 +181,16 @@ def derivar_incidencia_view(request, pk):
             cuadrilla = JefeCuadrilla.objects.get(pk=cuadrilla_id)
             
             # Asignar cuadrilla y cambiar estado
+            estado_anterior = incidencia.estado
             incidencia.cuadrilla = cuadrilla
             incidencia.estado = 'en_proceso'
             incidencia.motivo_rechazo = None  # Limpiar motivo de rechazo si existía
-            incidencia.save()
+            with transaction.atomic():
+                incidencia.save()
+                registrar_transicion(
+                    incidencia, estado_anterior, request.user,
+                    f"Derivada a cuadrilla '{cuadrilla.nombre_cuadrilla}'",
+                )
             
             messages.success(
                 request,
@@ -229,10 +238,13 @@ def rechazar_incidencia_view(request, pk):
             return redirect("organizacion:rechazar_incidencia", pk=pk)
         
         # Rechazar incidencia
+        estado_anterior = incidencia.estado
         incidencia.estado = 'rechazada'
         incidencia.motivo_rechazo = motivo
         incidencia.cuadrilla = None  # Limpiar cuadrilla si estaba asignada
-        incidencia.save()
+        with transaction.atomic():
+            incidencia.save()
+            registrar_transicion(incidencia, estado_anterior, request.user, motivo)
         
         messages.success(
             request,
@@ -1,5 +1,7 @@
 from django import template
 
+from core import fragmentos, permisos
+
 register = template.Library()
 
 @register.filter(name="has_group")
@@ -12,6 +14,9 @@ def has_group(user, group_name: str) -> bool:
     if not user.is_authenticated:
         return False
     
+    if group_name in permisos.GRUPO:
+        return permisos.tiene(user, permisos.grupos(group_name, perfil=True))
+
     try:
         # Verificar Django groups
         if user.groups.filter(name=group_name).exists():
@@ -38,3 +43,16 @@ def startswith(text: str, prefix: str) -> bool:
         return str(text).startswith(prefix)
     except Exception:
         return False
+
+
+@register.simple_tag(takes_context=True)
+def clave_nav(context):
+    """
+    Clave del fragmento de navegación en caché (roles del usuario + sección activa).
+    Uso: {% clave_nav as clave %}{% cache 3600 nav clave %} ... {% endcache %}
+    """
+    request = context.get("request")
+    user = context.get("user") or getattr(request, "user", None)
+    if user is None:
+        return "anonimo|"
+    return fragmentos.clave_nav(user, request.path if request else "")
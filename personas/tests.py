@@ -1,3 +1,26 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from core.benchmark import ConsultasConstantesMixin
+
+
+def _usuario():
+    return {"pk": User.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+class ConsultasPersonasTests(ConsultasConstantesMixin, TestCase):
+    # cerrar_sesion queda fuera: cierra la sesión del cliente; usuario_toggle_activo cambia el usuario con un GET
+    RUTAS = [
+        ("personas:check_profile", None),
+        ("personas:dashboard_admin", None),
+        ("personas:dashboard_territorial", None),
+        ("personas:dashboard_jefeCuadrilla", None),
+        ("personas:dashboard_direccion", None),
+        ("personas:dashboard_departamento", None),
+        ("personas:usuarios_lista", None),
+        ("personas:usuarios_buscar", None),
+        ("personas:usuario_crear", None),
+        ("personas:usuario_detalle", _usuario),
+        ("personas:usuario_editar", _usuario),
+        ("personas:usuario_eliminar", _usuario),
+    ]
@@ -12,6 +12,7 @@ urlpatterns = [
     path('dashboard/departamento/', views.dashboard_departamento, name='dashboard_departamento'),
 
     path("usuarios/", views.usuarios_lista, name="usuarios_lista"),
+    path("usuarios/buscar/", views.usuarios_buscar, name="usuarios_buscar"),
     path("usuarios/nuevo/", views.usuario_crear, name="usuario_crear"),
     path("usuarios/<int:pk>/", views.usuario_detalle, name="usuario_detalle"),
     path("usuarios/<int:pk>/editar/", views.usuario_editar, name="usuario_editar"),
@@ -4,16 +4,20 @@ from django.contrib.auth import logout
 from registration.models import Profile
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.db.models import Q
+from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .forms import UsuarioCrearForm, UsuarioEditarForm
 from .utils import solo_admin
 from core.utils import admin_o_direccion, admin_o_departamento
-from core.models import Incidencia
+from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
+from core import fragmentos, permisos
+from core.models import Incidencia, ids_visibilidad
+from encuestas.db_router import usa_replica
 
-@login_required
-def dashboard_admin(request):
-    from core.models import Incidencia
+def _stats_admin():
     estado_labels = {
         "pendiente": "Pendiente",
         "en_proceso": "En proceso",
@@ -26,6 +30,7 @@ def dashboard_admin(request):
         "incidencias_total": Incidencia.objects.count(),
     }
     estados = ["pendiente", "en_proceso", "finalizada", "validada", "rechazada"]
+    conteos = dict(Incidencia.objects.values_list("estado").annotate(n=Count("id")).order_by())
     estado_data = []
     colors = ["#ffd803", "#6ee7b7", "#38bdf8", "#c4b5fd", "#fca5a5"]
     for idx, e in enumerate(estados):
@@ -33,7 +38,7 @@ def dashboard_admin(request):
             {
                 "key": e,
                 "label": estado_labels.get(e, e.replace("_", " ").title()),
-                "count": Incidencia.objects.filter(estado=e).count(),
+                "count": conteos.get(e, 0),
                 "color": colors[idx % len(colors)],
             }
         )
@@ -52,74 +57,58 @@ def dashboard_admin(request):
         f"conic-gradient({', '.join(segments)})" if segments else "#f5f5f5"
     )
     stats["incidencias_palette"] = colors
-    return render(request, "personas/dashboards/admin.html", {"stats": stats})
+    return stats
 
+@usa_replica
+@login_required
+def dashboard_admin(request):
+    # Las cifras se calculan solo si el panel no está en la caché de fragmentos
+    return render(request, "personas/dashboards/admin.html", {
+        "stats": SimpleLazyObject(_stats_admin),
+        "clave_panel": fragmentos.clave_panel("global"),
+        "timeout_panel": fragmentos.TIMEOUT_PANELES,
+    })
+
+@usa_replica
 @login_required
 def dashboard_territorial(request):
     # Mostrar solo las incidencias asociadas al territorial (o todas si es admin)
-    roles = set(request.user.groups.values_list("name", flat=True))
-    es_admin = request.user.is_superuser or "Administrador" in roles
-
-    qs = Incidencia.objects.all()
-    if not es_admin:
-        try:
-            profile = request.user.profile
-            qs = qs.filter(territoriales__usuario=profile)
-        except Exception:
-            qs = Incidencia.objects.none()
+    if permisos.tiene(request.user, permisos.ADMIN):
+        qs = Incidencia.objects.all()
+    else:
+        qs = Incidencia.objects.de_territorial(request.user)
 
     incidencias = qs.order_by("-creadoEl")[:10]
     estados = ["pendiente", "en_proceso", "finalizada", "validada", "rechazada"]
-    stats = {e: qs.filter(estado=e).count() for e in estados}
+    # La plantilla no muestra estas cifras hoy: perezosas, no cuestan nada mientras no se usen
+    stats = SimpleLazyObject(lambda: {e: qs.filter(estado=e).count() for e in estados})
     return render(request, "personas/dashboards/territorial.html", {
         'incidencias': incidencias,
         'stats': stats,
     })
 
+@usa_replica
 @login_required
 def dashboard_jefe(request):
     """
     Dashboard para Jefe de Cuadrilla.
     Muestra las incidencias asignadas a su cuadrilla.
     """
-    # Obtener el profile del usuario actual
-    try:
-        profile = request.user.profile
-    except:
-        profile = None
-    
-    # Buscar las cuadrillas donde el usuario es el encargado o el usuario asignado
     from core.models import JefeCuadrilla
-    
-    if profile:
-        cuadrillas = JefeCuadrilla.objects.filter(
-            Q(usuario=profile) | Q(encargado=profile)
-        )
-    else:
-        cuadrillas = JefeCuadrilla.objects.none()
-    
+
+    # Cuadrillas donde el usuario es el encargado o el usuario asignado (ids resueltos una vez)
+    base = Incidencia.objects.de_cuadrillas_de(request.user)
+    cuadrillas = list(
+        JefeCuadrilla.objects.filter(pk__in=ids_visibilidad(request.user)[1]).select_related("departamento")
+    ) if permisos.tiene(request.user, permisos.EN_CUADRILLA) else []
+
     # Obtener las incidencias asignadas a las cuadrillas del usuario
-    incidencias_pendientes = []
-    incidencias_en_proceso = []
-    incidencias_finalizadas = []
-    
-    if cuadrillas.exists():
-        # Filtrar incidencias por las cuadrillas del usuario
-        incidencias_pendientes = Incidencia.objects.filter(
-            cuadrilla__in=cuadrillas,
-            estado='pendiente'
-        ).order_by('-creadoEl')
-        
-        incidencias_en_proceso = Incidencia.objects.filter(
-            cuadrilla__in=cuadrillas,
-            estado='en_proceso'
-        ).order_by('-creadoEl')
-        
-        incidencias_finalizadas = Incidencia.objects.filter(
-            cuadrilla__in=cuadrillas,
-            estado__in=['finalizada', 'validada', 'rechazada']
-        ).order_by('-actualizadoEl')[:10]  # Últimas 10 finalizadas
-    
+    incidencias_pendientes = base.filter(estado='pendiente').order_by('-creadoEl')
+    incidencias_en_proceso = base.filter(estado='en_proceso').order_by('-creadoEl')
+    incidencias_finalizadas = base.filter(
+        estado__in=['finalizada', 'validada', 'rechazada']
+    ).order_by('-actualizadoEl')[:10]  # Últimas 10 finalizadas
+
     return render(request, "personas/dashboards/jefeCuadrilla.html", {
         'cuadrillas': cuadrillas,
         'incidencias_pendientes': incidencias_pendientes,
@@ -127,6 +116,7 @@ def dashboard_jefe(request):
         'incidencias_finalizadas': incidencias_finalizadas,
     })
 
+@usa_replica
 @login_required
 @admin_o_direccion
 def dashboard_direccion(request):
@@ -140,6 +130,7 @@ def dashboard_direccion(request):
     stats = {e: incidencias.filter(estado=e).count() for e in estados} if direcciones else {}
     return render(request, "personas/dashboards/direccion.html", {"stats": stats, "direcciones": direcciones})
 
+@usa_replica
 @login_required
 @admin_o_departamento
 def dashboard_departamento(request):
@@ -150,7 +141,7 @@ def dashboard_departamento(request):
     from core.models import Incidencia, JefeCuadrilla, Departamento
     from django.db.models import Q, Count
     
-    roles = set(request.user.groups.values_list("name", flat=True))
+    roles = permisos.roles(request.user)
     
     if not ("Departamento" in roles or request.user.is_superuser or "Administrador" in roles):
         messages.error(request, "No tienes acceso a este dashboard")
@@ -172,7 +163,7 @@ def dashboard_departamento(request):
         incidencias_en_proceso = Incidencia.objects.filter(
             departamento=departamento,
             estado='en_proceso'
-        ).order_by('-creadoEl')
+        ).select_related('cuadrilla').annotate(num_multimedias=Count('multimedias')).order_by('-creadoEl')
         
         incidencias_finalizadas = Incidencia.objects.filter(
             departamento=departamento,
@@ -180,13 +171,18 @@ def dashboard_departamento(request):
         ).order_by('-creadoEl')
         
         # Cuadrillas del departamento
-        cuadrillas = JefeCuadrilla.objects.filter(departamento=departamento)
+        cuadrillas = JefeCuadrilla.objects.filter(departamento=departamento).select_related('usuario__user', 'encargado__user')
     else:
         # Si es admin, ver todas
         incidencias_pendientes = Incidencia.objects.filter(estado='pendiente').order_by('-creadoEl')
-        incidencias_en_proceso = Incidencia.objects.filter(estado='en_proceso').order_by('-creadoEl')
+        incidencias_en_proceso = (
+            Incidencia.objects.filter(estado='en_proceso')
+            .select_related('cuadrilla')
+            .annotate(num_multimedias=Count('multimedias'))
+            .order_by('-creadoEl')
+        )
         incidencias_finalizadas = Incidencia.objects.filter(estado='finalizada').order_by('-creadoEl')
-        cuadrillas = JefeCuadrilla.objects.all()
+        cuadrillas = JefeCuadrilla.objects.select_related('usuario__user', 'encargado__user')
     
     ctx = {
         'departamento': departamento,
@@ -194,9 +190,12 @@ def dashboard_departamento(request):
         'incidencias_en_proceso': incidencias_en_proceso,
         'incidencias_finalizadas': incidencias_finalizadas,
         'cuadrillas': cuadrillas,
-        'total_pendientes': incidencias_pendientes.count(),
-        'total_en_proceso': incidencias_en_proceso.count(),
-        'total_finalizadas': incidencias_finalizadas.count(),
+        # Totales perezosos: solo se cuentan si el panel no está en la caché de fragmentos
+        'total_pendientes': SimpleLazyObject(incidencias_pendientes.count),
+        'total_en_proceso': SimpleLazyObject(incidencias_en_proceso.count),
+        'total_finalizadas': SimpleLazyObject(incidencias_finalizadas.count),
+        'clave_panel': fragmentos.clave_panel(f"departamento:{departamento.pk}" if departamento else "global"),
+        'timeout_panel': fragmentos.TIMEOUT_PANELES,
     }
     
     return render(request, 'personas/dashboards/departamento.html', ctx)
@@ -248,11 +247,18 @@ def check_profile(request):
         return redirect("login")
     
 
-@login_required
-@solo_admin
-def usuarios_lista(request):
+USUARIOS_POR_PAGINA = 50
+
+
+def _pagina_usuarios(request):
+    """Página pedida del listado de usuarios; grupos, perfil y cuadrillas en consultas fijas."""
     q = request.GET.get("q", "").strip()
-    qs = User.objects.all().order_by("id")
+    qs = (
+        User.objects
+        .select_related("profile")
+        .prefetch_related("groups", "profile__cuadrillas")
+        .order_by("id")
+    )
     if q:
         qs = qs.filter(
             Q(username__icontains=q) |
@@ -260,7 +266,54 @@ def usuarios_lista(request):
             Q(last_name__icontains=q) |
             Q(email__icontains=q)
         )
-    return render(request, "personas/usuarios_lista.html", {"usuarios": qs, "q": q})
+    return Paginator(qs, USUARIOS_POR_PAGINA).get_page(request.GET.get("page")), q
+
+
+@login_required
+@solo_admin
+def usuarios_lista(request):
+    page_obj, q = _pagina_usuarios(request)
+    querystring = request.GET.copy()
+    querystring.pop("page", None)
+    return render(request, "personas/usuarios_lista.html", {
+        "usuarios": page_obj.object_list,
+        "page_obj": page_obj,
+        "querystring": querystring.urlencode(),
+        "q": q,
+    })
+
+
+@login_required
+@solo_admin
+def usuarios_buscar(request):
+    """
+    Búsqueda del listado de usuarios en JSON: solo la página visible.
+    Ruta: /personas/usuarios/buscar/?q=...&page=N
+    """
+    page_obj, q = _pagina_usuarios(request)
+    resultados = []
+    for u in page_obj.object_list:
+        profile = getattr(u, "profile", None)
+        grupos = list(u.groups.all())
+        resultados.append({
+            "id": u.id,
+            "username": u.username,
+            "grupo": grupos[0].name if grupos else "",
+            "nombre": u.first_name,
+            "apellido": u.last_name,
+            "email": u.email,
+            "telefono": (profile.telefono if profile else "") or "",
+            "cuadrillas": [c.nombre_cuadrilla for c in profile.cuadrillas.all()] if profile else [],
+            "activo": u.is_active,
+        })
+    return JsonResponse({
+        "q": q,
+        "pagina": page_obj.number,
+        "paginas": page_obj.paginator.num_pages,
+        "total": page_obj.paginator.count,
+        "resultados": resultados,
+    })
+
 
 @login_required
 @solo_admin
@@ -0,0 +1,145 @@
+"""
+Tabulación de resultados de encuestas.
+
+``AgregadoRespuesta`` guarda, por pregunta, el conteo por opción (preguntas
+cerradas) o conteo/suma/suma de cuadrados/mín/máx (numéricas). La ingesta
+suma los deltas de cada lote en la misma transacción con updates ``F()``, así
+la tabla de resultados se lee con una sola consulta sin recorrer respuestas.
+"""
+import math
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from core.models import AgregadoRespuesta, PreguntaEncuesta, RespuestaEncuesta
+
+TIPOS_NUMERICOS = {"numero", "numerica", "numérica", "entero", "decimal", "escala", "puntaje"}
+TIPOS_CERRADOS = {"opcion", "opción", "seleccion", "selección", "si_no", "sí_no", "alternativa", "multiple", "múltiple"}
+LARGO_VALOR = 200
+
+
+def clasificar(tipo):
+    tipo = (tipo or "").strip().lower().replace(" ", "_")
+    if tipo in TIPOS_NUMERICOS:
+        return "numerica"
+    if tipo in TIPOS_CERRADOS:
+        return "cerrada"
+    return "abierta"
+
+
+def numero(texto):
+    """Convierte el texto de una respuesta numérica ("3,5" o "3.5"); None si no es número."""
+    try:
+        valor = float((texto or "").strip().replace(",", "."))
+    except ValueError:
+        return None
+    return valor if math.isfinite(valor) else None
+
+
+def acumular(deltas, pregunta_id, tipo, texto):
+    """Suma una respuesta al diccionario de deltas {(pregunta_id, valor): [n, suma, sq, min, max]}."""
+    texto = (texto or "").strip()
+    if not texto:
+        return
+    clase = clasificar(tipo)
+    x = numero(texto) if clase == "numerica" else None
+    if clase == "numerica" and x is None:
+        return
+    valor = texto[:LARGO_VALOR] if clase == "cerrada" else ""
+    d = deltas.get((pregunta_id, valor))
+    if d is None:
+        deltas[(pregunta_id, valor)] = [1, x or 0.0, (x or 0.0) ** 2, x, x]
+        return
+    d[0] += 1
+    if x is not None:
+        d[1] += x
+        d[2] += x * x
+        d[3] = x if d[3] is None else min(d[3], x)
+        d[4] = x if d[4] is None else max(d[4], x)
+
+
+def aplicar(deltas):
+    """Suma los deltas a AgregadoRespuesta (debe llamarse dentro de la transacción de la ingesta)."""
+    if not deltas:
+        return
+    AgregadoRespuesta.objects.bulk_create(
+        [AgregadoRespuesta(pregunta_id=p, valor=v) for p, v in deltas],
+        ignore_conflicts=True,
+    )
+    # Orden fijo para que dos ingestas concurrentes no se bloqueen mutuamente
+    for (pregunta_id, valor), (n, suma, sq, minimo, maximo) in sorted(deltas.items()):
+        cambios = {
+            "conteo": F("conteo") + n,
+            "suma": F("suma") + suma,
+            "suma_cuadrados": F("suma_cuadrados") + sq,
+        }
+        if minimo is not None:
+            cambios["minimo"] = Least(Coalesce(F("minimo"), Value(minimo)), Value(minimo))
+            cambios["maximo"] = Greatest(Coalesce(F("maximo"), Value(maximo)), Value(maximo))
+        AgregadoRespuesta.objects.filter(pregunta_id=pregunta_id, valor=valor).update(**cambios)
+
+
+def reconstruir(encuesta_id=None, chunk_size=5000):
+    """Recalcula los agregados desde RespuestaEncuesta (todas o de una encuesta)."""
+    respuestas = RespuestaEncuesta.objects.all()
+    agregados = AgregadoRespuesta.objects.all()
+    if encuesta_id:
+        respuestas = respuestas.filter(pregunta__encuesta_id=encuesta_id)
+        agregados = agregados.filter(pregunta__encuesta_id=encuesta_id)
+    tipos = dict(PreguntaEncuesta.objects.values_list("id", "tipo"))
+
+    deltas = {}
+    for pregunta_id, texto in respuestas.values_list("pregunta_id", "texto_respuesta").iterator(chunk_size=chunk_size):
+        acumular(deltas, pregunta_id, tipos.get(pregunta_id), texto)
+    with transaction.atomic():
+        agregados.delete()
+        aplicar(deltas)
+    return len(deltas)
+
+
+def tabla_resultados(encuesta_id):
+    """Resultados de la encuesta por pregunta, en una sola consulta (LEFT JOIN a los agregados)."""
+    filas = (
+        PreguntaEncuesta.objects
+        .filter(encuesta_id=encuesta_id)
+        .order_by("id", "-agregados__conteo", "agregados__valor")
+        .values(
+            "id", "texto_pregunta", "tipo",
+            "agregados__valor", "agregados__conteo", "agregados__suma",
+            "agregados__suma_cuadrados", "agregados__minimo", "agregados__maximo",
+        )
+    )
+    preguntas = {}
+    for f in filas:
+        pregunta = preguntas.get(f["id"])
+        if pregunta is None:
+            pregunta = preguntas[f["id"]] = {
+                "pregunta": f["id"],
+                "texto": f["texto_pregunta"],
+                "tipo": f["tipo"],
+                "clase": clasificar(f["tipo"]),
+                "respuestas": 0,
+            }
+            if pregunta["clase"] == "cerrada":
+                pregunta["opciones"] = []
+        n = f["agregados__conteo"]
+        if not n:
+            continue
+        pregunta["respuestas"] += n
+        if pregunta["clase"] == "cerrada":
+            pregunta["opciones"].append({"valor": f["agregados__valor"], "conteo": n})
+        elif pregunta["clase"] == "numerica":
+            media = f["agregados__suma"] / n
+            varianza = max(f["agregados__suma_cuadrados"] / n - media * media, 0.0)
+            pregunta.update(
+                media=round(media, 4),
+                desviacion=round(math.sqrt(varianza), 4),
+                minimo=f["agregados__minimo"],
+                maximo=f["agregados__maximo"],
+            )
+
+    for pregunta in preguntas.values():
+        for opcion in pregunta.get("opciones", []):
+            opcion["porcentaje"] = round(100 * opcion["conteo"] / pregunta["respuestas"], 1)
+    return list(preguntas.values())
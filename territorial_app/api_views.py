@@ -0,0 +1,86 @@
+from rest_framework import permissions, status
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+
+from . import agregados, definiciones, ingesta
+from .serializers import EnvioEncuestaSerializer, LoteEnviosSerializer
+from .views import _puede_gestionar_encuestas
+
+
+@api_view(["POST"])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([permissions.AllowAny])
+def responder_encuesta(request, pk):
+    """
+    Recibe un formulario completo de la encuesta ``pk``.
+    Ruta: /territorial/api/encuestas/{pk}/responder/
+    Body: {"id_cliente": uuid opcional, "respuestas": [{"pregunta": id, "respuesta": "..."}]}
+    """
+    serializer = EnvioEncuestaSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    envio = {**serializer.validated_data, "encuesta": pk}
+    resultado = ingesta.registrar_envios([envio], request.user)[0]
+    if resultado["estado"] == "error":
+        return Response({"detail": resultado["error"]}, status=status.HTTP_400_BAD_REQUEST)
+    codigo = status.HTTP_201_CREATED if resultado["estado"] == "creado" else status.HTTP_200_OK
+    return Response(resultado, status=codigo)
+
+
+@api_view(["POST"])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def responder_lote(request):
+    """
+    Recibe muchos envíos acumulados offline (de una o varias encuestas).
+    Ruta: /territorial/api/encuestas/responder-lote/
+    Cada envío se informa como creado, duplicado (mismo id_cliente) o error.
+    """
+    serializer = LoteEnviosSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    resultados = ingesta.registrar_envios(serializer.validated_data["envios"], request.user)
+    resumen = {"creados": 0, "duplicados": 0, "errores": 0}
+    claves = {"creado": "creados", "duplicado": "duplicados", "error": "errores"}
+    for r in resultados:
+        resumen[claves[r["estado"]]] += 1
+    return Response({**resumen, "resultados": resultados})
+
+
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def resultados_encuesta(request, pk):
+    """
+    Tabla de resultados precalculada de la encuesta ``pk``.
+    Ruta: /territorial/api/encuestas/{pk}/resultados/
+    """
+    if not _puede_gestionar_encuestas(request.user):
+        return Response({"detail": "No tienes permisos para ver resultados."}, status=status.HTTP_403_FORBIDDEN)
+    return Response({"encuesta": pk, "preguntas": agregados.tabla_resultados(pk)})
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def definicion_encuesta(request, pk):
+    """
+    Encuesta activa con todas sus preguntas, para formularios offline.
+    Ruta: /territorial/api/encuestas/{pk}/definicion/
+    El ETag sale de la base (una consulta); con If-None-Match igual responde 304
+    y si no, sirve la definición desde caché.
+    """
+    etag = definiciones.etag(pk)
+    if etag is not None and etag in [e.strip() for e in request.headers.get("If-None-Match", "").split(",")]:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        datos, etag = definiciones.definicion(pk, etag) if etag is not None else (None, None)
+        if datos is None:
+            return Response({"detail": "La encuesta no existe o no está activa."}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(datos)
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=60"
+    return response
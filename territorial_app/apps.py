@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TerritorialAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'territorial_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,123 @@
+"""
+Conversión masiva de encuestas (o respuestas marcadas como problema) en
+incidencias.
+
+Todo ocurre en una transacción: ``bulk_create`` de las incidencias, de sus
+filas ``Territorial`` (el usuario que hace el triage), del historial y de los
+tramos de SLA. Las encuestas/respuestas que ya tienen incidencia se omiten,
+así repetir la acción no duplica nada: primero se bloquean las filas de origen
+(``select_for_update``) y recién después se ve cuáles faltan, así dos
+conversiones simultáneas de lo mismo se ordenan y la segunda no encuentra nada.
+
+La encuesta no trae coordenadas (solo ``ubicacion`` en texto, que va a la
+descripción): latitud y longitud quedan nulas hasta que alguien las complete.
+"""
+from django.db import transaction
+
+from core import contadores, listado, sla
+from core.historial import nueva_transicion, registrar_transiciones
+from core.models import Encuesta, Incidencia, RespuestaEncuesta, Territorial
+
+BATCH_SIZE = 1000
+LARGO_TITULO = Incidencia._meta.get_field("titulo").max_length
+# Encuesta usa Alta/Normal/Baja; Incidencia alta/media/baja
+PRIORIDADES = {"alta": "alta", "normal": "media", "media": "media", "baja": "baja"}
+
+
+def _prioridad(valor):
+    return PRIORIDADES.get((valor or "").strip().lower(), "media")
+
+
+def _desde_encuesta(encuesta, **extra):
+    descripcion = encuesta.descripcion
+    if encuesta.ubicacion:
+        descripcion = f"{descripcion}\n\nUbicación: {encuesta.ubicacion}"
+    datos = dict(
+        titulo=encuesta.titulo[:LARGO_TITULO],
+        descripcion=descripcion,
+        estado="pendiente",
+        prioridad=_prioridad(encuesta.prioridad),
+        latitud=None,
+        longitud=None,
+        nombre_vecino=encuesta.nombre_vecino or "",
+        correo_vecino=encuesta.email_vecino or "",
+        telefono_vecino=encuesta.celular_vecino or "",
+        departamento_id=encuesta.departamento_id,
+        direccion_id=encuesta.departamento.direccion_id if encuesta.departamento else None,
+        tipo_incidencia_id=encuesta.tipo_incidencia_id,
+        encuesta_id=encuesta.pk,
+    )
+    datos.update(extra)
+    return Incidencia(**datos)
+
+
+def _bloquear(origen):
+    # En orden de pk para que dos conversiones que se solapan no se bloqueen mutuamente
+    list(origen.select_for_update(of=("self",)).order_by("pk").values_list("pk", flat=True))
+
+
+def _guardar(incidencias, usuario, comentario):
+    creadas = Incidencia.objects.bulk_create(incidencias, batch_size=BATCH_SIZE)
+    profile = getattr(usuario, "profile", None)
+    if profile is not None:
+        Territorial.objects.bulk_create(
+            [Territorial(incidencia_id=inc.pk, usuario=profile) for inc in creadas],
+            batch_size=BATCH_SIZE,
+        )
+    registrar_transiciones(
+        [nueva_transicion(inc, None, usuario, comentario) for inc in creadas],
+        batch_size=BATCH_SIZE,
+    )
+    sla.abrir_tramos(creadas, batch_size=BATCH_SIZE)
+    contadores.incidencias_creadas(creadas)
+    listado.incidencias_creadas(creadas, batch_size=BATCH_SIZE)
+    return creadas
+
+
+def convertir_encuestas(encuesta_ids, usuario=None):
+    """Crea una incidencia por cada encuesta seleccionada que aún no tenga una."""
+    with transaction.atomic():
+        _bloquear(Encuesta.objects.filter(pk__in=encuesta_ids))
+        convertidas = Incidencia.objects.filter(encuesta_id__in=encuesta_ids).values("encuesta_id")
+        encuestas = (
+            Encuesta.objects
+            .filter(pk__in=encuesta_ids)
+            .exclude(pk__in=convertidas)
+            .select_related("departamento")
+        )
+        return _guardar(
+            [_desde_encuesta(e) for e in encuestas],
+            usuario,
+            "Creada desde encuesta",
+        )
+
+
+def convertir_respuestas(encuesta_ids=None, usuario=None):
+    """
+    Crea una incidencia por cada respuesta marcada con ``requiere_incidencia``
+    que aún no tenga una (opcionalmente solo de ciertas encuestas).
+    """
+    marcadas = RespuestaEncuesta.objects.filter(requiere_incidencia=True)
+    if encuesta_ids:
+        marcadas = marcadas.filter(pregunta__encuesta_id__in=encuesta_ids)
+    with transaction.atomic():
+        _bloquear(marcadas)
+        respuestas = (
+            marcadas
+            .filter(incidencia__isnull=True)
+            .select_related("pregunta__encuesta__departamento")
+            .order_by("id")
+        )
+        incidencias = []
+        for r in respuestas:
+            encuesta = r.pregunta.encuesta
+            sufijo = f" (#{r.pk})"
+            incidencias.append(
+                _desde_encuesta(
+                    encuesta,
+                    titulo=f"{encuesta.titulo}: {r.pregunta.texto_pregunta}"[:LARGO_TITULO - len(sufijo)] + sufijo,
+                    descripcion=r.texto_respuesta or r.pregunta.texto_pregunta,
+                    respuesta_id=r.pk,
+                )
+            )
+        return _guardar(incidencias, usuario, "Creada desde respuesta de encuesta")
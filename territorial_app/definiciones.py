@@ -0,0 +1,103 @@
+"""
+Definición de encuestas (encuesta + preguntas) para las apps de terreno.
+
+El ETag sale de la fila de la encuesta (``version`` y ``actualizadoEl``):
+cualquier cambio de la encuesta toca ``actualizadoEl`` y los de sus preguntas o
+su departamento suben ``version`` (signals.py). El token queda en la caché
+compartida y signals.py lo borra al confirmarse el cambio, así la fila se lee
+solo cuando falta. Con ``If-None-Match`` igual al ETag la respuesta es 304 sin
+armar nada; si no, la definición se arma con un ``prefetch_related`` y queda
+en la caché bajo ese ETag, así una entrada vieja nunca se sirve por la nueva.
+"""
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from core.models import Encuesta, PreguntaEncuesta
+
+from .agregados import clasificar
+
+CACHE_TIMEOUT = 60 * 60 * 24
+# Respaldo si un proceso guardó el token leído justo antes de confirmarse un cambio
+ETAG_TIMEOUT = 300
+# Encuesta inexistente o bloqueada (None en la caché es "no está")
+SIN_DEFINICION = ""
+
+
+def _etag(pk, version, actualizado):
+    return f'"{pk}-{version}-{actualizado.timestamp():.6f}"'
+
+
+def _clave_etag(pk):
+    return f"encuestas:etag:{pk}"
+
+
+def etag(pk):
+    """ETag de la definición vigente, o None si la encuesta no existe o está bloqueada."""
+    valor = cache.get(_clave_etag(pk))
+    if valor is None:
+        fila = Encuesta.objects.filter(pk=pk, estado=True).values_list("version", "actualizadoEl").first()
+        valor = _etag(pk, *fila) if fila else SIN_DEFINICION
+        cache.set(_clave_etag(pk), valor, ETAG_TIMEOUT)
+    return valor or None
+
+
+def invalidar(pks):
+    """Olvida el ETag de las encuestas dadas; se llama al confirmarse la transacción."""
+    cache.delete_many([_clave_etag(pk) for pk in pks])
+
+
+def _clave(etag):
+    return f"encuestas:definicion:{etag}"
+
+
+def _construir(pk):
+    encuesta = (
+        Encuesta.objects
+        .filter(pk=pk, estado=True)
+        .select_related("departamento")
+        .prefetch_related(
+            Prefetch("preguntaencuesta_set", queryset=PreguntaEncuesta.objects.order_by("id"), to_attr="preguntas")
+        )
+        .first()
+    )
+    if encuesta is None:
+        return None, None
+    datos = {
+        "id": encuesta.pk,
+        "version": encuesta.version,
+        "titulo": encuesta.titulo,
+        "descripcion": encuesta.descripcion,
+        "ubicacion": encuesta.ubicacion,
+        "prioridad": encuesta.prioridad,
+        "departamento": {
+            "id": encuesta.departamento_id,
+            "nombre": encuesta.departamento.nombre_departamento,
+        },
+        "tipo_incidencia": encuesta.tipo_incidencia_id,
+        "preguntas": [
+            {
+                "id": p.pk,
+                "texto": p.texto_pregunta,
+                "descripcion": p.descripcion,
+                "tipo": p.tipo,
+                "clase": clasificar(p.tipo),
+            }
+            for p in encuesta.preguntas
+        ],
+    }
+    return datos, _etag(encuesta.pk, encuesta.version, encuesta.actualizadoEl)
+
+
+def definicion(pk, etag):
+    """
+    ``(datos, etag)`` de la definición con el ETag dado por ``etag()``; si la
+    encuesta cambió entretanto, lo armado va con su propio ETag. ``(None, None)``
+    si dejó de estar activa.
+    """
+    datos = cache.get(_clave(etag))
+    if datos is not None:
+        return datos, etag
+    datos, etag = _construir(pk)
+    if datos is not None:
+        cache.set(_clave(etag), datos, CACHE_TIMEOUT)
+    return datos, etag
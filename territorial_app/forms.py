@@ -1,6 +1,9 @@
 from django import forms
 from core.models import Incidencia, JefeCuadrilla, Encuesta, Departamento
 from registration.models import Profile
+from core import referencias
+from core.referencias import ReferenciaChoiceField
+from core.widgets import AutocompletarSelect
 
 class RechazarIncidenciaForm(forms.Form):
     motivo = forms.CharField(
@@ -11,18 +14,19 @@ class RechazarIncidenciaForm(forms.Form):
     )
 
 class ReasignarIncidenciaForm(forms.ModelForm):
-    cuadrilla = forms.ModelChoiceField(
+    cuadrilla = ReferenciaChoiceField(
         queryset=JefeCuadrilla.objects.all(),
         required=True,
         label="Cuadrilla",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=AutocompletarSelect("cuadrillas", depende={"departamento": "id_departamento"}, attrs={'class': 'form-control'})
     )
 
     class Meta:
         model = Incidencia
         fields = ['departamento', 'cuadrilla']
+        field_classes = {'departamento': ReferenciaChoiceField}
         widgets = {
-            'departamento': forms.Select(attrs={'class': 'form-control'}),
+            'departamento': AutocompletarSelect("departamentos", attrs={'class': 'form-control'}),
         }
 
 
@@ -51,6 +55,7 @@ class EncuestaForm(forms.ModelForm):
             'nombre_vecino', 'celular_vecino', 'email_vecino',
             'tipo_incidencia'
         ]
+        field_classes = {'departamento': ReferenciaChoiceField, 'tipo_incidencia': ReferenciaChoiceField}
         widgets = {
             'titulo': forms.TextInput(attrs={
                 'placeholder': 'Título de la encuesta',
@@ -96,4 +101,4 @@ class EncuestaForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Solo departamentos activos
-        self.fields['departamento'].queryset = Departamento.objects.filter(estado=True)
+        self.fields['departamento'].opciones = referencias.departamentos(activos=True)
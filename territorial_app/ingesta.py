@@ -0,0 +1,122 @@
+"""
+Ingesta de respuestas de encuestas (formularios puerta a puerta).
+
+Un lote de envíos se valida contra mapas cargados una sola vez (encuestas
+activas, preguntas de esas encuestas, ``id_cliente`` ya recibidos) y se
+escribe con dos ``bulk_create``: uno para ``EnvioEncuesta`` y otro para todas
+las ``RespuestaEncuesta`` del lote, sin importar cuántos formularios traiga.
+En la misma transacción se suman los agregados de resultados del lote.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import Encuesta, EnvioEncuesta, PreguntaEncuesta, RespuestaEncuesta
+
+from . import agregados
+
+BATCH_SIZE = 1000
+
+
+def _validar(envio, activas, preguntas):
+    """Devuelve el mensaje de error del envío o None si es válido."""
+    if envio["encuesta"] not in activas:
+        return "La encuesta no existe o no está activa."
+    vistas = set()
+    for r in envio["respuestas"]:
+        datos = preguntas.get(r["pregunta"])
+        if datos is None or datos[0] != envio["encuesta"]:
+            return f"La pregunta {r['pregunta']} no pertenece a la encuesta."
+        if r["pregunta"] in vistas:
+            return f"La pregunta {r['pregunta']} está respondida más de una vez."
+        if (
+            r["respuesta"]
+            and agregados.clasificar(datos[1]) == "numerica"
+            and agregados.numero(r["respuesta"]) is None
+        ):
+            return f"La respuesta a la pregunta {r['pregunta']} debe ser numérica."
+        vistas.add(r["pregunta"])
+    return None
+
+
+def _registrar(envios, usuario):
+    encuesta_ids = {e["encuesta"] for e in envios}
+    activas = set(
+        Encuesta.objects.filter(pk__in=encuesta_ids, estado=True).values_list("id", flat=True)
+    )
+    preguntas = {
+        pk: (encuesta_id, tipo)
+        for pk, encuesta_id, tipo in PreguntaEncuesta.objects.filter(
+            encuesta_id__in=activas
+        ).values_list("id", "encuesta_id", "tipo")
+    }
+    ids_cliente = [e["id_cliente"] for e in envios if e.get("id_cliente")]
+    recibidos = dict(
+        EnvioEncuesta.objects.filter(id_cliente__in=ids_cliente).values_list("id_cliente", "id")
+    )
+
+    resultados = [None] * len(envios)
+    nuevos = []  # (posición, EnvioEncuesta, respuestas)
+    en_lote = set()
+    for i, envio in enumerate(envios):
+        id_cliente = envio.get("id_cliente")
+        if id_cliente and id_cliente in recibidos:
+            resultados[i] = {"estado": "duplicado", "envio": recibidos[id_cliente]}
+            continue
+        if id_cliente and id_cliente in en_lote:
+            resultados[i] = {"estado": "duplicado", "envio": None}
+            continue
+        error = _validar(envio, activas, preguntas)
+        if error:
+            resultados[i] = {"estado": "error", "error": error}
+            continue
+        if id_cliente:
+            en_lote.add(id_cliente)
+        nuevos.append((
+            i,
+            EnvioEncuesta(
+                encuesta_id=envio["encuesta"],
+                id_cliente=id_cliente,
+                usuario=usuario,
+                respondidoEl=envio.get("respondido_el") or timezone.now(),
+            ),
+            envio["respuestas"],
+        ))
+
+    if nuevos:
+        with transaction.atomic():
+            creados = EnvioEncuesta.objects.bulk_create([n[1] for n in nuevos], batch_size=BATCH_SIZE)
+            respuestas = [
+                RespuestaEncuesta(
+                    envio_id=obj.pk,
+                    pregunta_id=r["pregunta"],
+                    tipo=preguntas[r["pregunta"]][1],
+                    texto_respuesta=r["respuesta"],
+                    requiere_incidencia=r.get("requiere_incidencia", False),
+                )
+                for (_, _, items), obj in zip(nuevos, creados)
+                for r in items
+            ]
+            RespuestaEncuesta.objects.bulk_create(respuestas, batch_size=BATCH_SIZE)
+            deltas = {}
+            for r in respuestas:
+                agregados.acumular(deltas, r.pregunta_id, r.tipo, r.texto_respuesta)
+            agregados.aplicar(deltas)
+        for (i, _, items), obj in zip(nuevos, creados):
+            resultados[i] = {"estado": "creado", "envio": obj.pk, "respuestas": len(items)}
+    return resultados
+
+
+def registrar_envios(envios, usuario=None):
+    """
+    ``envios`` es una lista de dicts ya validados por el serializer:
+    ``{encuesta, id_cliente, respondido_el, respuestas: [{pregunta, respuesta}]}``.
+    Devuelve un resultado por envío, en el mismo orden.
+    """
+    if usuario is not None and not usuario.is_authenticated:
+        usuario = None
+    try:
+        return _registrar(envios, usuario)
+    except IntegrityError:
+        # Otro proceso guardó el mismo id_cliente entre la lectura y el insert:
+        # al reintentar esos envíos aparecen como duplicados.
+        return _registrar(envios, usuario)
@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+MAX_ENVIOS_POR_LOTE = 500
+
+
+class RespuestaEntradaSerializer(serializers.Serializer):
+    pregunta = serializers.IntegerField()
+    respuesta = serializers.CharField(allow_blank=True, max_length=5000, trim_whitespace=True)
+    requiere_incidencia = serializers.BooleanField(default=False)
+
+
+class EnvioEncuestaSerializer(serializers.Serializer):
+    """Un formulario completo; la encuesta viene en la URL."""
+    id_cliente = serializers.UUIDField(required=False, allow_null=True)
+    respondido_el = serializers.DateTimeField(required=False, allow_null=True)
+    respuestas = RespuestaEntradaSerializer(many=True, allow_empty=False)
+
+
+class EnvioLoteSerializer(EnvioEncuestaSerializer):
+    encuesta = serializers.IntegerField()
+
+
+class LoteEnviosSerializer(serializers.Serializer):
+    """Envíos acumulados sin conexión por la app de terreno."""
+    envios = EnvioLoteSerializer(many=True, allow_empty=False, max_length=MAX_ENVIOS_POR_LOTE)
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Departamento, Encuesta, PreguntaEncuesta
+
+from . import definiciones
+
+
+def _invalidar_al_confirmar(pks):
+    transaction.on_commit(lambda: definiciones.invalidar(pks))
+
+
+@receiver(post_save, sender=Encuesta)
+@receiver(post_delete, sender=Encuesta)
+def nuevo_etag_por_encuesta(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _invalidar_al_confirmar([instance.pk])
+
+
+@receiver(post_save, sender=PreguntaEncuesta)
+@receiver(post_delete, sender=PreguntaEncuesta)
+def nueva_version_por_pregunta(sender, instance, raw=False, **kwargs):
+    """Agregar, editar o quitar una pregunta cambia la definición: sube la versión."""
+    if raw:
+        return
+    Encuesta.objects.filter(pk=instance.encuesta_id).update(version=F("version") + 1)
+    _invalidar_al_confirmar([instance.encuesta_id])
+
+
+@receiver(post_save, sender=Departamento)
+def nueva_version_por_departamento(sender, instance, created, raw=False, **kwargs):
+    """La definición lleva el nombre del departamento (territorial_app.definiciones)."""
+    if raw or created:
+        return
+    encuestas = Encuesta.objects.filter(departamento_id=instance.pk)
+    pks = list(encuestas.values_list("pk", flat=True))
+    if pks:
+        encuestas.update(version=F("version") + 1)
+        _invalidar_al_confirmar(pks)
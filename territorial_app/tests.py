@@ -1,3 +1,227 @@
-from django.test import TestCase
+import uuid
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.benchmark import ConsultasConstantesMixin
+from core.models import Departamento, Direccion, Encuesta, Incidencia, PreguntaEncuesta, RespuestaEncuesta
+
+from . import agregados, conversion, ingesta
+
+
+def _encuesta():
+    return {"pk": Encuesta.objects.order_by("pk").values_list("pk", flat=True).first()}
+
+
+def _finalizada():
+    return {"pk": Incidencia.objects.filter(estado="finalizada").order_by("pk").values_list("pk", flat=True).first()}
+
+
+class ConsultasTerritorialTests(ConsultasConstantesMixin, TestCase):
+    # validar_incidencia cambia el estado con un GET e incidencia_editar no recibe pk: quedan fuera
+    RUTAS = [
+        ("territorial_app:rechazar_incidencia", _finalizada),
+        ("territorial_app:reasignar_incidencia", _finalizada),
+        ("territorial_app:incidencias_lista", None),
+        ("territorial_app:encuestas_lista", None),
+        ("territorial_app:encuestas_exportar", None),
+        ("territorial_app:encuestas_convertir", None),
+        ("territorial_app:encuesta_crear", None),
+        ("territorial_app:encuesta_detalle", _encuesta),
+        ("territorial_app:encuesta_editar", _encuesta),
+        ("territorial_app:encuesta_toggle_estado", _encuesta),
+        ("territorial_app:encuesta_eliminar", _encuesta),
+        ("territorial_app:api_responder_encuesta", _encuesta),
+        ("territorial_app:api_responder_lote", None),
+        ("territorial_app:api_resultados_encuesta", _encuesta),
+        ("territorial_app:api_definicion_encuesta", _encuesta),
+    ]
+
+
+class DefinicionEncuestaTests(TestCase):
+    def setUp(self):
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        self.departamento = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        self.encuesta = Encuesta.objects.create(
+            titulo="Plazas", descripcion="Estado de plazas", ubicacion="Centro", prioridad="Normal",
+            departamento=self.departamento,
+        )
+        PreguntaEncuesta.objects.create(texto_pregunta="¿Limpia?", descripcion="", tipo="si_no", encuesta=self.encuesta)
+        self.url = reverse("territorial_app:api_definicion_encuesta", args=[self.encuesta.pk])
+
+    def test_304_con_el_mismo_etag_y_sin_armar_la_definicion(self):
+        etag = self.client.get(self.url)["ETag"]
+        # Solo la lectura del token (una consulta con la caché de base de datos)
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta["ETag"], etag)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_304_sin_consultas_con_cache_fuera_de_la_base(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_cambiar_una_pregunta_cambia_el_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            PreguntaEncuesta.objects.create(
+                texto_pregunta="¿Iluminada?", descripcion="", tipo="si_no", encuesta=self.encuesta,
+            )
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()["preguntas"]), 2)
+
+    def test_renombrar_el_departamento_cambia_la_definicion(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.departamento.nombre_departamento = "Aseo y Ornato"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.departamento.save()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.json()["departamento"]["nombre"], "Aseo y Ornato")
+
+    def test_bloqueada_es_404(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.encuesta.estado = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.encuesta.save(update_fields=["estado", "actualizadoEl"])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ConversionTests(TestCase):
+    def setUp(self):
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        departamento = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        self.encuesta = Encuesta.objects.create(
+            titulo="Plazas", descripcion="Basura acumulada", ubicacion="Plaza Central", prioridad="Alta",
+            departamento=departamento,
+        )
+
+    def test_sin_coordenadas_inventadas(self):
+        [incidencia] = conversion.convertir_encuestas([self.encuesta.pk])
+        incidencia.refresh_from_db()
+        self.assertIsNone(incidencia.latitud)
+        self.assertIsNone(incidencia.longitud)
+        self.assertIn("Plaza Central", incidencia.descripcion)
+
+    def test_repetir_no_duplica(self):
+        conversion.convertir_encuestas([self.encuesta.pk])
+        self.assertEqual(conversion.convertir_encuestas([self.encuesta.pk]), [])
+        self.assertEqual(Incidencia.objects.filter(encuesta=self.encuesta).count(), 1)
+
+
+class IngestaTests(TestCase):
+    A, B = uuid.uuid4(), uuid.uuid4()
+
+    def setUp(self):
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        departamento = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        self.encuesta = Encuesta.objects.create(
+            titulo="Plazas", descripcion="", ubicacion="Centro", prioridad="Normal", departamento=departamento,
+        )
+        self.limpia = PreguntaEncuesta.objects.create(
+            texto_pregunta="¿Limpia?", descripcion="", tipo="si_no", encuesta=self.encuesta
+        )
+        self.nota = PreguntaEncuesta.objects.create(
+            texto_pregunta="Nota", descripcion="", tipo="numero", encuesta=self.encuesta
+        )
+
+    def _envio(self, id_cliente, limpia, nota):
+        return {
+            "encuesta": self.encuesta.pk, "id_cliente": id_cliente,
+            "respuestas": [
+                {"pregunta": self.limpia.pk, "respuesta": limpia},
+                {"pregunta": self.nota.pk, "respuesta": nota},
+            ],
+        }
+
+    def test_lote_con_duplicados_y_errores(self):
+        resultados = ingesta.registrar_envios([
+            self._envio(self.A, "Sí", "4"),
+            self._envio(self.A, "Sí", "4"),
+            self._envio(self.B, "No", "muy bien"),
+        ])
+        self.assertEqual([r["estado"] for r in resultados], ["creado", "duplicado", "error"])
+        self.assertEqual(ingesta.registrar_envios([self._envio(self.A, "Sí", "4")])[0]["estado"], "duplicado")
+        self.assertEqual(RespuestaEncuesta.objects.count(), 2)
+
+    def test_agregados_mantenidos_igual_a_reconstruidos(self):
+        ingesta.registrar_envios([
+            self._envio(self.A, "Sí", "4"),
+            self._envio(self.B, "No", "2"),
+            self._envio(None, "Sí", ""),
+        ])
+        limpia, nota = agregados.tabla_resultados(self.encuesta.pk)
+        self.assertEqual(
+            [(o["valor"], o["conteo"], o["porcentaje"]) for o in limpia["opciones"]],
+            [("Sí", 2, 66.7), ("No", 1, 33.3)],
+        )
+        self.assertEqual((nota["respuestas"], nota["media"], nota["minimo"], nota["maximo"]), (2, 3.0, 2.0, 4.0))
+        agregados.reconstruir(self.encuesta.pk)
+        self.assertEqual(agregados.tabla_resultados(self.encuesta.pk), [limpia, nota])
+
+
+class ConversionRespuestasTests(TestCase):
+    def test_titulo_largo_no_supera_el_maximo(self):
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        departamento = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        encuesta = Encuesta.objects.create(
+            titulo="E" * 100, descripcion="", ubicacion="", prioridad="Normal", departamento=departamento
+        )
+        pregunta = PreguntaEncuesta.objects.create(texto_pregunta="P" * 200, descripcion="", tipo="texto", encuesta=encuesta)
+        respuesta = RespuestaEncuesta.objects.create(
+            id=1234567, texto_respuesta="Hoyo", tipo="texto", pregunta=pregunta, requiere_incidencia=True
+        )
+        [incidencia] = conversion.convertir_respuestas([encuesta.pk])
+        self.assertEqual(len(incidencia.titulo), 200)
+        self.assertTrue(incidencia.titulo.endswith(f"(#{respuesta.pk})"))
+
+
+class EncuestasListaTests(TestCase):
+    URL = reverse("territorial_app:encuestas_lista")
+
+    def setUp(self):
+        admin = User.objects.create_user("admin", password="x")
+        admin.groups.add(Group.objects.create(name="Administrador"))
+        self.client.force_login(admin)
+        direccion = Direccion.objects.create(nombre_direccion="Obras")
+        aseo = Departamento.objects.create(nombre_departamento="Aseo", direccion=direccion)
+        armas = Departamento.objects.create(nombre_departamento="Plaza de Armas", direccion=direccion)
+        for i in range(27):
+            self._encuesta(f"Encuesta {i}", aseo)
+        self.plazas = self._encuesta("Plazas", aseo)
+        self._encuesta("Veredas", aseo, descripcion="Frente a la plaza")
+        self._encuesta("Luminarias", armas)
+        preguntas = [
+            PreguntaEncuesta.objects.create(texto_pregunta=t, descripcion="", tipo="si_no", encuesta=self.plazas)
+            for t in ("¿Limpia?", "¿Iluminada?")
+        ]
+        for pregunta in (preguntas[0], preguntas[0], preguntas[1]):
+            RespuestaEncuesta.objects.create(texto_respuesta="Sí", tipo="si_no", pregunta=pregunta)
+        Incidencia.objects.create(
+            titulo="Plazas", descripcion="", estado="pendiente", prioridad="media", encuesta=self.plazas,
+        )
+
+    def _encuesta(self, titulo, departamento, descripcion=""):
+        return Encuesta.objects.create(
+            titulo=titulo, descripcion=descripcion, ubicacion="", prioridad="Normal", departamento=departamento,
+        )
+
+    def test_pagina_de_25(self):
+        primera = self.client.get(self.URL).context["page_obj"]
+        self.assertEqual((len(primera.object_list), primera.paginator.count), (25, 30))
+        segunda = self.client.get(self.URL, {"page": 2}).context["page_obj"]
+        self.assertEqual(len(segunda.object_list), 5)
+
+    def test_busqueda_en_titulo_descripcion_y_departamento(self):
+        encuestas = self.client.get(self.URL, {"q": "plaza"}).context["encuestas"]
+        self.assertEqual({e.titulo for e in encuestas}, {"Plazas", "Veredas", "Luminarias"})
+
+    def test_conteos_anotados(self):
+        [encuesta] = self.client.get(self.URL, {"q": "Plazas"}).context["encuestas"]
+        self.assertEqual((encuesta.num_preguntas, encuesta.num_respuestas, encuesta.num_incidencias), (2, 3, 1))
+        [vacia] = self.client.get(self.URL, {"q": "Encuesta 7"}).context["encuestas"]
+        self.assertEqual((vacia.num_preguntas, vacia.num_respuestas, vacia.num_incidencias), (0, 0, 0))
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from . import api_views
 from incidencias import views as incidencias_views
 
 app_name = "territorial_app"
@@ -19,7 +20,13 @@ urlpatterns = [
     # ============================================
     # Listar encuestas
     path("encuestas/", views.encuestas_lista, name="encuestas_lista"),
+
+    # Exportar encuestas filtradas (CSV/XLSX)
+    path("encuestas/exportar/", views.encuestas_exportar, name="encuestas_exportar"),
     
+    # Convertir encuestas seleccionadas (o respuestas marcadas) en incidencias
+    path("encuestas/convertir/", views.encuestas_convertir, name="encuestas_convertir"),
+
     # Crear encuesta
     path("encuestas/nueva/", views.encuesta_crear, name="encuesta_crear"),
     
@@ -34,4 +41,12 @@ urlpatterns = [
     
     # Eliminar encuesta
     path("encuestas/<int:pk>/eliminar/", views.encuesta_eliminar, name="encuesta_eliminar"),
+
+    # ============================================
+    # API DE RESPUESTAS (app de terreno / formulario público)
+    # ============================================
+    path("api/encuestas/<int:pk>/responder/", api_views.responder_encuesta, name="api_responder_encuesta"),
+    path("api/encuestas/responder-lote/", api_views.responder_lote, name="api_responder_lote"),
+    path("api/encuestas/<int:pk>/resultados/", api_views.resultados_encuesta, name="api_resultados_encuesta"),
+    path("api/encuestas/<int:pk>/definicion/", api_views.definicion_encuesta, name="api_definicion_encuesta"),
 ]
\ No newline at end of file
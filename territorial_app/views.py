@@ -1,15 +1,25 @@
 from django.shortcuts import get_object_or_404, render, redirect
 from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from core.models import Incidencia, JefeCuadrilla, Departamento, Encuesta
+from django.db import transaction
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from core.models import Incidencia, JefeCuadrilla, Departamento, Encuesta, PreguntaEncuesta, RespuestaEncuesta
 from .forms import RechazarIncidenciaForm, ReasignarIncidenciaForm, EncuestaForm
+from core import permisos
+from core.permisos import GRUPO
 from core.utils import solo_admin, admin_o_territorial
+from core.historial import registrar_transicion
+from core.exportar import respuesta_exportacion
+from encuestas.db_router import usa_replica
+from . import conversion
 
 
 def _puede_gestionar_encuestas(user):
-    roles = set(user.groups.values_list("name", flat=True))
+    roles = permisos.roles(user)
     return user.is_superuser or bool(
         roles.intersection({"Administrador", "Territorial", "Dirección", "Departamento"})
     )
@@ -22,9 +32,9 @@ def _puede_gestionar_encuestas(user):
 @admin_o_territorial
 def lista_incidencias(request):
     user = request.user
-    if user.groups.filter(name='Administrador').exists():
+    if permisos.tiene(user, GRUPO['Administrador']):
         incidencias = Incidencia.objects.all().order_by('-creadoEl')
-    elif user.groups.filter(name='Territorial').exists():
+    elif permisos.tiene(user, GRUPO['Territorial']):
         incidencias = Incidencia.objects.filter(cuadrilla__usuario=user.profile).order_by('-creadoEl')
     else:
         incidencias = Incidencia.objects.none()
@@ -38,9 +48,12 @@ def lista_incidencias(request):
 @admin_o_territorial
 def validar_incidencia(request, pk):
     incidencia = get_object_or_404(Incidencia, pk=pk)
+    estado_anterior = incidencia.estado
     incidencia.estado = 'validada'
     incidencia.fecha_cierre = timezone.now()
-    incidencia.save()
+    with transaction.atomic():
+        incidencia.save()
+        registrar_transicion(incidencia, estado_anterior, request.user)
     messages.success(request, f"Incidencia '{incidencia.titulo}' validada.")
     return redirect('territorial_app:incidencias_lista')
 
@@ -52,10 +65,13 @@ def rechazar_incidencia(request, pk):
         form = RechazarIncidenciaForm(request.POST)
         if form.is_valid():
             motivo = form.cleaned_data['motivo']
+            estado_anterior = incidencia.estado
             incidencia.estado = 'rechazada'
             incidencia.motivo_rechazo = motivo
             incidencia.fecha_cierre = timezone.now()
-            incidencia.save()
+            with transaction.atomic():
+                incidencia.save()
+                registrar_transicion(incidencia, estado_anterior, request.user, motivo)
             messages.success(request, f"Incidencia '{incidencia.titulo}' rechazada.")
             return redirect('territorial_app:incidencias_lista')
     else:
@@ -97,43 +113,141 @@ def reasignar_incidencia(request, pk):
 # VISTAS DE ENCUESTAS (CRUD para Territorial)
 # ============================================
 
-@login_required
-def encuestas_lista(request):
-    """
-    Lista todas las encuestas.
-    Territorial y Admin pueden verlas todas.
-    """
+def _encuestas_filtradas(request):
+    """Aplica búsqueda y estado de la querystring (lista y exportación)."""
     q = request.GET.get("q", "").strip()
     estado = request.GET.get("estado")  # 'activo' | 'inactivo' | None
-    
-    if not _puede_gestionar_encuestas(request.user):
-        messages.error(request, "No tienes permiso para ver encuestas.")
-        return redirect("personas:check_profile")
 
-    qs = Encuesta.objects.all().select_related('departamento').order_by('-creadoEl')
+    qs = Encuesta.objects.all().select_related('departamento').order_by('-creadoEl', '-id')
     
-    # Filtro por búsqueda de texto
+    # Filtro por búsqueda de texto (índices trigram en título/descripción).
+    # Los departamentos que coinciden se resuelven antes: tabla chica, evita el JOIN dentro del OR.
     if q:
-        qs = qs.filter(
-            Q(titulo__icontains=q) | 
-            Q(descripcion__icontains=q) |
-            Q(departamento__nombre_departamento__icontains=q)
+        filtro = Q(titulo__icontains=q) | Q(descripcion__icontains=q)
+        departamentos = list(
+            Departamento.objects.filter(nombre_departamento__icontains=q).values_list('id', flat=True)
         )
+        if departamentos:
+            filtro |= Q(departamento_id__in=departamentos)
+        qs = qs.filter(filtro)
     
     # Filtro por estado
     if estado == 'activo':
         qs = qs.filter(estado=True)
     elif estado == 'inactivo':
         qs = qs.filter(estado=False)
-    
+
+    return qs, q, estado
+
+
+ENCUESTAS_POR_PAGINA = 25
+
+
+def _conteo(qs, campo):
+    """Subconsulta correlacionada COUNT(*) por encuesta (evita multiplicar filas con varios JOIN)."""
+    return Coalesce(
+        Subquery(
+            qs.filter(**{campo: OuterRef("pk")})
+            .order_by()
+            .values(campo)
+            .annotate(n=Count("*"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+@usa_replica
+@login_required
+def encuestas_lista(request):
+    """
+    Lista todas las encuestas.
+    Territorial y Admin pueden verlas todas.
+    """
+    if not _puede_gestionar_encuestas(request.user):
+        messages.error(request, "No tienes permiso para ver encuestas.")
+        return redirect("personas:check_profile")
+
+    qs, q, estado = _encuestas_filtradas(request)
+    qs = qs.annotate(
+        num_preguntas=_conteo(PreguntaEncuesta.objects.all(), "encuesta"),
+        num_respuestas=_conteo(RespuestaEncuesta.objects.all(), "pregunta__encuesta"),
+        num_incidencias=_conteo(Incidencia.objects.all(), "encuesta"),
+    )
+    page_obj = Paginator(qs, ENCUESTAS_POR_PAGINA).get_page(request.GET.get("page"))
+    querystring = request.GET.copy()
+    querystring.pop("page", None)
+
     ctx = {
-        "encuestas": qs,
+        "encuestas": page_obj.object_list,
+        "page_obj": page_obj,
+        "querystring": querystring.urlencode(),
         "q": q,
         "estado_seleccionado": estado,
     }
     return render(request, "territorial_app/encuestas_lista.html", ctx)
 
 
+@login_required
+def encuestas_convertir(request):
+    """
+    Convierte en incidencias las encuestas seleccionadas en el listado, o las
+    respuestas marcadas como problema (accion=respuestas), en una sola operación.
+    """
+    if not _puede_gestionar_encuestas(request.user):
+        messages.error(request, "No tienes permiso para convertir encuestas.")
+        return redirect("personas:check_profile")
+    if request.method != "POST":
+        return redirect("territorial_app:encuestas_lista")
+
+    ids = [int(pk) for pk in request.POST.getlist("encuestas") if pk.isdigit()]
+    if request.POST.get("accion") == "respuestas":
+        creadas = conversion.convertir_respuestas(ids or None, request.user)
+        messages.success(request, f"{len(creadas)} incidencias creadas desde respuestas marcadas.")
+    elif not ids:
+        messages.warning(request, "Selecciona al menos una encuesta.")
+    else:
+        creadas = conversion.convertir_encuestas(ids, request.user)
+        omitidas = len(ids) - len(creadas)
+        mensaje = f"{len(creadas)} incidencias creadas desde encuestas."
+        if omitidas:
+            mensaje += f" {omitidas} ya estaban convertidas."
+        messages.success(request, mensaje)
+    siguiente = request.POST.get("next")
+    if siguiente and url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+        return redirect(siguiente)
+    return redirect("territorial_app:encuestas_lista")
+
+
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Título", "titulo"),
+    ("Descripción", "descripcion"),
+    ("Ubicación", "ubicacion"),
+    ("Activa", "estado"),
+    ("Prioridad", "prioridad"),
+    ("Departamento", "departamento__nombre_departamento"),
+    ("Tipo de incidencia", "tipo_incidencia__nombre_problema"),
+    ("Creada", "creadoEl"),
+    ("Vecino", "nombre_vecino"),
+    ("Celular vecino", "celular_vecino"),
+    ("Email vecino", "email_vecino"),
+]
+
+
+@usa_replica
+@login_required
+def encuestas_exportar(request):
+    """Descarga en streaming (CSV o XLSX) de las encuestas con los filtros del listado."""
+    if not _puede_gestionar_encuestas(request.user):
+        messages.error(request, "No tienes permiso para ver encuestas.")
+        return redirect("personas:check_profile")
+    qs, *_ = _encuestas_filtradas(request)
+    formato = request.GET.get("formato", "csv")
+    return respuesta_exportacion(qs, COLUMNAS_EXPORTACION, "encuestas", formato)
+
+
 @login_required
 def encuesta_detalle(request, pk):
     """
@@ -189,7 +303,11 @@ def encuesta_editar(request, pk):
     if request.method == "POST":
         form = EncuestaForm(request.POST, instance=encuesta)
         if form.is_valid():
-            encuesta = form.save()
+            encuesta = form.save(commit=False)
+            if form.has_changed():
+                # Las apps de terreno descargan la nueva definición
+                encuesta.version += 1
+            encuesta.save()
             messages.success(request, f"Encuesta '{encuesta.titulo}' actualizada correctamente.")
             return redirect("territorial_app:encuestas_lista")
     else: